@@ -7,15 +7,30 @@
 import requests
 import re
 import json
+import html
+import threading
+from dataclasses import dataclass
 from typing import Optional, Tuple, List, Dict
 from html.parser import HTMLParser
 
+from Prosody import ProsodyEngine
+
 class SSMLValidator(HTMLParser):
     """Парсер для валидации и исправления SSML с учетом ограничений Silero."""
     
     # Теги, поддерживаемые Silero TTS
     SILERO_SUPPORTED_TAGS = {'speak', 'prosody', 'break'}
     
+    # Строгий режим: грамматика, которую Silero принимает без исключений
+    SILERO_RATES = {'x-slow', 'slow', 'medium', 'fast', 'x-fast'}
+    SILERO_MAX_BREAK_MS = 5000
+    SILERO_MAX_PROSODY_DEPTH = 2
+    SILERO_MAX_TEXT_CHARS = 1000
+    
+    TAG_PATTERN = re.compile(r'<(/?)([a-zA-Z][\w-]*)([^<>]*?)(/?)>')
+    ATTR_PATTERN = re.compile(r'([\w-]+)\s*=\s*["\']([^"\']*)["\']')
+    BREAK_TIME_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\s*(ms|s)?$')
+    
     def __init__(self):
         super().__init__()
         self.tags_stack: List[Tuple[str, Dict[str, str]]] = []
@@ -23,8 +38,14 @@ class SSMLValidator(HTMLParser):
         self.errors: List[str] = []
         self.warnings: List[str] = []
         
-    def fix_ssml(self, ssml_text: str, for_silero: bool = True) -> Tuple[str, List[str], List[str]]:
-        """Исправляет SSML, адаптируя для Silero если нужно."""
+    def fix_ssml(self, ssml_text: str, for_silero: bool = True,
+                 strict: bool = False) -> Tuple[Optional[str], List[str], List[str]]:
+        """
+        Исправляет SSML, адаптируя для Silero если нужно.
+        
+        В строгом режиме результат дополнительно приводится к грамматике Silero
+        (_enforce_silero_grammar); если исправить нельзя, вместо SSML возвращается None.
+        """
         self.reset()
         self.tags_stack = []
         self.fixed_parts = []
@@ -51,6 +72,9 @@ class SSMLValidator(HTMLParser):
         
         result = self._postprocess_ssml(result)
         
+        if strict:
+            result = self._enforce_silero_grammar(result)
+        
         return result, self.errors, self.warnings
     
     def _preprocess_ssml(self, ssml: str) -> str:
@@ -125,7 +149,8 @@ class SSMLValidator(HTMLParser):
         """Обработка текстовых данных."""
         data = re.sub(r'\s+', ' ', data).strip()
         if data:
-            self.fixed_parts.append(data)
+            # HTMLParser раскрывает &amp; и &lt; - экранируем обратно
+            self.fixed_parts.append(html.escape(data, quote=False))
     
     def _normalize_attributes(self, tag: str, attrs: List[Tuple[str, str]]) -> Dict[str, str]:
         """Нормализует атрибуты для Silero."""
@@ -141,9 +166,10 @@ class SSMLValidator(HTMLParser):
             
             # Нормализуем значения
             if attr == 'time' and tag == 'break':
-                match = re.search(r'(\d+)', value)
+                match = re.search(r'(\d+(?:\.\d+)?)\s*(ms|s)?', value)
                 if match:
-                    value = f"{match.group(1)}ms"
+                    milliseconds = float(match.group(1)) * (1000 if match.group(2) == 's' else 1)
+                    value = f"{int(milliseconds)}ms"
                 elif not value.endswith('ms'):
                     value = f"{value}ms"
             elif attr == 'rate' and tag == 'prosody':
@@ -206,6 +232,92 @@ class SSMLValidator(HTMLParser):
         else:
             return '<prosody>'
     
+    def _enforce_silero_grammar(self, ssml: str) -> Optional[str]:
+        """
+        Приводит SSML к подмножеству Silero или отклоняет его.
+        
+        Исправляется: лишние и вложенные <speak>, теги и атрибуты вне подмножества,
+        недопустимый rate, слишком глубокая вложенность <prosody>, паузы вне
+        0..SILERO_MAX_BREAK_MS, неэкранированный текст.
+        Отклоняется (None): SSML без текста и текст длиннее SILERO_MAX_TEXT_CHARS.
+        """
+        parts = []
+        stack: List[bool] = []  # Для каждого открытого <prosody>: оставлен ли он
+        depth = 0
+        speak_count = 0
+        text_chars = 0
+        position = 0
+        
+        def add_text(chunk: str) -> None:
+            nonlocal text_chars
+            text = html.unescape(chunk)
+            if text.strip():
+                text_chars += len(text.strip())
+                parts.append(html.escape(text, quote=False))
+        
+        for match in self.TAG_PATTERN.finditer(ssml):
+            add_text(ssml[position:match.start()])
+            position = match.end()
+            closing, tag, attrs_str, _ = match.groups()
+            tag = tag.lower()
+            attrs = {attr.lower(): value.strip() for attr, value in self.ATTR_PATTERN.findall(attrs_str)}
+            
+            if tag == 'speak':
+                if not closing:
+                    speak_count += 1
+                    if speak_count > 1:
+                        self.warnings.append("Вложенный <speak> удален")
+            elif tag == 'prosody':
+                if closing:
+                    if not stack:
+                        self.warnings.append("Непарный </prosody> удален")
+                    elif stack.pop():
+                        depth -= 1
+                        parts.append('</prosody>')
+                    continue
+                for attr in attrs.keys() - {'rate'}:
+                    self.warnings.append(f"Атрибут {attr} у <prosody> не поддерживается Silero, удален")
+                rate = attrs.get('rate')
+                if rate is not None and rate not in self.SILERO_RATES:
+                    self.warnings.append(f"rate=\"{rate}\" заменен на medium")
+                    rate = 'medium'
+                keep = rate is not None and depth < self.SILERO_MAX_PROSODY_DEPTH
+                if rate is not None and not keep:
+                    self.warnings.append(f"Вложенность <prosody> больше {self.SILERO_MAX_PROSODY_DEPTH}, тег удален")
+                stack.append(keep)
+                if keep:
+                    depth += 1
+                    parts.append(f'<prosody rate="{rate}">')
+            elif tag == 'break':
+                if closing:
+                    continue
+                time_match = self.BREAK_TIME_PATTERN.match(attrs.get('time', ''))
+                if not time_match:
+                    self.warnings.append("<break> без корректного time удален")
+                    continue
+                milliseconds = float(time_match.group(1)) * (1000 if time_match.group(2) == 's' else 1)
+                if milliseconds > self.SILERO_MAX_BREAK_MS:
+                    self.warnings.append(f"Пауза {int(milliseconds)}ms сокращена до {self.SILERO_MAX_BREAK_MS}ms")
+                    milliseconds = self.SILERO_MAX_BREAK_MS
+                if milliseconds >= 1:
+                    parts.append(f'<break time="{int(milliseconds)}ms"/>')
+            else:
+                self.warnings.append(f"Тег <{tag}> не поддерживается Silero, удален")
+        add_text(ssml[position:])
+        
+        while stack:
+            if stack.pop():
+                parts.append('</prosody>')
+        
+        if not text_chars:
+            self.errors.append("SSML не содержит текста")
+            return None
+        if text_chars > self.SILERO_MAX_TEXT_CHARS:
+            self.errors.append(f"Текст длиннее {self.SILERO_MAX_TEXT_CHARS} символов ({text_chars})")
+            return None
+        
+        return f"<speak>{''.join(parts)}</speak>"
+    
     def _postprocess_ssml(self, ssml: str) -> str:
         """Постобработка SSML."""
         # Гарантируем теги speak
@@ -221,17 +333,99 @@ class SSMLValidator(HTMLParser):
         return ssml.strip()
 
 
+@dataclass
+class GateStats:
+    """
+    Статистика отбора сообщений для LLM
+
+    Attributes:
+        Messages: Сообщений на входе генератора
+        LlmCalls: Отправлено в LM Studio
+        Skipped: Размечено правилами без LLM
+        MaxTokens: Сумма max_tokens отправленных запросов
+    """
+    Messages: int = 0
+    LlmCalls: int = 0
+    Skipped: int = 0
+    MaxTokens: int = 0
+
+    def __str__(self) -> str:
+        average = self.MaxTokens / self.LlmCalls if self.LlmCalls else 0
+        return (f"сообщений: {self.Messages}, в LLM: {self.LlmCalls}, по правилам: {self.Skipped}, "
+                f"max_tokens в среднем: {average:.0f}")
+
+
+@dataclass
+class LlmGate:
+    """
+    Решает, стоит ли отправлять сообщение в LM Studio, и сколько токенов ему дать
+    
+    LLM не нужна там, где ее ответ совпадет с разметкой по правилам:
+    эмодзи и знаки без букв, пара слов ("+", "ку"), короткая фраза без
+    знаков препинания, поток одних знаков ("!!!???").
+    
+    Attributes:
+        MinWords: Меньше слов - по правилам
+        MinChars: Меньше букв - по правилам
+        PlainMaxWords: Фраза без знаков препинания до стольких слов - по правилам
+        MaxPunctuationDensity: Доля знаков препинания выше - это спам, по правилам
+        CharsPerToken: Символов текста на токен ответа (русский текст в токенизаторах LLM)
+        TokensPerMark: Токенов разметки на знак препинания (<break .../>)
+        BaseTokens: Токенов на <speak> и <prosody>
+        MaxTokens: Потолок max_tokens
+    """
+    MinWords: int = 3
+    MinChars: int = 12
+    PlainMaxWords: int = 8
+    MaxPunctuationDensity: float = 0.3
+    CharsPerToken: float = 2.0
+    TokensPerMark: int = 12
+    BaseTokens: int = 32
+    MaxTokens: int = 500
+    
+    WORD_PATTERN = re.compile(r'[^\W\d_]+')
+    MARK_PATTERN = re.compile(r'[.,!?;:…—-]')
+    
+    def max_tokens(self, text: str) -> Optional[int]:
+        """
+        Returns:
+            max_tokens для запроса или None, если LLM для сообщения не нужна
+        """
+        words = self.WORD_PATTERN.findall(text)
+        letters = sum(len(word) for word in words)
+        marks = len(self.MARK_PATTERN.findall(text))
+        if len(words) < self.MinWords or letters < self.MinChars:
+            return None
+        if not marks and len(words) <= self.PlainMaxWords:
+            return None
+        if marks / len(text) > self.MaxPunctuationDensity:
+            return None
+        # Ответ - это исходный текст плюс теги: растет с длиной и числом пауз
+        tokens = self.BaseTokens + len(text) / self.CharsPerToken + marks * self.TokensPerMark
+        return min(int(tokens), self.MaxTokens)
+
+
 class SSMLGenerator:
     """
     Генератор SSML разметки для русского текста.
     Автоматически адаптирует SSML для Silero TTS.
     """
     
-    def __init__(self, base_url: str = "http://localhost:1234/v1"):
+    def __init__(self, base_url: str = "http://localhost:1234/v1", gate: Optional[LlmGate] = None):
+        """
+        Args:
+            base_url: Адрес OpenAI-совместимого API LM Studio
+            gate: Отбор сообщений для LLM (None - LlmGate по умолчанию)
+        """
         self.base_url = base_url
+        self.gate = gate or LlmGate()
+        self.GateStats = GateStats()
+        self._gate_lock = threading.Lock()
         self._initialized = False
         self._available = False
         self._validator = SSMLValidator()
+        self._validator_lock = threading.Lock()  # Парсер хранит состояние
+        self._prosody = ProsodyEngine()
         
     def _ensure_initialized(self) -> None:
         """Однократная инициализация при первом использовании."""
@@ -264,7 +458,7 @@ class SSMLGenerator:
         print("4. Перезапустите приложение")
         print("="*60 + "\n")
     
-    def _generate_with_lm_studio(self, text: str, style: str = "neutral") -> Optional[str]:
+    def _generate_with_lm_studio(self, text: str, style: str = "neutral", max_tokens: int = 500) -> Optional[str]:
         """Генерация SSML через LM Studio API с учетом ограничений Silero."""
         # Промпт с учетом ограничений Silero
         system_prompt = """Ты преобразуешь русский текст в SSML разметку для синтезатора речи Silero.
@@ -304,7 +498,7 @@ SSML: <speak><prosody rate="medium">Привет<break time="150ms"/> мир!</p
                         {"role": "user", "content": f"Стиль: {style}\nТекст: {text}"}
                     ],
                     "temperature": 0.1,
-                    "max_tokens": 500,
+                    "max_tokens": max_tokens,
                     "stop": ["</speak>", "\n\n", "```"],
                     "stream": False
                 },
@@ -315,6 +509,8 @@ SSML: <speak><prosody rate="medium">Привет<break time="150ms"/> мир!</p
                 return None
             
             result = response.json()
+            if result["choices"][0].get("finish_reason") == "length":
+                return None  # Ответ обрезан по max_tokens - часть текста потеряна
             ssml = result["choices"][0]["message"]["content"].strip()
             
             return self._clean_and_fix_ssml(ssml)
@@ -332,7 +528,8 @@ SSML: <speak><prosody rate="medium">Привет<break time="150ms"/> мир!</p
         ssml = re.sub(r'```', '', ssml)
         
         # Исправляем и адаптируем для Silero
-        fixed_ssml, errors, warnings = self._validator.fix_ssml(ssml, for_silero=True)
+        with self._validator_lock:
+            fixed_ssml, errors, warnings = self._validator.fix_ssml(ssml, for_silero=True)
         
         # Логирование проблем (опционально)
         if errors or warnings:
@@ -345,25 +542,12 @@ SSML: <speak><prosody rate="medium">Привет<break time="150ms"/> мир!</p
         
         return fixed_ssml
     
-    def _simple_fallback(self, text: str) -> str:
-        """Простая SSML разметка для Silero без использования LM Studio."""
+    def _simple_fallback(self, text: str, style: str = "neutral") -> str:
+        """Разметка SSML по правилам (Prosody.py) без использования LM Studio."""
         if not text:
             return '<speak></speak>'
         
-        # Базовая расстановка пауз для Silero
-        result = text
-        
-        # Простые замены с проверкой на существующие теги
-        if '<' not in result and '>' not in result:
-            # Добавляем паузы на знаках препинания
-            result = re.sub(r'([.!?])\s+', r'\1<break time="300ms"/> ', result)
-            result = re.sub(r',\s+', r'<break time="150ms"/> ', result)
-            result = re.sub(r';\s+', r'<break time="200ms"/> ', result)
-            result = re.sub(r':\s+', r'<break time="250ms"/> ', result)
-            result = re.sub(r'—\s+', r'<break time="400ms"/> ', result)
-        
-        # Обертка в поддерживаемые теги Silero
-        return f'<speak><prosody rate="medium">{result}</prosody></speak>'
+        return self._prosody.markup(text, style)
     
     def text_to_ssml(self, 
                      text: str, 
@@ -374,37 +558,53 @@ SSML: <speak><prosody rate="medium">Привет<break time="150ms"/> мир!</p
         
         Args:
             text: Русский текст для преобразования
-            style: Стиль речи (neutral, cheerful, serious)
-            use_fallback: Использовать простую SSML разметку если LM Studio недоступен
+            style: Стиль речи (neutral, cheerful, serious);
+                   "rules" или "rules:<стиль>" - разметка по правилам без LM Studio
+            use_fallback: Использовать разметку по правилам если LM Studio недоступен
         
         Returns:
             SSML разметка совместимая с Silero или None
         """
+        engine, _, rules_style = style.partition(':')
+        if engine == "rules":
+            return self._simple_fallback(text, rules_style or "neutral")
+        
         self._ensure_initialized()
         
-        # Если LM Studio доступен - пытаемся сгенерировать
+        # Если LM Studio доступен и сообщение того стоит - пытаемся сгенерировать
         if self._available:
-            ssml = self._generate_with_lm_studio(text, style)
-            if ssml:
-                return ssml
+            max_tokens = self.gate.max_tokens(text)
+            with self._gate_lock:
+                self.GateStats.Messages += 1
+                if max_tokens is None:
+                    self.GateStats.Skipped += 1
+                else:
+                    self.GateStats.LlmCalls += 1
+                    self.GateStats.MaxTokens += max_tokens
+            if max_tokens is not None:
+                ssml = self._generate_with_lm_studio(text, style, max_tokens)
+                if ssml:
+                    return ssml
         
         # Fallback или None
         if use_fallback:
-            return self._simple_fallback(text)
+            return self._simple_fallback(text, style)
         
         return None
     
-    def validate_for_silero(self, ssml: str) -> Tuple[str, List[str], List[str]]:
+    def validate_for_silero(self, ssml: str, strict: bool = False) -> Tuple[Optional[str], List[str], List[str]]:
         """
         Валидация и адаптация SSML для Silero TTS.
         
         Args:
             ssml: SSML разметка для проверки
+            strict: Строгая проверка грамматики Silero перед инференсом
         
         Returns:
-            Tuple[исправленный_ssml, ошибки, предупреждения]
+            Tuple[исправленный_ssml (None - отклонен в строгом режиме), ошибки, предупреждения]
         """
-        return self._validator.fix_ssml(ssml, for_silero=True)
+        with self._validator_lock:
+            return self._validator.fix_ssml(ssml, for_silero=True, strict=strict)
     
     @property
     def is_available(self) -> bool:
@@ -448,7 +648,7 @@ def ensure_ssml(text: str, style: str = "neutral") -> str:
     
     # Если нет SSML от LM Studio, используем fallback
     if not ssml:
-        ssml = generator._simple_fallback(text)
+        ssml = generator._simple_fallback(text, style)
     
     # Дополнительная валидация
     validated_ssml, errors, warnings = generator.validate_for_silero(ssml)
@@ -0,0 +1,204 @@
+"""
+Буфер аудио одного сообщения без лишних копирований.
+
+AudioBuffer создается один раз на синтез и проходит через кэш, эффекты и вывод
+как представление (view) над исходной памятью: CPU тензор torch (через
+tensor.numpy()), слот заранее выделенного пула или блок разделяемой памяти пула
+процессов. Память возвращается владельцу вызовом release() после воспроизведения.
+
+Каждое вынужденное копирование учитывается в CopyMetrics - количество байт,
+скопированных на сообщение, видно в статистике.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class CopyStats:
+    """
+    Статистика копирования аудио
+
+    Attributes:
+        Messages: Синтезировано сообщений
+        Copies: Количество копирований
+        BytesCopied: Скопировано байт всего
+    """
+    Messages: int = 0
+    Copies: int = 0
+    BytesCopied: int = 0
+
+    @property
+    def BytesPerMessage(self) -> float:
+        """Скопировано байт в среднем на сообщение."""
+        return self.BytesCopied / self.Messages if self.Messages else 0.0
+
+    def __str__(self) -> str:
+        return (f"сообщений: {self.Messages}, копирований: {self.Copies}, "
+                f"скопировано {self.BytesCopied / 1024:.1f} КБ ({self.BytesPerMessage / 1024:.1f} КБ на сообщение)")
+
+
+class CopyCounter:
+    """
+    Потокобезопасный счетчик копирований
+    """
+
+    def __init__(self):
+        self.Stats = CopyStats()
+        self._lock = threading.Lock()
+
+    def message(self) -> None:
+        """Учитывает очередное сообщение (вызывается конвейером один раз на синтез)."""
+        with self._lock:
+            self.Stats.Messages += 1
+
+    def copied(self, nbytes: int) -> None:
+        """Учитывает копирование nbytes байт."""
+        with self._lock:
+            self.Stats.Copies += 1
+            self.Stats.BytesCopied += nbytes
+
+
+# Общий счетчик для всего конвейера
+CopyMetrics = CopyCounter()
+
+
+class AudioBuffer:
+    """
+    Моно аудио одного сообщения поверх чужой памяти
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int,
+                 release: Optional[Callable[[], None]] = None,
+                 owner: Any = None):
+        """
+        Args:
+            samples: Одномерный массив сэмплов (float32 или int16), не копируется
+            sample_rate: Частота дискретизации
+            release: Вызывается один раз при release() (возврат памяти владельцу)
+            owner: Объект, который должен жить, пока жив буфер (например тензор torch)
+        """
+        self.Samples = samples
+        self.SampleRate = sample_rate
+        self._release = release
+        self._owner = owner
+
+    @classmethod
+    def from_tensor(cls, audio: Any, sample_rate: int) -> "AudioBuffer":
+        """
+        Оборачивает результат apply_tts без копирования
+
+        Args:
+            audio: Тензор torch, numpy массив или последовательность сэмплов
+            sample_rate: Частота дискретизации
+
+        Returns:
+            Буфер над памятью тензора (копия только для GPU/нецелевого типа)
+        """
+        owner = audio
+        if hasattr(audio, 'detach'):
+            audio = audio.detach()
+            if audio.device.type != 'cpu':
+                audio = audio.cpu()
+                CopyMetrics.copied(audio.numel() * audio.element_size())
+            audio = audio.numpy()
+        samples = np.asarray(audio)
+        if samples.dtype not in (np.float32, np.int16) or not samples.flags.c_contiguous:
+            samples = np.ascontiguousarray(samples, dtype=np.float32)
+            CopyMetrics.copied(samples.nbytes)
+        return cls(samples.reshape(-1), sample_rate, owner=owner)
+
+    def __len__(self) -> int:
+        return len(self.Samples)
+
+    @property
+    def Duration(self) -> float:
+        """Длительность в секундах."""
+        return len(self.Samples) / self.SampleRate
+
+    @property
+    def nbytes(self) -> int:
+        return self.Samples.nbytes
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> "AudioBuffer":
+        """
+        Поддиапазон без копирования (например после обрезки тишины)
+
+        release() представления освобождает и исходный буфер.
+        """
+        return AudioBuffer(self.Samples[start:stop], self.SampleRate, release=self.release, owner=self)
+
+    def to_int16(self, pool: Optional["AudioBufferPool"] = None) -> "AudioBuffer":
+        """
+        Преобразует в int16 (для WAV и устройств без float)
+
+        Args:
+            pool: Пул int16, из которого брать память (None - новый массив)
+        """
+        if self.Samples.dtype == np.int16:
+            return self
+        target = pool.acquire(len(self.Samples)) if pool is not None else \
+            AudioBuffer(np.empty(len(self.Samples), dtype=np.int16), self.SampleRate)
+        target.SampleRate = self.SampleRate
+        np.multiply(np.clip(self.Samples, -1.0, 1.0), 32767, out=target.Samples, casting='unsafe')
+        CopyMetrics.copied(target.nbytes)
+        return target
+
+    def release(self) -> None:
+        """Возвращает память владельцу (повторные вызовы ничего не делают)."""
+        release, self._release = self._release, None
+        self._owner = None
+        if release is not None:
+            release()
+
+    def __enter__(self) -> "AudioBuffer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class AudioBufferPool:
+    """
+    Заранее выделенные буферы фиксированной емкости
+    """
+
+    def __init__(self, slots: int = 4, capacity: int = 48000 * 30, dtype=np.float32, sample_rate: int = 48000):
+        """
+        Args:
+            slots: Количество буферов
+            capacity: Емкость буфера в сэмплах
+            dtype: np.float32 или np.int16
+            sample_rate: Частота дискретизации выдаваемых буферов
+        """
+        self.Capacity = capacity
+        self.SampleRate = sample_rate
+        self._dtype = np.dtype(dtype)
+        self._slots: List[np.ndarray] = [np.zeros(capacity, dtype=self._dtype) for _ in range(slots)]
+        self._free: List[int] = list(range(slots))
+        self._lock = threading.Lock()
+
+    def acquire(self, length: int) -> AudioBuffer:
+        """
+        Берет буфер длиной length сэмплов
+
+        Если свободных слотов нет или length больше емкости, выделяется новый массив.
+        """
+        with self._lock:
+            index = self._free.pop() if self._free and length <= self.Capacity else None
+        if index is None:
+            return AudioBuffer(np.empty(length, dtype=self._dtype), self.SampleRate)
+        return AudioBuffer(self._slots[index][:length], self.SampleRate, release=lambda: self._put(index))
+
+    def _put(self, index: int) -> None:
+        with self._lock:
+            self._free.append(index)
+
+    @property
+    def Free(self) -> int:
+        """Свободных слотов."""
+        with self._lock:
+            return len(self._free)
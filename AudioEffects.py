@@ -0,0 +1,324 @@
+"""
+Обработка синтезированного аудио перед воспроизведением.
+
+Ускорение речи без изменения высоты тона (WSOLA) вместо проигрывания с
+завышенной частотой дискретизации: sd.play(audio, sample_rate * 1.05)
+ускоряет речь, но и поднимает голос. Темп выбирается по глубине очереди
+и возрасту сообщения - чем больше отставание от чата, тем быстрее речь.
+
+До ускорения AudioPostProcessor обрезает тишину в начале и конце (порог
+по энергии кадров относительно самого громкого кадра) и выравнивает громкость
+голосов по RMS речевых кадров. Обе операции работают над представлением
+буфера без копирования; сэкономленное время эфира считается в AirtimeStats.
+
+Бенчмарк (во сколько раз обработка быстрее реального времени на одном ядре):
+    python AudioEffects.py
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from AudioBuffer import AudioBuffer
+
+
+def _hann(length: int) -> np.ndarray:
+    """Периодическое окно Ханна: при перекрытии 50% сумма окон равна единице."""
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)).astype(np.float32)
+
+
+def time_stretch(samples: np.ndarray,
+                 rate: float,
+                 sample_rate: int,
+                 frame_seconds: float = 0.03,
+                 tolerance_seconds: float = 0.008,
+                 decimation: int = 4) -> np.ndarray:
+    """
+    Изменяет темп без изменения высоты тона (WSOLA)
+
+    Кадры берутся из входа с шагом frame/2 * rate и складываются на выходе с шагом
+    frame/2. Каждый кадр сдвигается в пределах tolerance так, чтобы он лучше всего
+    продолжал предыдущий (максимум взаимной корреляции); грубый поиск идет по
+    прореженному сигналу, затем уточняется на полной частоте.
+
+    Args:
+        samples: Моно аудио float32
+        rate: Темп (1.2 - на 20% быстрее); 1.0 возвращает вход без копирования
+        sample_rate: Частота дискретизации
+        frame_seconds: Длина кадра
+        tolerance_seconds: Допустимый сдвиг кадра при поиске
+        decimation: Прореживание для грубого поиска
+
+    Returns:
+        Аудио длиной примерно len(samples) / rate
+    """
+    if abs(rate - 1.0) < 1e-3 or len(samples) == 0:
+        return samples
+    frame = max(64, int(frame_seconds * sample_rate) // (2 * decimation) * (2 * decimation))
+    hop_out = frame // 2
+    hop_in = hop_out * rate
+    tolerance = max(decimation, int(tolerance_seconds * sample_rate) // decimation * decimation)
+    if len(samples) < frame * 2:
+        return samples
+
+    padded = np.concatenate((np.zeros(tolerance, dtype=np.float32),
+                             np.asarray(samples, dtype=np.float32),
+                             np.zeros(frame + tolerance, dtype=np.float32)))
+    # Прореживание усреднением (заодно простой фильтр против наложения спектров)
+    coarse = padded[:len(padded) // decimation * decimation].reshape(-1, decimation).mean(axis=1)
+    coarse_hop = hop_out // decimation
+    refine = decimation
+
+    frames = int((len(samples) - frame) / hop_in) + 2
+    positions = np.empty(frames, dtype=np.int64)
+    positions[0] = tolerance
+    limit = len(padded) - frame
+    for index in range(1, frames):
+        # Естественное продолжение предыдущего кадра - образец для поиска
+        natural = positions[index - 1] + hop_out
+        nominal = tolerance + int(round(index * hop_in))
+        low = max(0, nominal - tolerance)
+        high = min(limit, nominal + tolerance)
+        if high <= low:
+            positions[index] = min(max(nominal, 0), limit)
+            continue
+        template = coarse[natural // decimation:natural // decimation + coarse_hop]
+        region = coarse[low // decimation:high // decimation + coarse_hop]
+        if len(template) < coarse_hop or len(region) < coarse_hop:
+            positions[index] = min(nominal, limit)
+            continue
+        best = low + int(np.argmax(np.correlate(region, template, 'valid'))) * decimation
+
+        # Уточнение на полной частоте в окрестности грубого максимума
+        fine_low = max(0, best - refine)
+        fine_high = min(limit, best + refine)
+        fine_template = padded[natural:natural + hop_out]
+        fine_region = padded[fine_low:fine_high + hop_out]
+        if len(fine_region) >= hop_out and len(fine_template) == hop_out:
+            best = fine_low + int(np.argmax(np.correlate(fine_region, fine_template, 'valid')))
+        positions[index] = best
+
+    # Сложение с перекрытием: четные и нечетные кадры идут без зазоров со сдвигом hop_out
+    window = _hann(frame)
+    chunks = padded[positions[:, None] + np.arange(frame)] * window
+    output = np.zeros((frames + 1) * hop_out, dtype=np.float32)
+    even = chunks[0::2].reshape(-1)
+    odd = chunks[1::2].reshape(-1)
+    output[:len(even)] += even
+    output[hop_out:hop_out + len(odd)] += odd
+    return output[:int(len(samples) / rate)]
+
+
+@dataclass
+class PlaybackRatePolicy:
+    """
+    Темп речи по отставанию от чата
+
+    rate = Base + PerMessage * сообщений в очереди + PerSecondStale * возраст сообщения,
+    но не больше MaxRate
+
+    Attributes:
+        Base: Минимальный темп (как прежние 1.05)
+        PerMessage: Прибавка за каждое ожидающее сообщение
+        PerSecondStale: Прибавка за каждую секунду ожидания сообщения
+        MaxRate: Предел разборчивости
+    """
+    Base: float = 1.05
+    PerMessage: float = 0.04
+    PerSecondStale: float = 0.01
+    MaxRate: float = 1.5
+
+    def rate(self, queue_depth: int, staleness: float) -> float:
+        """
+        Args:
+            queue_depth: Сообщений ждет после текущего
+            staleness: Сколько секунд текущее сообщение ждало в очереди
+        """
+        rate = self.Base + self.PerMessage * max(0, queue_depth) + self.PerSecondStale * max(0.0, staleness)
+        return min(self.MaxRate, rate)
+
+
+def frame_energy_db(samples: np.ndarray, frame: int) -> np.ndarray:
+    """Энергия кадров длиной frame в дБ (хвост короче кадра отбрасывается)."""
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    power = np.einsum('ij,ij->i', frames, frames) / frame
+    return 10 * np.log10(power + 1e-12)
+
+
+def trim_silence(samples: np.ndarray,
+                 sample_rate: int,
+                 threshold_db: float = -40.0,
+                 frame_seconds: float = 0.01,
+                 keep_seconds: float = 0.03) -> Tuple[int, int]:
+    """
+    Границы речи без тишины в начале и конце
+
+    Args:
+        samples: Моно аудио float32
+        sample_rate: Частота дискретизации
+        threshold_db: Кадр считается тишиной, если он тише самого громкого на столько дБ
+        frame_seconds: Длина кадра анализа
+        keep_seconds: Сколько тишины оставить по краям (чтобы не срезать атаку и затухание)
+
+    Returns:
+        (начало, конец) в сэмплах; (0, 0) для полной тишины
+    """
+    frame = max(1, int(frame_seconds * sample_rate))
+    if len(samples) < frame:
+        return 0, len(samples)
+    energy = frame_energy_db(samples, frame)
+    voiced = np.flatnonzero(energy > energy.max() + threshold_db)
+    if len(voiced) == 0 or energy.max() < -90:
+        return 0, 0
+    keep = int(keep_seconds * sample_rate)
+    start = max(0, voiced[0] * frame - keep)
+    stop = min(len(samples), (voiced[-1] + 1) * frame + keep)
+    return int(start), int(stop)
+
+
+def normalize_loudness(samples: np.ndarray,
+                       sample_rate: int,
+                       target_db: float = -20.0,
+                       max_gain_db: float = 12.0,
+                       peak: float = 0.98,
+                       frame_seconds: float = 0.02) -> float:
+    """
+    Приводит громкость речевых кадров к target_db RMS (на месте)
+
+    Тихие кадры (паузы) в расчет не входят, иначе короткая реплика с паузами
+    вышла бы громче длинной. Усиление ограничено max_gain_db и пиком peak.
+
+    Returns:
+        Примененное усиление в дБ
+    """
+    frame = max(1, int(frame_seconds * sample_rate))
+    if len(samples) < frame:
+        return 0.0
+    energy = frame_energy_db(samples, frame)
+    speech = energy[energy > energy.max() - 30]
+    if len(speech) == 0:
+        return 0.0
+    loudness = 10 * np.log10(np.mean(10 ** (speech / 10)))
+    gain_db = min(max_gain_db, target_db - loudness)
+    top = float(np.max(np.abs(samples)))
+    if top > 0:
+        gain_db = min(gain_db, 20 * np.log10(peak / top))
+    if abs(gain_db) > 0.05:
+        samples *= np.float32(10 ** (gain_db / 20))
+    return float(gain_db)
+
+
+@dataclass
+class AirtimeStats:
+    """
+    Экономия времени эфира на обрезке тишины
+
+    Attributes:
+        Messages: Обработано сообщений
+        SecondsIn: Секунд аудио от модели
+        SecondsTrimmed: Секунд тишины обрезано
+    """
+    Messages: int = 0
+    SecondsIn: float = 0.0
+    SecondsTrimmed: float = 0.0
+
+    @property
+    def SavedPerHour(self) -> float:
+        """Секунд эфира, сэкономленных на час озвученного чата."""
+        played = self.SecondsIn - self.SecondsTrimmed
+        return self.SecondsTrimmed * 3600 / played if played > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (f"сообщений: {self.Messages}, аудио: {self.SecondsIn:.1f} с, обрезано тишины: "
+                f"{self.SecondsTrimmed:.1f} с ({self.SavedPerHour / 60:.1f} мин на час эфира)")
+
+
+class AudioPostProcessor:
+    """
+    Обрезка тишины и выравнивание громкости синтезированного аудио
+    """
+
+    def __init__(self,
+                 threshold_db: float = -40.0,
+                 keep_seconds: float = 0.03,
+                 target_db: float = -20.0,
+                 max_gain_db: float = 12.0,
+                 gap_seconds: float = 0.1):
+        """
+        Args:
+            threshold_db: Порог тишины относительно самого громкого кадра
+            keep_seconds: Сколько тишины оставлять по краям
+            target_db: Целевая громкость речи (RMS, дБ от полной шкалы)
+            max_gain_db: Максимальное усиление тихих голосов
+            gap_seconds: Пауза между сообщениями
+        """
+        self.ThresholdDb = threshold_db
+        self.KeepSeconds = keep_seconds
+        self.TargetDb = target_db
+        self.MaxGainDb = max_gain_db
+        self.GapSeconds = gap_seconds
+        self.Stats = AirtimeStats()
+        self._statsLock = threading.Lock()
+
+    def process(self, audio: AudioBuffer) -> AudioBuffer:
+        """
+        Обрезает тишину и выравнивает громкость
+
+        Returns:
+            Представление исходного буфера (его release() освобождает и исходный)
+        """
+        start, stop = trim_silence(audio.Samples, audio.SampleRate, self.ThresholdDb, keep_seconds=self.KeepSeconds)
+        trimmed = audio.view(start, stop)
+        if trimmed.Samples.dtype == np.float32 and trimmed.Samples.flags.writeable:
+            normalize_loudness(trimmed.Samples, audio.SampleRate, self.TargetDb, self.MaxGainDb)
+        with self._statsLock:
+            self.Stats.Messages += 1
+            self.Stats.SecondsIn += audio.Duration
+            self.Stats.SecondsTrimmed += audio.Duration - trimmed.Duration
+        return trimmed
+
+
+def stretch_buffer(audio: AudioBuffer, rate: float) -> AudioBuffer:
+    """
+    Ускоряет буфер (release результата освобождает и исходный буфер)
+
+    Returns:
+        Тот же буфер при rate == 1, иначе новый
+    """
+    stretched = time_stretch(audio.Samples, rate, audio.SampleRate)
+    if stretched is audio.Samples:
+        return audio
+    return AudioBuffer(stretched, audio.SampleRate, release=audio.release)
+
+
+def benchmark(seconds: float = 10.0,
+              rates: Tuple[float, ...] = (1.05, 1.2, 1.5),
+              sample_rate: int = 48000) -> List[Tuple[float, float, float]]:
+    """
+    Скорость time_stretch на речеподобном сигнале
+
+    Returns:
+        Список (темп, секунд обработки, во сколько раз быстрее реального времени)
+    """
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    # Гармоники с меняющимся основным тоном и слоговой огибающей
+    pitch = 2 * np.pi * np.cumsum(140 + 30 * np.sin(2 * np.pi * 0.7 * t)) / sample_rate
+    signal = sum(np.sin(pitch * k) / k for k in range(1, 6)) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) ** 2
+    signal = (0.2 * signal).astype(np.float32)
+    results = []
+    for rate in rates:
+        start = time.perf_counter()
+        time_stretch(signal, rate, sample_rate)
+        elapsed = time.perf_counter() - start
+        results.append((rate, elapsed, seconds / elapsed))
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'темп':>6} {'обработка, с':>13} {'x реального времени':>20}")
+    for rate, elapsed, speedup in benchmark():
+        print(f"{rate:>6.2f} {elapsed:>13.3f} {speedup:>20.1f}")
@@ -0,0 +1,125 @@
+"""
+Запись синтезированного аудио в файлы.
+
+WAV пишется стандартным модулем wave (16 бит, моно) и не требует зависимостей.
+FLAC, Opus и Vorbis пишутся через soundfile (libsndfile), если он установлен:
+    pip install soundfile
+Запись потоковая - длинный рендер чата не держит весь звук в памяти.
+"""
+
+import os
+import wave
+from typing import Optional
+
+import numpy as np
+
+from AudioBuffer import AudioBuffer
+
+try:
+    import soundfile
+except ImportError:  # FLAC/Opus недоступны, WAV работает
+    soundfile = None
+
+
+# Формат -> (контейнер, кодек) для soundfile; None - модуль wave
+AUDIO_FORMATS = {
+    'wav': None,
+    'flac': ('FLAC', 'PCM_16'),
+    'opus': ('OGG', 'OPUS'),
+    'ogg': ('OGG', 'VORBIS'),
+}
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    """
+    Определяет формат по явному значению или расширению файла
+
+    Raises:
+        ValueError: Формат не поддерживается
+    """
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.') or 'wav').lower()
+    if fmt not in AUDIO_FORMATS:
+        raise ValueError(f"Формат {fmt} не поддерживается, доступны: {', '.join(AUDIO_FORMATS)}")
+    return fmt
+
+
+class AudioFileWriter:
+    """
+    Потоковая запись моно аудио в файл
+    """
+
+    def __init__(self, path: str, sample_rate: int, fmt: Optional[str] = None):
+        """
+        Args:
+            path: Путь к файлу
+            sample_rate: Частота дискретизации
+            fmt: wav, flac, opus или ogg (None - по расширению)
+
+        Raises:
+            ValueError: Формат не поддерживается
+            RuntimeError: Для формата нужен soundfile, а он не установлен
+        """
+        self.Path = path
+        self.SampleRate = sample_rate
+        self.Format = detect_format(path, fmt)
+        self.Frames = 0
+        self._wave = None
+        self._sound = None
+
+        codec = AUDIO_FORMATS[self.Format]
+        if codec is None:
+            self._wave = wave.open(path, 'wb')
+            self._wave.setnchannels(1)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(sample_rate)
+        else:
+            if soundfile is None:
+                raise RuntimeError(f"Для {self.Format} нужен пакет soundfile (pip install soundfile), доступен wav")
+            self._sound = soundfile.SoundFile(path, 'w', samplerate=sample_rate, channels=1,
+                                              format=codec[0], subtype=codec[1])
+
+    @property
+    def Seconds(self) -> float:
+        """Записано секунд."""
+        return self.Frames / self.SampleRate
+
+    def write(self, samples: np.ndarray) -> None:
+        """Дописывает сэмплы float32 (или int16)."""
+        if not len(samples):
+            return
+        if self._wave is not None:
+            pcm = AudioBuffer(samples, self.SampleRate).to_int16()
+            self._wave.writeframes(pcm.Samples.astype('<i2', copy=False).tobytes())
+        else:
+            self._sound.write(samples)
+        self.Frames += len(samples)
+
+    def write_silence(self, seconds: float) -> None:
+        """Дописывает тишину."""
+        self.write(np.zeros(int(seconds * self.SampleRate), dtype=np.float32))
+
+    def close(self) -> None:
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+        if self._sound is not None:
+            self._sound.close()
+            self._sound = None
+
+    def __enter__(self) -> "AudioFileWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_audio(path: str, samples: np.ndarray, sample_rate: int, fmt: Optional[str] = None) -> str:
+    """
+    Записывает аудио целиком в файл
+
+    Returns:
+        Использованный формат
+    """
+    with AudioFileWriter(path, sample_rate, fmt) as writer:
+        writer.write(samples)
+    return writer.Format
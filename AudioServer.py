@@ -0,0 +1,375 @@
+"""
+Локальная раздача озвученного чата по HTTP и WebSocket (для OBS и браузерных источников).
+
+    http://127.0.0.1:8787/            - страница-плеер с субтитрами (Browser Source в OBS)
+    http://127.0.0.1:8787/stream.wav  - непрерывный WAV (16 бит, моно) chunked-ответом
+    ws://127.0.0.1:8787/ws            - бинарные кадры PCM16 + текстовые кадры JSON с субтитрами
+
+Каждое сообщение кодируется в PCM16 один раз при публикации, а темп задает
+один поток-пейсер: он нарезает поток на куски реального времени, один раз
+собирает для куска HTTP chunk и WebSocket кадр и раздает одни и те же байты
+всем слушателям. Когда говорить нечего, раздается тишина, чтобы источник
+в OBS не считал поток оборвавшимся. Пропущенное сообщение (cancel) снимается
+из очереди или обрывается на текущем куске, страница-плеер сбрасывает
+уже запланированный звук.
+
+Opus не поддерживается: в стандартной библиотеке нет кодировщика, а потоковый
+Opus требует libopus; WAV по localhost не упирается в полосу.
+"""
+
+import base64
+import hashlib
+import json
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from AudioBuffer import AudioBuffer, AudioBufferPool
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+PLAYER_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Чат</title>
+<style>body{margin:0;background:transparent;font:28px sans-serif;color:#fff;text-shadow:0 0 6px #000}
+#c{position:fixed;bottom:16px;left:16px;right:16px}</style></head>
+<body><div id="c"></div><script>
+const rate=%d, c=document.getElementById("c");
+const ctx=new AudioContext({sampleRate:rate}); let at=0, srcs=[];
+document.body.onclick=()=>ctx.resume();
+function connect(){
+  const ws=new WebSocket("ws://"+location.host+"/ws"); ws.binaryType="arraybuffer";
+  ws.onmessage=e=>{
+    if(typeof e.data==="string"){const m=JSON.parse(e.data);
+      if(m.type==="cancel"){srcs.forEach(s=>s.stop());srcs=[];at=0;c.textContent="";}
+      if(m.type==="caption"){c.textContent=(m.author?m.author+": ":"")+m.text;
+        setTimeout(()=>{if(c.textContent.endsWith(m.text))c.textContent=""},m.duration*1000+1500);}
+      return;}
+    const pcm=new Int16Array(e.data), buf=ctx.createBuffer(1,pcm.length,rate), ch=buf.getChannelData(0);
+    for(let i=0;i<pcm.length;i++)ch[i]=pcm[i]/32768;
+    const src=ctx.createBufferSource(); src.buffer=buf; src.connect(ctx.destination);
+    at=Math.max(at,ctx.currentTime+0.05); src.start(at); at+=buf.duration;
+    srcs.push(src); src.onended=()=>{srcs=srcs.filter(s=>s!==src)};};
+  ws.onclose=()=>setTimeout(connect,1000);}
+connect();
+</script></body></html>
+"""
+
+
+def websocket_frame(payload: bytes, opcode: int) -> bytes:
+    """Кадр WebSocket от сервера (без маски, FIN=1)."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def wav_stream_header(sample_rate: int) -> bytes:
+    """Заголовок WAV для потока неизвестной длины (размеры - максимальные)."""
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF - 36))
+
+
+@dataclass
+class StreamStats:
+    """
+    Статистика раздачи
+
+    Attributes:
+        Messages: Опубликовано сообщений (каждое закодировано один раз)
+        Chunks: Роздано кусков (общих для всех слушателей)
+        Listeners: Слушателей сейчас
+        Dropped: Кусков выброшено у медленных слушателей
+    """
+    Messages: int = 0
+    Chunks: int = 0
+    Listeners: int = 0
+    Dropped: int = 0
+
+    def __str__(self) -> str:
+        return (f"сообщений: {self.Messages}, кусков: {self.Chunks}, "
+                f"слушателей: {self.Listeners}, выброшено: {self.Dropped}")
+
+
+class _Listener:
+    """Очередь готовых байт одного слушателя."""
+
+    def __init__(self, kind: str, backlog: int):
+        self.Kind = kind  # "http" или "ws"
+        self.Queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=backlog)
+
+
+class AudioStreamServer:
+    """
+    HTTP/WebSocket сервер потока озвучки
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 8787,
+                 sample_rate: int = 48000,
+                 chunk_seconds: float = 0.05,
+                 backlog_seconds: float = 2.0):
+        """
+        Args:
+            host: Адрес (по умолчанию только локальный)
+            port: Порт
+            sample_rate: Частота дискретизации потока
+            chunk_seconds: Длительность куска раздачи
+            backlog_seconds: Сколько аудио копить для медленного слушателя, прежде чем выбрасывать
+        """
+        self.Host = host
+        self.Port = port
+        self.SampleRate = sample_rate
+        self.ChunkSamples = max(1, int(chunk_seconds * sample_rate))
+        self.Stats = StreamStats()
+        self._backlog = max(2, int(backlog_seconds / chunk_seconds))
+        self._messages: "deque[tuple[int, bytes, Dict[str, Any]]]" = deque()
+        self._nextId = 0
+        self._currentId: Optional[int] = None  # Сообщение, которое сейчас раздает пейсер
+        self._cutCurrent = False
+        self._listeners: List[_Listener] = []
+        self._lock = threading.Lock()
+        # PCM16 сообщения собирается в заранее выделенном слоте, а не в новом массиве на каждое сообщение
+        self._pcmPool = AudioBufferPool(slots=2, capacity=30 * sample_rate, dtype=np.int16, sample_rate=sample_rate)
+        self._stopEvent = threading.Event()
+        self._silence = bytes(self.ChunkSamples * 2)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def Url(self) -> str:
+        return f"http://{self.Host}:{self.Port}/"
+
+    def start(self) -> None:
+        """Запускает HTTP сервер и пейсер в фоновых потоках."""
+        if self._server is not None:
+            return
+        owner = self
+
+        class Handler(_StreamHandler):
+            server_owner = owner
+
+        self._server = ThreadingHTTPServer((self.Host, self.Port), Handler)
+        self._server.daemon_threads = True
+        self._stopEvent.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="AudioServerHTTP", daemon=True),
+            threading.Thread(target=self._pace, name="AudioServerPacer", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"📡 Поток озвучки: {self.Url} (stream.wav, ws)")
+
+    def stop(self) -> None:
+        """Останавливает сервер и отключает слушателей."""
+        self._stopEvent.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            for listener in self._listeners:
+                self._offer(listener, None)
+            self._listeners.clear()
+
+    def publish(self, audio: AudioBuffer, meta: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Ставит сообщение в поток (кодируется в PCM16 один раз, здесь же)
+
+        Args:
+            audio: Аудио сообщения (после эффектов); буфер можно сразу освобождать
+            meta: Данные для субтитров (author, text, ...)
+
+        Returns:
+            Номер сообщения для cancel
+        """
+        converted = audio.to_int16(self._pcmPool)
+        pcm = converted.Samples.astype('<i2', copy=False).tobytes()
+        if converted is not audio:
+            converted.release()
+        caption = dict(meta or {}, type="caption", duration=round(audio.Duration, 3))
+        with self._lock:
+            message_id = self._nextId
+            self._nextId += 1
+            self._messages.append((message_id, pcm, caption))
+            self.Stats.Messages += 1
+        return message_id
+
+    def cancel(self, message_id: int) -> bool:
+        """
+        Снимает сообщение из потока (tts.skip_current): из очереди - целиком,
+        раздаваемое - обрывается на текущем куске
+
+        Returns:
+            False, если сообщение уже доиграло
+        """
+        with self._lock:
+            for index, message in enumerate(self._messages):
+                if message[0] == message_id:
+                    del self._messages[index]
+                    return True
+            if self._currentId == message_id:
+                self._cutCurrent = True
+                return True
+        return False
+
+    def _offer(self, listener: _Listener, data: Optional[bytes]) -> None:
+        """Кладет байты слушателю; у медленного выбрасывается самый старый кусок."""
+        while True:
+            try:
+                listener.Queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    listener.Queue.get_nowait()
+                    self.Stats.Dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _broadcast(self, http_bytes: Optional[bytes], ws_bytes: bytes) -> None:
+        with self._lock:
+            for listener in self._listeners:
+                data = ws_bytes if listener.Kind == "ws" else http_bytes
+                if data is not None:
+                    self._offer(listener, data)
+
+    def _pace(self) -> None:
+        """Раздает поток кусками в реальном времени (тишина, если сообщений нет)."""
+        chunk_bytes = self.ChunkSamples * 2
+        chunk_seconds = self.ChunkSamples / self.SampleRate
+        current = memoryview(b"")
+        position = 0
+        deadline = time.monotonic()
+        while not self._stopEvent.is_set():
+            with self._lock:
+                cut, self._cutCurrent = self._cutCurrent, False
+                if cut:
+                    current, position = memoryview(b""), 0
+                if position >= len(current):
+                    message = self._messages.popleft() if self._messages else None
+                    self._currentId = message[0] if message is not None else None
+                else:
+                    message = None
+            if cut:
+                # Плеер сбрасывает уже запланированные куски и субтитр
+                self._broadcast(None, websocket_frame(b'{"type": "cancel"}', 0x1))
+            if message is not None:
+                current, position = memoryview(message[1]), 0
+                caption = json.dumps(message[2], ensure_ascii=False).encode("utf-8")
+                self._broadcast(None, websocket_frame(caption, 0x1))
+            if position < len(current):
+                chunk = bytes(current[position:position + chunk_bytes])
+                position += chunk_bytes
+            else:
+                chunk = self._silence
+            # Кадры собираются один раз и раздаются всем слушателям
+            self._broadcast(b"%x\r\n" % len(chunk) + chunk + b"\r\n", websocket_frame(chunk, 0x2))
+            self.Stats.Chunks += 1
+            deadline += chunk_seconds * len(chunk) / chunk_bytes
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                self._stopEvent.wait(delay)
+            elif delay < -1.0:
+                deadline = time.monotonic()  # Отстали (сон ОС) - не догоняем рывком
+
+    def _add_listener(self, kind: str) -> _Listener:
+        listener = _Listener(kind, self._backlog)
+        with self._lock:
+            self._listeners.append(listener)
+            self.Stats.Listeners = len(self._listeners)
+        return listener
+
+    def _remove_listener(self, listener: _Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+            self.Stats.Listeners = len(self._listeners)
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов: страница, WAV поток и WebSocket."""
+
+    server_owner: AudioStreamServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass  # Не засоряем консоль чата
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/":
+            body = (PLAYER_PAGE % self.server_owner.SampleRate).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/stream.wav":
+            self._serve_wav()
+        elif path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self._serve_websocket()
+        else:
+            self.send_error(404)
+
+    def _pump(self, listener: _Listener) -> None:
+        """Отправляет слушателю байты из его очереди, пока он подключен."""
+        owner = self.server_owner
+        try:
+            while True:
+                data = listener.Queue.get()
+                if data is None:
+                    break
+                self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError, OSError):
+            pass
+        finally:
+            owner._remove_listener(listener)
+            self.close_connection = True
+
+    def _serve_wav(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        header = wav_stream_header(self.server_owner.SampleRate)
+        self.wfile.write(b"%x\r\n" % len(header) + header + b"\r\n")
+        self._pump(self.server_owner._add_listener("http"))
+
+    def _serve_websocket(self) -> None:
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()).decode("ascii")
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self._pump(self.server_owner._add_listener("ws"))
+
+
+if __name__ == "__main__":
+    # Проверка без модели: тон раз в две секунды с субтитром
+    server = AudioStreamServer()
+    server.start()
+    t = np.arange(int(0.5 * server.SampleRate), dtype=np.float32) / server.SampleRate
+    tone = AudioBuffer((0.2 * np.sin(2 * np.pi * 440 * t)).astype(np.float32), server.SampleRate)
+    try:
+        while True:
+            server.publish(tone, {"author": "test", "text": "проверка"})
+            time.sleep(2)
+            print(f"📊 {server.Stats}")
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,373 @@
+"""
+Движки синтеза речи с общим интерфейсом.
+
+TTSBackend описывает то, что нужно очереди tts: синтез задания (с разделением
+на отправку и получение результата для конвейера), потоковую выдачу кусками
+и возможности движка. Реализации:
+    SileroBackend  - Silero в потоке или через пул процессов (SynthPool)
+    Pyttsx3Backend - системный синтезатор через pyttsx3 (SAPI5 / espeak / nsss)
+    EspeakBackend  - espeak-ng напрямую (дешево, без установки Python пакетов)
+    NullBackend    - тишина (тесты, бенчмарки, "немой" режим)
+
+BackendScheduler отправляет сообщения низкого приоритета в дешевый движок,
+когда основной не успевает: его RTF или глубина очереди выше порога.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from AudioBuffer import AudioBuffer
+from SileroModel import SileroModelLoader, SynthesisJob, SsmlMetrics, synthesize_job
+
+try:
+    import pyttsx3
+except ImportError:
+    pyttsx3 = None
+
+
+@dataclass(frozen=True)
+class BackendCapabilities:
+    """
+    Возможности движка
+
+    Attributes:
+        Name: Название
+        Ssml: Понимает SSML (иначе в задание идет только текст)
+        Speakers: Голоса движка (пусто - голос задания игнорируется)
+        Streaming: Отдает аудио кусками до окончания синтеза
+        Cost: Относительная стоимость синтеза (для выбора движка)
+    """
+    Name: str
+    Ssml: bool = False
+    Speakers: Tuple[str, ...] = ()
+    Streaming: bool = False
+    Cost: float = 1.0
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    """Линейная передискретизация (для движков с другой частотой)."""
+    if source_rate == target_rate or not len(samples):
+        return samples
+    length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(length, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def read_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Разбирает WAV (PCM 8/16/32 бит) в моно float32
+
+    Returns:
+        Кортеж (сэмплы, частота дискретизации)
+    """
+    with wave.open(io.BytesIO(data), 'rb') as source:
+        rate, channels, width = source.getframerate(), source.getnchannels(), source.getsampwidth()
+        frames = source.readframes(source.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    else:
+        dtype = {2: '<i2', 4: '<i4'}[width]
+        samples = np.frombuffer(frames, dtype=dtype).astype(np.float32) / float(1 << (8 * width - 1))
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+class TTSBackend:
+    """
+    Интерфейс движка синтеза
+
+    Наследники реализуют capabilities и synthesize; submit/result по умолчанию
+    синтезируют при получении результата, а движки с собственным конвейером
+    (пул процессов) переопределяют их.
+    """
+
+    def __init__(self):
+        self.Rtf: Optional[float] = None  # Сглаженный real-time factor последних синтезов
+        self._rtfAt = 0.0
+        self._rtfLock = threading.Lock()
+
+    def capabilities(self) -> BackendCapabilities:
+        raise NotImplementedError
+
+    @property
+    def Available(self) -> bool:
+        """Движок можно использовать в этой системе."""
+        return True
+
+    def preload(self) -> None:
+        """Фоновая подготовка движка (загрузка модели)."""
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        """
+        Синтезирует задание
+
+        Returns:
+            Кортеж (аудио с частотой job.SampleRate, был ли использован SSML)
+        """
+        raise NotImplementedError
+
+    def submit(self, job: SynthesisJob) -> Any:
+        """Начинает синтез задания; возвращает ключ для result."""
+        return (job,)
+
+    def result(self, handle: Any) -> Tuple[AudioBuffer, bool]:
+        """Дожидается результата задания, отправленного через submit."""
+        started = time.perf_counter()
+        audio, used_ssml = self.synthesize(handle[0])
+        self._measure(time.perf_counter() - started, audio)
+        return audio, used_ssml
+
+    def cancel(self, handle: Any) -> None:
+        """Отменяет задание, отправленное через submit (результат забирать не нужно)."""
+        # Базовый submit ничего не запускает: синтез идет в result, отменять нечего
+
+    def stream(self, job: SynthesisJob, chunk_seconds: float = 0.5) -> Iterator[AudioBuffer]:
+        """
+        Выдает аудио кусками
+
+        Базовая реализация синтезирует целиком и нарезает результат без копирования;
+        release() куска ничего не освобождает, исходный буфер освобождается после последнего.
+        """
+        audio, _ = self.result(self.submit(job))
+        step = max(1, int(chunk_seconds * audio.SampleRate))
+        try:
+            for start in range(0, len(audio), step):
+                yield AudioBuffer(audio.Samples[start:start + step], audio.SampleRate, owner=audio)
+        finally:
+            audio.release()
+
+    def _measure(self, elapsed: float, audio: AudioBuffer) -> None:
+        """
+        Обновляет сглаженный RTF (время самого синтеза / длительность)
+
+        Время от submit до result не годится: result зовут после воспроизведения
+        предыдущего сообщения, и в RTF попало бы ожидание эфира.
+        """
+        if not audio.Duration:
+            return
+        rtf = elapsed / audio.Duration
+        with self._rtfLock:
+            self.Rtf = rtf if self.Rtf is None else 0.7 * self.Rtf + 0.3 * rtf
+            self._rtfAt = time.monotonic()
+
+    def recent_rtf(self, max_age: float) -> Optional[float]:
+        """RTF, если он измерен не раньше max_age секунд назад (иначе None)."""
+        with self._rtfLock:
+            return self.Rtf if time.monotonic() - self._rtfAt <= max_age else None
+
+
+class SileroBackend(TTSBackend):
+    """
+    Silero: SSML, голоса Silero, синтез в потоке или через пул процессов
+    """
+
+    def __init__(self, loader: SileroModelLoader, pool_getter: Callable[[], Any] = lambda: None,
+                 speakers: Tuple[str, ...] = ()):
+        """
+        Args:
+            loader: Загрузчик модели для синтеза в потоке
+            pool_getter: Возвращает SynthesisPool или None (пул создается лениво)
+            speakers: Голоса модели
+        """
+        super().__init__()
+        self.Loader = loader
+        self._poolGetter = pool_getter
+        self._speakers = tuple(speakers)
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("silero", Ssml=True, Speakers=self._speakers, Cost=1.0)
+
+    @property
+    def Available(self) -> bool:
+        # Пока модель грузится, движок считается доступным (синтез ее дождется)
+        return self.Loader.Error is None
+
+    def preload(self) -> None:
+        pool = self._poolGetter()
+        if pool is not None:
+            pool.start()
+        else:
+            self.Loader.start()
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        tensor, used_ssml = synthesize_job(self.Loader.apply_tts, job)
+        return AudioBuffer.from_tensor(tensor, job.SampleRate), used_ssml
+
+    def submit(self, job: SynthesisJob) -> Any:
+        pool = self._poolGetter()
+        if pool is None:
+            return super().submit(job)
+        return job, pool, pool.submit(job)
+
+    def result(self, handle: Any) -> Tuple[AudioBuffer, bool]:
+        if len(handle) == 1:
+            audio, used_ssml = super().result(handle)
+        else:
+            _, pool, seq = handle
+            audio, used_ssml, elapsed = pool.result_timed(seq)
+            self._measure(elapsed, audio)
+        SsmlMetrics.synthesized(handle[0], used_ssml)
+        return audio, used_ssml
+
+    def cancel(self, handle: Any) -> None:
+        if len(handle) == 3:
+            _, pool, seq = handle
+            pool.cancel(seq)
+
+
+class Pyttsx3Backend(TTSBackend):
+    """
+    Системный синтезатор через pyttsx3 (на Linux - espeak)
+    """
+
+    def __init__(self, voice: str = 'ru', rate: Optional[int] = None):
+        """
+        Args:
+            voice: Голос pyttsx3 (id или язык)
+            rate: Слов в минуту (None - по умолчанию)
+        """
+        super().__init__()
+        self.Voice = voice
+        self.WordsPerMinute = rate
+        self._lock = threading.Lock()  # Движки pyttsx3 не потокобезопасны
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("pyttsx3", Cost=0.2)
+
+    @property
+    def Available(self) -> bool:
+        return pyttsx3 is not None
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        if pyttsx3 is None:
+            raise RuntimeError("pyttsx3 не установлен")
+        handle, path = tempfile.mkstemp(suffix=".wav")
+        os.close(handle)
+        try:
+            with self._lock:
+                engine = pyttsx3.init()
+                engine.setProperty('voice', self.Voice)
+                if self.WordsPerMinute:
+                    engine.setProperty('rate', self.WordsPerMinute)
+                engine.save_to_file(job.Text, path)
+                engine.runAndWait()
+                engine.stop()
+            with open(path, "rb") as file:
+                samples, rate = read_wav(file.read())
+        finally:
+            os.remove(path)
+        return AudioBuffer(resample(samples, rate, job.SampleRate), job.SampleRate), False
+
+
+class EspeakBackend(TTSBackend):
+    """
+    espeak-ng (или espeak) в отдельном процессе, WAV через stdout
+    """
+
+    def __init__(self, voice: str = 'ru', words_per_minute: int = 190):
+        """
+        Args:
+            voice: Голос espeak
+            words_per_minute: Скорость речи
+        """
+        super().__init__()
+        self.Voice = voice
+        self.WordsPerMinute = words_per_minute
+        self._binary = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("espeak", Cost=0.1)
+
+    @property
+    def Available(self) -> bool:
+        return self._binary is not None
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        if self._binary is None:
+            raise RuntimeError("espeak-ng не найден")
+        output = subprocess.run([self._binary, "-v", self.Voice, "-s", str(self.WordsPerMinute), "--stdout", job.Text],
+                                capture_output=True, check=True, timeout=30).stdout
+        samples, rate = read_wav(output)
+        return AudioBuffer(resample(samples, rate, job.SampleRate), job.SampleRate), False
+
+
+class NullBackend(TTSBackend):
+    """
+    Тишина длительностью, пропорциональной тексту
+    """
+
+    def __init__(self, seconds_per_char: float = 0.0):
+        """
+        Args:
+            seconds_per_char: Длительность тишины на символ (0 - пустое аудио)
+        """
+        super().__init__()
+        self.SecondsPerChar = seconds_per_char
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("null", Cost=0.0)
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        samples = int(len(job.Text) * self.SecondsPerChar * job.SampleRate)
+        return AudioBuffer(np.zeros(samples, dtype=np.float32), job.SampleRate), False
+
+
+class BackendScheduler:
+    """
+    Выбор движка для сообщения: основной или дешевый под перегрузкой
+    """
+
+    def __init__(self,
+                 fallback: Optional[TTSBackend],
+                 max_rtf: float = 0.8,
+                 max_queue: int = 6,
+                 priority_kinds: Tuple[str, ...] = ("system", "superchat"),
+                 rtf_max_age: float = 20.0):
+        """
+        Args:
+            fallback: Дешевый движок (None - не переключаться)
+            max_rtf: Порог RTF основного движка
+            max_queue: Порог глубины очереди
+            rtf_max_age: Сколько секунд доверять последнему RTF; без свежих замеров
+                         (все ушло в дешевый движок) основной движок пробуется снова
+            priority_kinds: Типы сообщений, которые всегда идут в основной движок
+        """
+        self.Fallback = fallback
+        self.MaxRtf = max_rtf
+        self.MaxQueue = max_queue
+        self.PriorityKinds = set(priority_kinds)
+        self.RtfMaxAge = rtf_max_age
+        self.FallbackCount = 0
+
+    def choose(self, primary: TTSBackend, kind: str, queue_depth: int) -> TTSBackend:
+        """
+        Args:
+            primary: Основной движок
+            kind: Тип сообщения
+            queue_depth: Сообщений в очереди и в синтезе
+        """
+        fallback = self.Fallback
+        if fallback is None or fallback is primary or not fallback.Available:
+            return primary
+        if not primary.Available:
+            self.FallbackCount += 1
+            return fallback
+        if kind in self.PriorityKinds:
+            return primary
+        rtf = primary.recent_rtf(self.RtfMaxAge)
+        overloaded = queue_depth > self.MaxQueue or (rtf is not None and rtf > self.MaxRtf)
+        if overloaded:
+            self.FallbackCount += 1
+            return fallback
+        return primary
@@ -0,0 +1,97 @@
+"""
+Отмена сообщений в очереди озвучки.
+
+У каждого сообщения (VoiceRouter.SpeechItem) свой CancellationToken.
+Отмена снимает сообщение на любом этапе: в очереди оно пропускается,
+до синтеза не готовится SSML, отправленное в пул задание не синтезируется
+(если воркер еще не взял его) или сразу освобождается, а воспроизведение
+прерывается посреди буфера - ожидание конца звука идет через token.wait,
+а не time.sleep.
+
+Задержка пропуска (от cancel() до остановки звука) учитывается в SkipStats.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+class CancellationToken:
+    """
+    Флаг отмены одного сообщения
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.CancelledAt: Optional[float] = None
+
+    def cancel(self) -> bool:
+        """
+        Отменяет сообщение
+
+        Returns:
+            False, если оно уже было отменено
+        """
+        if self._event.is_set():
+            return False
+        self.CancelledAt = time.perf_counter()
+        self._event.set()
+        return True
+
+    @property
+    def Cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ждет отмены не дольше timeout (прерываемая замена time.sleep)
+
+        Returns:
+            True, если сообщение отменено
+        """
+        return self._event.wait(timeout)
+
+
+@dataclass
+class SkipStats:
+    """
+    Статистика отмен
+
+    Attributes:
+        Skipped: Прервано во время воспроизведения
+        Cleared: Снято до воспроизведения (в очереди или в синтезе)
+        LatencyTotalMs: Сумма задержек пропуска (cancel -> звук остановлен)
+        LatencyMaxMs: Максимальная задержка пропуска
+
+    Счетчики меняются из потока очереди и из потока вызывающего (skip_current,
+    clear_pending) - только через skipped() и cleared().
+    """
+    Skipped: int = 0
+    Cleared: int = 0
+    LatencyTotalMs: float = 0.0
+    LatencyMaxMs: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def LatencyMs(self) -> float:
+        """Средняя задержка пропуска."""
+        return self.LatencyTotalMs / self.Skipped if self.Skipped else 0.0
+
+    def skipped(self, token: CancellationToken) -> None:
+        """Учитывает прерванное воспроизведение (звук уже остановлен)."""
+        latency = (time.perf_counter() - token.CancelledAt) * 1000
+        with self._lock:
+            self.Skipped += 1
+            self.LatencyTotalMs += latency
+            self.LatencyMaxMs = max(self.LatencyMaxMs, latency)
+
+    def cleared(self, count: int = 1) -> None:
+        """Учитывает сообщения, снятые до воспроизведения."""
+        if count:
+            with self._lock:
+                self.Cleared += count
+
+    def __str__(self) -> str:
+        return (f"прервано: {self.Skipped}, снято из очереди: {self.Cleared}, "
+                f"задержка пропуска: {self.LatencyMs:.1f} мс (макс. {self.LatencyMaxMs:.1f} мс)")
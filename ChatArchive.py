@@ -0,0 +1,335 @@
+"""
+Локальный архив сообщений чата с индексами и полнотекстовым поиском.
+
+Подписчик YouTubeChatParser (parser.on(archive.add)) только кладет сообщение
+в очередь; фоновый поток пишет их пачками в SQLite (WAL, одна транзакция на
+пачку). Таблица messages проиндексирована по видео, автору и времени, текст
+сообщений индексируется FTS5 (если sqlite собран без FTS5 - поиск через LIKE).
+
+Запросы: search ("что писали про босса"), by_author ("что говорил автор"),
+messages_per_minute, top_authors. Колоночная выгрузка для аналитики - export:
+Parquet через pyarrow, если он установлен (pip install pyarrow), иначе JSON
+вида {"колонка": [значения]}.
+
+Бенчмарк вставки и запросов:
+    python ChatArchive.py [сообщений]
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from queue import Empty, Full, Queue
+from typing import List, Optional, Tuple
+
+from Parser import ChatMessage
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Выгрузка в JSON
+    pyarrow = None
+
+
+COLUMNS = ('message_id', 'video_id', 'author', 'message', 'timestamp', 'timestamp_formatted')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    message_id TEXT UNIQUE,
+    video_id TEXT NOT NULL,
+    author TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    timestamp_formatted TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_video_time ON messages (video_id, timestamp);
+CREATE INDEX IF NOT EXISTS messages_author_time ON messages (author, timestamp);
+CREATE INDEX IF NOT EXISTS messages_time ON messages (timestamp);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    message, author, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, message, author) VALUES (new.id, new.message, new.author);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, message, author) VALUES ('delete', old.id, old.message, old.author);
+END;
+"""
+
+
+@dataclass
+class ArchiveStats:
+    """
+    Статистика архива
+
+    Attributes:
+        Queued: Принято сообщений
+        Written: Записано в базу (дубликаты по message_id не учитываются)
+        Dropped: Отброшено из-за переполнения очереди
+        Batches: Транзакций записи
+    """
+    Queued: int = 0
+    Written: int = 0
+    Dropped: int = 0
+    Batches: int = 0
+
+    def __str__(self) -> str:
+        return (f"принято: {self.Queued}, записано: {self.Written}, отброшено: {self.Dropped}, "
+                f"транзакций: {self.Batches}")
+
+
+class ChatArchive:
+    """
+    Архив сообщений чата в SQLite
+    """
+
+    def __init__(self, path: str = "chat_archive.sqlite", batch_size: int = 500,
+                 flush_seconds: float = 1.0, max_queue: int = 100000):
+        """
+        Args:
+            path: Файл базы
+            batch_size: Максимум сообщений в одной транзакции
+            flush_seconds: Как долго поток копит сообщения перед записью
+            max_queue: Размер очереди (при переполнении сообщения отбрасываются)
+        """
+        self.Path = path
+        self.BatchSize = batch_size
+        self.FlushSeconds = flush_seconds
+        self.Stats = ArchiveStats()
+        self.HasFts = False
+
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._startLock = threading.Lock()
+        self._initialize()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.Path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _initialize(self) -> None:
+        """Создает таблицы, индексы и FTS5 (если доступен)."""
+        connection = self._connect()
+        try:
+            connection.executescript(SCHEMA)
+            try:
+                connection.executescript(FTS_SCHEMA)
+                self.HasFts = True
+            except sqlite3.OperationalError:
+                print("⚠️ SQLite без FTS5: поиск по архиву будет медленным (LIKE)")
+            connection.commit()
+        finally:
+            connection.close()
+
+    def add(self, message: ChatMessage) -> bool:
+        """
+        Ставит сообщение в очередь записи (подписчик YouTubeChatParser.on)
+
+        Returns:
+            False, если очередь переполнена и сообщение отброшено
+        """
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((message.MessageId, message.VideoId, message.Author, message.Message,
+                                    message.Timestamp, message.TimestampFormatted))
+            self.Stats.Queued += 1
+            return True
+        except Full:
+            self.Stats.Dropped += 1
+            return False
+
+    def _start(self) -> None:
+        with self._startLock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ChatArchive", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Поток записи: пачка до BatchSize сообщений или FlushSeconds - одна транзакция."""
+        connection = self._connect()
+        closing = False
+        while not closing:
+            rows: List[Tuple] = []
+            row = self._queue.get()
+            deadline = time.monotonic() + self.FlushSeconds
+            while True:
+                if row is None:
+                    closing = True
+                else:
+                    rows.append(row)
+                if closing or len(rows) >= self.BatchSize:
+                    break
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except Empty:
+                    break
+            if rows:
+                try:
+                    with connection:
+                        cursor = connection.executemany(
+                            f"INSERT OR IGNORE INTO messages ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    self.Stats.Written += cursor.rowcount
+                    self.Stats.Batches += 1
+                except sqlite3.Error as e:
+                    print(f"❌ Ошибка записи архива чата: {e}")
+            for _ in range(len(rows) + closing):
+                self._queue.task_done()
+        connection.close()
+
+    def flush(self) -> None:
+        """Дожидается записи всех принятых сообщений."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Дописывает очередь и останавливает поток записи."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        """Запрос в отдельном соединении (WAL позволяет читать во время записи)."""
+        connection = sqlite3.connect(self.Path, timeout=30)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _filters(video_id: Optional[str], author: Optional[str], prefix: str = "") -> Tuple[str, Tuple]:
+        conditions, params = [], []
+        if video_id is not None:
+            conditions.append(f"{prefix}video_id = ?")
+            params.append(video_id)
+        if author is not None:
+            conditions.append(f"{prefix}author = ?")
+            params.append(author)
+        return ''.join(f" AND {condition}" for condition in conditions), tuple(params)
+
+    @staticmethod
+    def _to_messages(rows: List[Tuple]) -> List[ChatMessage]:
+        return [ChatMessage(Author=author, Message=message, Timestamp=timestamp,
+                            TimestampFormatted=formatted or '', VideoId=video_id, MessageId=message_id)
+                for message_id, video_id, author, message, timestamp, formatted in rows]
+
+    def search(self, query: str, video_id: Optional[str] = None, author: Optional[str] = None,
+               limit: int = 100) -> List[ChatMessage]:
+        """
+        Полнотекстовый поиск по сообщениям (синтаксис FTS5: слова, "фраза", префикс*)
+
+        Запрос, который FTS5 не разбирает ("c++", незакрытая кавычка), ищется как подстрока через LIKE.
+
+        Returns:
+            Сообщения от новых к старым
+        """
+        columns = ', '.join(f"m.{column}" for column in COLUMNS)
+        filters, params = self._filters(video_id, author, "m.")
+        if self.HasFts:
+            sql = (f"SELECT {columns} FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                   f"WHERE messages_fts MATCH ?{filters} ORDER BY m.timestamp DESC LIMIT ?")
+            try:
+                return self._to_messages(self._query(sql, (query, *params, limit)))
+            except sqlite3.OperationalError:
+                pass  # Синтаксическая ошибка FTS5 - ищем подстроку
+        sql = (f"SELECT {columns} FROM messages m WHERE m.message LIKE '%' || ? || '%'{filters} "
+               f"ORDER BY m.timestamp DESC LIMIT ?")
+        return self._to_messages(self._query(sql, (query, *params, limit)))
+
+    def by_author(self, author: str, video_id: Optional[str] = None, limit: int = 100) -> List[ChatMessage]:
+        """Сообщения автора от новых к старым."""
+        filters, params = self._filters(video_id, author)
+        return self._to_messages(self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM messages WHERE 1{filters} ORDER BY timestamp DESC LIMIT ?",
+            (*params, limit)))
+
+    def messages_per_minute(self, video_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        """
+        Returns:
+            [(начало минуты, Unix секунды; сообщений за минуту)] по времени
+        """
+        filters, params = self._filters(video_id, None)
+        return self._query(
+            f"SELECT timestamp / 60000000 * 60 AS minute, COUNT(*) FROM messages WHERE 1{filters} "
+            f"GROUP BY minute ORDER BY minute", params)
+
+    def top_authors(self, video_id: Optional[str] = None, limit: int = 10) -> List[Tuple[str, int]]:
+        """Самые активные авторы: [(автор, сообщений)]."""
+        filters, params = self._filters(video_id, None)
+        return self._query(
+            f"SELECT author, COUNT(*) AS count FROM messages WHERE 1{filters} "
+            f"GROUP BY author ORDER BY count DESC LIMIT ?", (*params, limit))
+
+    def export(self, path: str, video_id: Optional[str] = None) -> str:
+        """
+        Колоночная выгрузка сообщений для аналитики
+
+        Args:
+            path: Файл (*.parquet - нужен pyarrow, иначе JSON с колонками)
+            video_id: Только один стрим (None - весь архив)
+
+        Returns:
+            Использованный формат: parquet или json
+
+        Raises:
+            RuntimeError: Запрошен parquet, а pyarrow не установлен
+        """
+        filters, params = self._filters(video_id, None)
+        rows = self._query(f"SELECT {', '.join(COLUMNS)} FROM messages WHERE 1{filters} ORDER BY timestamp", params)
+        columns = {name: [row[index] for row in rows] for index, name in enumerate(COLUMNS)}
+
+        if os.path.splitext(path)[1].lower() == '.parquet':
+            if pyarrow is None:
+                raise RuntimeError("Для parquet нужен пакет pyarrow (pip install pyarrow), доступен json")
+            pyarrow.parquet.write_table(pyarrow.table(columns), path)
+            return 'parquet'
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(columns, file, ensure_ascii=False)
+        return 'json'
+
+
+def benchmark(count: int = 100000, path: str = "chat_archive_benchmark.sqlite") -> None:
+    """Задержка add на горячем пути, скорость записи и время запросов."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    archive = ChatArchive(path, max_queue=count + 1)
+    words = ("привет", "как", "дела", "босс", "уровень", "стрим", "круто", "лол", "играем", "сегодня")
+    now = int(time.time() * 1_000_000)
+    messages = [ChatMessage(f"автор{i % 500}", " ".join(words[(i * k) % len(words)] for k in range(1, 6)),
+                            now + i * 20_000, "", "video", f"id{i}") for i in range(count)]
+
+    start = time.perf_counter()
+    for message in messages:
+        archive.add(message)
+    added = time.perf_counter() - start
+    archive.flush()
+    written = time.perf_counter() - start
+    print(f"add: {added / count * 1e6:.1f} мкс/сообщение, запись: {count / written:.0f} сообщений/с, "
+          f"FTS5: {archive.HasFts}, {archive.Stats}")
+
+    for name, query in (("search", lambda: archive.search("босс уровень", limit=50)),
+                        ("by_author", lambda: archive.by_author("автор7", limit=50)),
+                        ("per_minute", lambda: archive.messages_per_minute("video")),
+                        ("top_authors", lambda: archive.top_authors("video"))):
+        start = time.perf_counter()
+        result = query()
+        print(f"{name:>12}: {(time.perf_counter() - start) * 1000:.1f} мс, строк: {len(result)}")
+    archive.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,158 @@
+"""
+Запись и воспроизведение сырых ответов get_live_chat.
+
+Файл записи - gzip с JSON-строками, дописывается без перезаписи
+(каждая сессия записи - отдельный gzip member, их корректно читает gzip.open).
+Первая строка сессии - заголовок с ID видео и временем запуска парсера
+(сообщения до него живой запуск не озвучивал), далее по строке на каждый ответ
+с временем получения. Позволяет гонять TTS/SSML конвейер без сети,
+воспроизводить прошедшие стримы и делать повторяемые нагрузочные тесты.
+"""
+
+import gzip
+import json
+import time
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+
+
+class ChatRecorder:
+    """
+    Дописывает сырые ответы чата в сжатый файл
+    """
+
+    def __init__(self, path: str, video_id: Optional[str] = None):
+        """
+        Args:
+            path: Путь к файлу записи (обычно *.jsonl.gz)
+            video_id: ID видео, сохраняется в заголовке сессии
+        """
+        self.Path = path
+        self.VideoId = video_id
+        self.StartTime: Optional[int] = None  # Время запуска парсера (Unix секунды), задает парсер
+        self.RecordsWritten = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        """Открывает файл на дозапись и пишет заголовок сессии."""
+        self._file = gzip.open(self.Path, "at", encoding="utf-8")
+        self._write_line({'type': 'session', 't': time.time(), 'video_id': self.VideoId, 'start': self.StartTime})
+
+    def _write_line(self, record: Dict) -> None:
+        """Пишет одну JSON-строку в файл записи."""
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        # Сбрасываем сжатый блок, чтобы запись читалась даже после падения процесса
+        self._file.flush()
+
+    def record(self, data: Dict, received_at: Optional[float] = None) -> None:
+        """
+        Сохраняет один ответ get_live_chat
+
+        Args:
+            data: Распарсенный JSON ответа
+            received_at: Время получения (Unix timestamp), по умолчанию - текущее
+        """
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._write_line({
+                'type': 'response',
+                't': received_at if received_at is not None else time.time(),
+                'data': data
+            })
+            self.RecordsWritten += 1
+
+    def close(self) -> None:
+        """Закрывает файл записи."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ChatReplay:
+    """
+    Источник ответов из файла записи с сохранением исходных интервалов
+
+    Скорость: 1.0 - реальное время, N - в N раз быстрее, 0 или None - без пауз.
+    """
+
+    def __init__(self, path: str, speed: Optional[float] = 1.0):
+        """
+        Args:
+            path: Путь к файлу записи
+            speed: Множитель скорости воспроизведения
+        """
+        self.Path = path
+        self.Speed = speed
+        self.VideoId = self._read_video_id()
+        # Время запуска парсера текущей сессии записи (None - в старых записях его нет)
+        self.SessionStart: Optional[int] = None
+
+    def _read_video_id(self) -> Optional[str]:
+        """Читает ID видео из первого заголовка сессии."""
+        for record in self._iter_records():
+            if record.get('type') == 'session':
+                return record.get('video_id')
+            break
+        return None
+
+    def _iter_records(self) -> Iterator[Dict]:
+        """Читает все записи файла по порядку."""
+        with gzip.open(self.Path, "rt", encoding="utf-8") as file:
+            try:
+                for line in file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Оборванная строка после аварийного завершения записи
+                        continue
+            except EOFError:
+                # Последний gzip member не был закрыт - читаем сколько успели записать
+                return
+
+    def responses(self, stop_event: Optional[threading.Event] = None) -> Iterator[Tuple[float, Dict]]:
+        """
+        Выдает записанные ответы, выдерживая паузы между ними
+
+        Args:
+            stop_event: Событие для досрочной остановки (прерывает ожидание)
+
+        Yields:
+            Кортеж (исходное время получения, данные ответа)
+        """
+        first_time: Optional[float] = None
+        replay_start = time.monotonic()
+
+        for record in self._iter_records():
+            if record.get('type') == 'session':
+                # Паузу между сессиями записи не воспроизводим
+                self.SessionStart = record.get('start')
+                first_time = None
+                replay_start = time.monotonic()
+                continue
+            if record.get('type') != 'response':
+                continue
+
+            received_at = record.get('t', 0.0)
+            if first_time is None:
+                first_time = received_at
+
+            if self.Speed:
+                target = replay_start + (received_at - first_time) / self.Speed
+                delay = target - time.monotonic()
+                if delay > 0:
+                    if stop_event is not None:
+                        if stop_event.wait(delay):
+                            return
+                    else:
+                        time.sleep(delay)
+
+            if stop_event is not None and stop_event.is_set():
+                return
+
+            yield received_at, record.get('data', {})
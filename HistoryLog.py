@@ -0,0 +1,217 @@
+"""
+Журнал истории чата и озвучки (history.txt).
+
+Сообщения чата (ChatMessage) и озвученный текст пишутся в один формат -
+строка TSV на запись, поля через табуляцию:
+    время ISO 8601, вид (chat/spoken), ID видео, автор, текст
+Табуляции, переводы строк и обратный слэш в полях экранируются (\\t, \\n, \\\\).
+
+Запись идет в фоновом потоке: горячий путь только кладет строку в ограниченную
+очередь и никогда не ждет диск (при переполнении запись отбрасывается и
+учитывается в Stats.Dropped). Поток пишет пачками в режиме дозаписи,
+периодически делает fsync и ротирует файл по размеру и времени:
+history.txt -> history.txt.1 -> ... -> history.txt.N.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from queue import Empty, Full, Queue
+from typing import List, Optional
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_record(kind: str, text: str, author: Optional[str] = None, stream: Optional[str] = None,
+                  timestamp: Optional[float] = None) -> str:
+    """
+    Строка журнала
+
+    Args:
+        kind: Вид записи (chat - сообщение чата, spoken - озвученный текст)
+        text: Текст
+        author: Автор
+        stream: ID видео
+        timestamp: Unix время в секундах (None - текущее)
+    """
+    moment = datetime.fromtimestamp(time.time() if timestamp is None else timestamp)
+    fields = (moment.isoformat(timespec='milliseconds'), kind, stream or '', author or '', text)
+    return '\t'.join(field.translate(_ESCAPES) for field in fields) + '\n'
+
+
+@dataclass
+class HistoryStats:
+    """
+    Статистика журнала
+
+    Attributes:
+        Written: Записано строк
+        Dropped: Отброшено из-за переполнения очереди
+        Batches: Вызовов write
+        Syncs: Вызовов fsync
+        Rotations: Ротаций файла
+    """
+    Written: int = 0
+    Dropped: int = 0
+    Batches: int = 0
+    Syncs: int = 0
+    Rotations: int = 0
+
+    def __str__(self) -> str:
+        return (f"записано: {self.Written}, отброшено: {self.Dropped}, пачек: {self.Batches}, "
+                f"fsync: {self.Syncs}, ротаций: {self.Rotations}")
+
+
+class HistoryLog:
+    """
+    Буферизованный журнал с записью в фоновом потоке
+    """
+
+    def __init__(self, path: str = "history.txt", max_queue: int = 10000, batch_lines: int = 512,
+                 flush_seconds: float = 0.5, fsync_seconds: float = 5.0,
+                 max_bytes: Optional[int] = 10 * 1024 * 1024, rotate_seconds: Optional[float] = 24 * 3600,
+                 backups: int = 5):
+        """
+        Args:
+            path: Файл журнала
+            max_queue: Размер очереди строк (при переполнении строки отбрасываются)
+            batch_lines: Максимум строк за один write
+            flush_seconds: Как долго поток копит строки перед записью
+            fsync_seconds: Период fsync
+            max_bytes: Ротация по размеру файла (None - без ротации по размеру)
+            rotate_seconds: Ротация по возрасту файла (None - без ротации по времени)
+            backups: Сколько старых файлов хранить
+        """
+        self.Path = path
+        self.BatchLines = batch_lines
+        self.FlushSeconds = flush_seconds
+        self.FsyncSeconds = fsync_seconds
+        self.MaxBytes = max_bytes
+        self.RotateSeconds = rotate_seconds
+        self.Backups = backups
+        self.Stats = HistoryStats()
+
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._startLock = threading.Lock()
+        self._file = None
+        self._openedAt = 0.0
+        self._syncedAt = 0.0
+
+    def log(self, kind: str, text: str, author: Optional[str] = None, stream: Optional[str] = None,
+            timestamp: Optional[float] = None) -> bool:
+        """
+        Добавляет запись, не дожидаясь диска
+
+        Returns:
+            False, если очередь переполнена и запись отброшена
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(format_record(kind, text, author, stream, timestamp))
+            return True
+        except Full:
+            self.Stats.Dropped += 1
+            return False
+
+    def log_message(self, message) -> bool:
+        """Записывает сообщение чата (Parser.ChatMessage)."""
+        return self.log('chat', message.Message, message.Author, message.VideoId, message.Timestamp / 1_000_000)
+
+    def log_spoken(self, text: str, author: Optional[str] = None, stream: Optional[str] = None) -> bool:
+        """Записывает озвученный текст."""
+        return self.log('spoken', text, author, stream)
+
+    def _ensure_started(self) -> None:
+        """Поток записи запускается при первой записи."""
+        if self._thread is not None:
+            return
+        with self._startLock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="HistoryLog", daemon=True)
+                self._thread.start()
+
+    def _open(self) -> None:
+        self._file = open(self.Path, "a", encoding="utf-8")
+        # Возраст файла - от создания (где ОС его знает) или последней записи, а не от запуска:
+        # иначе ротация по времени не срабатывает, если программу перезапускают чаще RotateSeconds
+        stat = os.fstat(self._file.fileno())
+        self._openedAt = getattr(stat, 'st_birthtime', stat.st_mtime) if self._file.tell() else time.time()
+        self._syncedAt = time.monotonic()
+
+    def _run(self) -> None:
+        """Поток записи: копит строки до FlushSeconds или BatchLines и пишет одним write."""
+        self._open()
+        closing = False
+        while not closing:
+            lines: List[str] = []
+            deadline = time.monotonic() + self.FlushSeconds
+            while len(lines) < self.BatchLines:
+                try:
+                    line = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except Empty:
+                    break
+                if line is None:
+                    closing = True
+                    break
+                lines.append(line)
+            try:
+                if lines:
+                    self._file.write(''.join(lines))
+                    self._file.flush()
+                    self.Stats.Written += len(lines)
+                    self.Stats.Batches += 1
+                if closing or time.monotonic() - self._syncedAt >= self.FsyncSeconds:
+                    self._sync()
+                if self._should_rotate():
+                    self._rotate()
+            except OSError as e:
+                print(f"❌ Ошибка записи журнала {self.Path}: {e}")
+        self._file.close()
+        self._file = None
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._syncedAt = time.monotonic()
+        self.Stats.Syncs += 1
+
+    def _should_rotate(self) -> bool:
+        if not self._file.tell():
+            return False
+        if self.MaxBytes is not None and self._file.tell() >= self.MaxBytes:
+            return True
+        return self.RotateSeconds is not None and time.time() - self._openedAt >= self.RotateSeconds
+
+    def _rotate(self) -> None:
+        """
+        history.txt -> history.txt.1, старые файлы сдвигаются, последний удаляется
+
+        Если файл не переименовать (на Windows его держит другой процесс), запись
+        продолжается в тот же файл, ротация повторится при следующей проверке.
+        """
+        self._sync()
+        self._file.close()
+        try:
+            if self.Backups > 0:
+                for index in range(self.Backups - 1, 0, -1):
+                    source = f"{self.Path}.{index}"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.Path}.{index + 1}")
+                os.replace(self.Path, f"{self.Path}.1")
+            else:
+                os.remove(self.Path)
+            self.Stats.Rotations += 1
+        except OSError as e:
+            print(f"⚠️ Ротация журнала {self.Path} не удалась, пишу в тот же файл: {e}")
+        finally:
+            self._open()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Дописывает очередь, делает fsync и закрывает файл."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
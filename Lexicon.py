@@ -0,0 +1,144 @@
+"""
+Словарь произношения английских слов для транслитерации.
+
+Словарь хранится на диске отсортированной таблицей "слово<TAB>произношение"
+(UTF-8, по строке на слово, сортировка по байтам слова) и открывается через mmap
+при первом обращении - загрузка ничего не стоит, поиск двоичный прямо по файлу.
+Слова, которых нет в словаре, транслитерируются правилами TextNormalizer.
+"""
+
+import mmap
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon_en_ru.tsv")
+
+
+class PronunciationLexicon:
+    """
+    Словарь произношения поверх отсортированного файла в mmap
+    """
+
+    def __init__(self, path: str = DEFAULT_LEXICON_PATH):
+        """
+        Args:
+            path: Путь к TSV файлу словаря (см. build_lexicon)
+        """
+        self.Path = path
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._opened = False
+        self._lock = threading.Lock()
+
+    def _ensure_open(self) -> Optional[mmap.mmap]:
+        """Однократно открывает файл словаря при первом поиске."""
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    try:
+                        if os.path.getsize(self.Path) > 0:
+                            self._file = open(self.Path, "rb")
+                            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                    except OSError as e:
+                        print(f"⚠️ Словарь произношения недоступен ({self.Path}): {e}")
+                    self._opened = True
+        return self._mmap
+
+    def lookup(self, word: str) -> Optional[str]:
+        """
+        Ищет произношение слова
+
+        Args:
+            word: Английское слово (регистр не важен)
+
+        Returns:
+            Произношение русскими буквами или None
+        """
+        table = self._ensure_open()
+        if table is None:
+            return None
+
+        key = word.lower().encode("utf-8")
+        low, high = 0, len(table)
+        while low < high:
+            middle = (low + high) // 2
+            line_start = table.rfind(b"\n", 0, middle) + 1
+            line_end = table.find(b"\n", line_start)
+            if line_end == -1:
+                line_end = len(table)
+            tab = table.find(b"\t", line_start, line_end)
+            current = table[line_start:tab] if tab != -1 else table[line_start:line_end]
+            if current == key:
+                return table[tab + 1:line_end].rstrip(b"\r").decode("utf-8") if tab != -1 else None
+            if current < key:
+                low = line_end + 1
+            else:
+                high = line_start
+        return None
+
+    def close(self) -> None:
+        """Закрывает mmap и файл словаря."""
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._opened = False
+
+
+class DictLexicon:
+    """
+    Небольшой словарь в памяти (ники, правки поверх файла)
+    """
+
+    def __init__(self, entries: Dict[str, str], fallback=None):
+        """
+        Args:
+            entries: Слово -> произношение
+            fallback: Словарь, к которому обращаться при промахе (например PronunciationLexicon)
+        """
+        self._entries = {word.lower(): value for word, value in entries.items()}
+        self._fallback = fallback
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Ищет произношение сначала в своих записях, затем в fallback."""
+        value = self._entries.get(word.lower())
+        if value is None and self._fallback is not None:
+            return self._fallback.lookup(word)
+        return value
+
+
+def build_lexicon(entries: Iterable[Tuple[str, str]], path: str) -> int:
+    """
+    Записывает словарь в формате, который читает PronunciationLexicon
+
+    Args:
+        entries: Пары (слово, произношение)
+        path: Куда записать TSV
+
+    Returns:
+        Количество записанных слов
+    """
+    table: Dict[bytes, bytes] = {}
+    for word, pronunciation in entries:
+        word = word.strip().lower()
+        pronunciation = pronunciation.strip()
+        if word and pronunciation and '\t' not in word and '\n' not in pronunciation:
+            table[word.encode("utf-8")] = pronunciation.encode("utf-8")
+
+    with open(path, "wb") as file:
+        for key in sorted(table):
+            file.write(key + b"\t" + table[key] + b"\n")
+    return len(table)
+
+
+if __name__ == "__main__":
+    # Пересборка словаря после ручного редактирования: python Lexicon.py
+    with open(DEFAULT_LEXICON_PATH, "r", encoding="utf-8") as source:
+        pairs = [line.rstrip("\n").split("\t", 1) for line in source if "\t" in line]
+    count = build_lexicon(pairs, DEFAULT_LEXICON_PATH)
+    print(f"✅ Словарь пересобран: {count} слов")
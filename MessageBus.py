@@ -0,0 +1,341 @@
+"""
+Локальная шина сообщений чата для нескольких процессов.
+
+Парсер публикует ChatMessage (parser.on(bus.publish)), а оверлей, логгер
+и TTS читают их в своих процессах - тяжелый потребитель больше не тормозит
+опрос чата. Сообщение кодируется один раз в компактный бинарный кадр (struct,
+без pickle и JSON) и хранится в кольце последних кадров. Каждый читатель
+обслуживается своим потоком со своим курсором: можно подключиться с любого
+смещения, еще лежащего в кольце (replay), а отставание каждого читателя
+видно в readers(). Читатель, отставший больше емкости кольца, пропускает
+вытесненные кадры (учитываются в Lost) и продолжает с самого старого.
+
+Транспорт - Unix-сокет, где он есть, иначе TCP на localhost.
+
+Кадр:
+    u32 длина | u64 смещение | i64 время (мкс) | u16 u16 u16 u16 u32 длины полей |
+    автор, ID видео, ID сообщения, время строкой, текст (UTF-8)
+ID сообщения нулевой длины - None. Подписчик при подключении шлет i64
+начальное смещение (-1 - только новые сообщения).
+
+Бенчмарк пропускной способности и чтение шины из консоли:
+    python MessageBus.py [сообщений] [читателей]
+    python MessageBus.py listen [смещение]
+"""
+
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple, Union
+
+from Parser import ChatMessage
+
+FRAME_HEADER = struct.Struct('<IQqHHHHI')
+START_OFFSET = struct.Struct('<q')
+LIVE = -1
+
+Address = Union[str, Tuple[str, int]]
+
+
+def encode_message(offset: int, message: ChatMessage) -> bytes:
+    """Кадр шины для сообщения."""
+    author = message.Author.encode('utf-8')
+    video = message.VideoId.encode('utf-8')
+    message_id = (message.MessageId or '').encode('utf-8')
+    formatted = message.TimestampFormatted.encode('utf-8')
+    text = message.Message.encode('utf-8')
+    body = len(author) + len(video) + len(message_id) + len(formatted) + len(text)
+    return FRAME_HEADER.pack(FRAME_HEADER.size - 4 + body, offset, message.Timestamp, len(author), len(video),
+                             len(message_id), len(formatted), len(text)) + author + video + message_id + formatted + text
+
+
+def decode_message(frame: memoryview) -> Tuple[int, ChatMessage]:
+    """
+    Разбирает кадр (без префикса длины не работает - передавайте кадр целиком)
+
+    Returns:
+        Кортеж (смещение, сообщение)
+    """
+    _, offset, timestamp, *lengths = FRAME_HEADER.unpack_from(frame)
+    fields = []
+    position = FRAME_HEADER.size
+    for length in lengths:
+        fields.append(bytes(frame[position:position + length]).decode('utf-8'))
+        position += length
+    author, video, message_id, formatted, text = fields
+    return offset, ChatMessage(Author=author, Message=text, Timestamp=timestamp, TimestampFormatted=formatted,
+                               VideoId=video, MessageId=message_id or None)
+
+
+def default_address() -> Address:
+    """Unix-сокет во временном каталоге, если платформа его поддерживает, иначе TCP."""
+    if hasattr(socket, 'AF_UNIX'):
+        return os.path.join(tempfile.gettempdir(), 'chat_bus.sock')
+    return ('127.0.0.1', 8790)
+
+
+def _socket_for(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+def _listening(address: Address) -> bool:
+    """Принимает ли кто-то соединения по адресу (живая шина другого процесса)."""
+    probe = _socket_for(address)
+    try:
+        probe.settimeout(1.0)
+        probe.connect(address)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+@dataclass
+class ReaderStats:
+    """
+    Состояние читателя шины
+
+    Attributes:
+        Name: Адрес читателя
+        Offset: Следующее смещение для отправки
+        Lag: Отставание от последнего опубликованного сообщения
+        Sent: Отправлено кадров
+        Lost: Пропущено кадров (вытеснены из кольца, пока читатель отставал)
+    """
+    Name: str
+    Offset: int
+    Lag: int = 0
+    Sent: int = 0
+    Lost: int = 0
+
+
+class MessageBus:
+    """
+    Издатель сообщений чата с кольцом для повтора
+    """
+
+    def __init__(self, address: Optional[Address] = None, capacity: int = 65536, batch_frames: int = 256):
+        """
+        Args:
+            address: Путь Unix-сокета или (host, port) для TCP (None - default_address)
+            capacity: Сколько последних кадров хранить для повтора и отстающих читателей
+            batch_frames: Максимум кадров в одной отправке читателю
+        """
+        self.Address = address or default_address()
+        self.Capacity = capacity
+        self.BatchFrames = batch_frames
+        self.Published = 0
+
+        self._frames: List[Optional[bytes]] = [None] * capacity
+        self._nextOffset = 0
+        self._condition = threading.Condition()
+        self._readers: List[ReaderStats] = []
+        self._server: Optional[socket.socket] = None
+        self._stopEvent = threading.Event()
+
+    def start(self) -> None:
+        """
+        Открывает сокет и принимает читателей в фоновом потоке
+
+        Raises:
+            OSError: Адрес занят (в том числе шиной другого процесса)
+        """
+        if self._server is not None:
+            return
+        if isinstance(self.Address, str) and os.path.exists(self.Address):
+            if _listening(self.Address):
+                raise OSError(f"Шина уже запущена другим процессом: {self.Address}")
+            os.remove(self.Address)  # Сокет от прошлого запуска
+        self._server = _socket_for(self.Address)
+        if not isinstance(self.Address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.Address)
+        self._server.listen()
+        self._stopEvent.clear()
+        threading.Thread(target=self._accept, name="MessageBusAccept", daemon=True).start()
+        print(f"📡 Шина сообщений: {self.Address}")
+
+    def stop(self) -> None:
+        """Закрывает сокет и отключает читателей."""
+        self._stopEvent.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if isinstance(self.Address, str) and os.path.exists(self.Address):
+                os.remove(self.Address)
+
+    def publish(self, message: ChatMessage) -> int:
+        """
+        Публикует сообщение (подписчик YouTubeChatParser.on)
+
+        Returns:
+            Смещение сообщения
+        """
+        with self._condition:
+            offset = self._nextOffset
+            self._frames[offset % self.Capacity] = encode_message(offset, message)
+            self._nextOffset = offset + 1
+            self.Published += 1
+            self._condition.notify_all()
+        return offset
+
+    def readers(self) -> List[ReaderStats]:
+        """Снимок читателей с текущим отставанием."""
+        with self._condition:
+            for reader in self._readers:
+                reader.Lag = self._nextOffset - reader.Offset
+            return [ReaderStats(**vars(reader)) for reader in self._readers]
+
+    def _accept(self) -> None:
+        while not self._stopEvent.is_set():
+            try:
+                connection, peer = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(connection, str(peer or 'unix')),
+                             name="MessageBusReader", daemon=True).start()
+
+    def _recv_exact(self, connection: socket.socket, size: int) -> Optional[bytes]:
+        data = b''
+        while len(data) < size:
+            chunk = connection.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _serve(self, connection: socket.socket, name: str) -> None:
+        """Поток читателя: отправляет кадры от его курсора пачками."""
+        reader = None
+        try:
+            request = self._recv_exact(connection, START_OFFSET.size)
+            if request is None:
+                return
+            start = START_OFFSET.unpack(request)[0]
+            with self._condition:
+                reader = ReaderStats(name, self._nextOffset if start < 0 else start)
+                self._readers.append(reader)
+            while not self._stopEvent.is_set():
+                with self._condition:
+                    self._condition.wait_for(lambda: reader.Offset < self._nextOffset or self._stopEvent.is_set())
+                    oldest = max(0, self._nextOffset - self.Capacity)
+                    if reader.Offset < oldest:
+                        reader.Lost += oldest - reader.Offset
+                        reader.Offset = oldest
+                    end = min(self._nextOffset, reader.Offset + self.BatchFrames)
+                    frames = [self._frames[offset % self.Capacity] for offset in range(reader.Offset, end)]
+                # Отправка вне блокировки: медленный читатель не задерживает publish
+                if frames:
+                    connection.sendall(b''.join(frames))
+                    reader.Offset += len(frames)
+                    reader.Sent += len(frames)
+        except OSError:
+            pass
+        finally:
+            if reader is not None:
+                with self._condition:
+                    self._readers.remove(reader)
+            connection.close()
+
+
+class BusSubscriber:
+    """
+    Читатель шины в другом процессе
+    """
+
+    def __init__(self, address: Optional[Address] = None, offset: int = LIVE, buffer_size: int = 1 << 16):
+        """
+        Args:
+            address: Адрес шины (None - default_address)
+            offset: С какого смещения читать (LIVE - только новые сообщения)
+            buffer_size: Размер чтения из сокета
+        """
+        self.Address = address or default_address()
+        self.Offset = offset
+        self.BufferSize = buffer_size
+        self._socket: Optional[socket.socket] = None
+
+    def connect(self) -> None:
+        self._socket = _socket_for(self.Address)
+        self._socket.connect(self.Address)
+        self._socket.sendall(START_OFFSET.pack(self.Offset))
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        """Сообщения по порядку; Offset - смещение следующего (для переподключения без потерь)."""
+        if self._socket is None:
+            self.connect()
+        buffer = bytearray()
+        while True:
+            chunk = self._socket.recv(self.BufferSize)
+            if not chunk:
+                return
+            buffer += chunk
+            position = 0
+            view = memoryview(buffer)
+            while len(buffer) - position >= 4:
+                length = struct.unpack_from('<I', buffer, position)[0] + 4
+                if len(buffer) - position < length:
+                    break
+                offset, message = decode_message(view[position:position + length])
+                position += length
+                self.Offset = offset + 1
+                yield message
+            view.release()
+            del buffer[:position]
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def benchmark(count: int = 200000, readers: int = 3) -> None:
+    """Сообщений в секунду от publish до разбора у всех читателей."""
+    bus = MessageBus(capacity=count)
+    bus.start()
+    message = ChatMessage("Зритель", "Привет всем! Как дела на стриме?", int(time.time() * 1e6),
+                          "12:00:00", "video", "id")
+    received = [0] * readers
+
+    def read(index: int) -> None:
+        subscriber = BusSubscriber(bus.Address, offset=0)
+        for _ in subscriber:
+            received[index] += 1
+            if received[index] == count:
+                break
+        subscriber.close()
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    start = time.perf_counter()
+    for _ in range(count):
+        bus.publish(message)
+    published = time.perf_counter() - start
+    lag = max(reader.Lag for reader in bus.readers())
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"publish: {count / published:.0f} сообщений/с, доставка {readers} читателям: {count / elapsed:.0f} "
+          f"сообщений/с на читателя, максимальное отставание: {lag}, кадр: {len(encode_message(0, message))} байт")
+    bus.stop()
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "listen":
+        for chat_message in BusSubscriber(offset=int(sys.argv[2]) if len(sys.argv) > 2 else LIVE):
+            print(chat_message)
+        sys.exit()
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200000, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
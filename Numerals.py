@@ -0,0 +1,585 @@
+"""
+Раскрытие чисел в русский текст для синтеза речи.
+
+Поддерживает числа любого размера до квадриллионов, падежи и род
+(род выводится из следующего слова, падеж - из предлога перед числом),
+порядковые числительные ("5-й", "2024 год"), отрицательные и дробные числа,
+разряды через неразрывный пробел ("1 000 000", обычный - только перед валютой),
+проценты, время (12:30) и валюты ($, €, ₽, руб).
+Все формы кэшируются, паттерн компилируется один раз.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+
+CASES = ('nom', 'gen', 'dat', 'acc', 'ins', 'prep')
+
+# Формы по падежам: nom, gen, dat, acc, ins, prep
+ZERO = ('ноль', 'ноля', 'нолю', 'ноль', 'нолём', 'ноле')
+
+ONE = {
+    'm': ('один', 'одного', 'одному', 'один', 'одним', 'одном'),
+    'f': ('одна', 'одной', 'одной', 'одну', 'одной', 'одной'),
+    'n': ('одно', 'одного', 'одному', 'одно', 'одним', 'одном'),
+}
+
+TWO = {
+    'm': ('два', 'двух', 'двум', 'два', 'двумя', 'двух'),
+    'f': ('две', 'двух', 'двум', 'две', 'двумя', 'двух'),
+    'n': ('два', 'двух', 'двум', 'два', 'двумя', 'двух'),
+}
+
+UNITS = {
+    3: ('три', 'трёх', 'трём', 'три', 'тремя', 'трёх'),
+    4: ('четыре', 'четырёх', 'четырём', 'четыре', 'четырьмя', 'четырёх'),
+    5: ('пять', 'пяти', 'пяти', 'пять', 'пятью', 'пяти'),
+    6: ('шесть', 'шести', 'шести', 'шесть', 'шестью', 'шести'),
+    7: ('семь', 'семи', 'семи', 'семь', 'семью', 'семи'),
+    8: ('восемь', 'восьми', 'восьми', 'восемь', 'восемью', 'восьми'),
+    9: ('девять', 'девяти', 'девяти', 'девять', 'девятью', 'девяти'),
+}
+
+
+def _soft_forms(nominative: str) -> Tuple[str, ...]:
+    """Склонение числительных на -ь (десять, двадцать): пяти/пятью."""
+    stem = nominative[:-1]
+    return (nominative, stem + 'и', stem + 'и', nominative, stem + 'ью', stem + 'и')
+
+
+TEENS = tuple(_soft_forms(word) for word in (
+    'десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
+    'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать'))
+
+TENS = {
+    2: _soft_forms('двадцать'),
+    3: _soft_forms('тридцать'),
+    4: ('сорок', 'сорока', 'сорока', 'сорок', 'сорока', 'сорока'),
+    5: ('пятьдесят', 'пятидесяти', 'пятидесяти', 'пятьдесят', 'пятьюдесятью', 'пятидесяти'),
+    6: ('шестьдесят', 'шестидесяти', 'шестидесяти', 'шестьдесят', 'шестьюдесятью', 'шестидесяти'),
+    7: ('семьдесят', 'семидесяти', 'семидесяти', 'семьдесят', 'семьюдесятью', 'семидесяти'),
+    8: ('восемьдесят', 'восьмидесяти', 'восьмидесяти', 'восемьдесят', 'восемьюдесятью', 'восьмидесяти'),
+    9: ('девяносто', 'девяноста', 'девяноста', 'девяносто', 'девяноста', 'девяноста'),
+}
+
+HUNDREDS = {
+    1: ('сто', 'ста', 'ста', 'сто', 'ста', 'ста'),
+    2: ('двести', 'двухсот', 'двумстам', 'двести', 'двумястами', 'двухстах'),
+    3: ('триста', 'трёхсот', 'трёмстам', 'триста', 'тремястами', 'трёхстах'),
+    4: ('четыреста', 'четырёхсот', 'четырёмстам', 'четыреста', 'четырьмястами', 'четырёхстах'),
+    5: ('пятьсот', 'пятисот', 'пятистам', 'пятьсот', 'пятьюстами', 'пятистах'),
+    6: ('шестьсот', 'шестисот', 'шестистам', 'шестьсот', 'шестьюстами', 'шестистах'),
+    7: ('семьсот', 'семисот', 'семистам', 'семьсот', 'семьюстами', 'семистах'),
+    8: ('восемьсот', 'восьмисот', 'восьмистам', 'восемьсот', 'восемьюстами', 'восьмистах'),
+    9: ('девятьсот', 'девятисот', 'девятистам', 'девятьсот', 'девятьюстами', 'девятистах'),
+}
+
+# Существительные: {'sg': формы по падежам, 'pl': формы по падежам}
+NOUNS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    'тысяча': {
+        'sg': ('тысяча', 'тысячи', 'тысяче', 'тысячу', 'тысячей', 'тысяче'),
+        'pl': ('тысячи', 'тысяч', 'тысячам', 'тысячи', 'тысячами', 'тысячах'),
+    },
+    'процент': {
+        'sg': ('процент', 'процента', 'проценту', 'процент', 'процентом', 'проценте'),
+        'pl': ('проценты', 'процентов', 'процентам', 'проценты', 'процентами', 'процентах'),
+    },
+    'рубль': {
+        'sg': ('рубль', 'рубля', 'рублю', 'рубль', 'рублём', 'рубле'),
+        'pl': ('рубли', 'рублей', 'рублям', 'рубли', 'рублями', 'рублях'),
+    },
+    'доллар': {
+        'sg': ('доллар', 'доллара', 'доллару', 'доллар', 'долларом', 'долларе'),
+        'pl': ('доллары', 'долларов', 'долларам', 'доллары', 'долларами', 'долларах'),
+    },
+    'евро': {
+        'sg': ('евро',) * 6,
+        'pl': ('евро',) * 6,
+    },
+}
+
+
+def _masculine_noun(word: str) -> Dict[str, Tuple[str, ...]]:
+    """Склонение миллион/миллиард/... (мужской род, твердая основа)."""
+    return {
+        'sg': (word, word + 'а', word + 'у', word, word + 'ом', word + 'е'),
+        'pl': (word + 'ы', word + 'ов', word + 'ам', word + 'ы', word + 'ами', word + 'ах'),
+    }
+
+
+# Разряды: (существительное, род числительного перед ним)
+SCALES = (
+    None,
+    (NOUNS['тысяча'], 'f'),
+    (_masculine_noun('миллион'), 'm'),
+    (_masculine_noun('миллиард'), 'm'),
+    (_masculine_noun('триллион'), 'm'),
+    (_masculine_noun('квадриллион'), 'm'),
+)
+
+# Порядковые: (основа, тип склонения)
+ORDINAL_UNITS = {
+    1: ('перв', 'hard'), 2: ('втор', 'stressed'), 3: ('трет', 'soft'),
+    4: ('четвёрт', 'hard'), 5: ('пят', 'hard'), 6: ('шест', 'stressed'),
+    7: ('седьм', 'stressed'), 8: ('восьм', 'stressed'), 9: ('девят', 'hard'),
+}
+ORDINAL_TEENS = tuple((word[:-1], 'hard') for word in (
+    'десять', 'одиннадцать', 'двенадцать', 'тринадцать', 'четырнадцать',
+    'пятнадцать', 'шестнадцать', 'семнадцать', 'восемнадцать', 'девятнадцать'))
+ORDINAL_TENS = {
+    2: ('двадцат', 'hard'), 3: ('тридцат', 'hard'), 4: ('сороков', 'stressed'),
+    5: ('пятидесят', 'hard'), 6: ('шестидесят', 'hard'), 7: ('семидесят', 'hard'),
+    8: ('восьмидесят', 'hard'), 9: ('девяност', 'hard'),
+}
+ORDINAL_HUNDREDS = {
+    1: ('сот', 'hard'), 2: ('двухсот', 'hard'), 3: ('трёхсот', 'hard'),
+    4: ('четырёхсот', 'hard'), 5: ('пятисот', 'hard'), 6: ('шестисот', 'hard'),
+    7: ('семисот', 'hard'), 8: ('восьмисот', 'hard'), 9: ('девятисот', 'hard'),
+}
+ORDINAL_SCALES = (None, 'тысячн', 'миллионн', 'миллиардн', 'триллионн', 'квадриллионн')
+
+# Окончания прилагательных: тип -> род/число -> падежи
+ORDINAL_ENDINGS = {
+    'hard': {
+        'm': ('ый', 'ого', 'ому', 'ый', 'ым', 'ом'),
+        'f': ('ая', 'ой', 'ой', 'ую', 'ой', 'ой'),
+        'n': ('ое', 'ого', 'ому', 'ое', 'ым', 'ом'),
+        'pl': ('ые', 'ых', 'ым', 'ые', 'ыми', 'ых'),
+    },
+    'soft': {
+        'm': ('ий', 'ьего', 'ьему', 'ий', 'ьим', 'ьем'),
+        'f': ('ья', 'ьей', 'ьей', 'ью', 'ьей', 'ьей'),
+        'n': ('ье', 'ьего', 'ьему', 'ье', 'ьим', 'ьем'),
+        'pl': ('ьи', 'ьих', 'ьим', 'ьи', 'ьими', 'ьих'),
+    },
+}
+ORDINAL_ENDINGS['stressed'] = dict(ORDINAL_ENDINGS['hard'], m=('ой', 'ого', 'ому', 'ой', 'ым', 'ом'))
+
+# Знаменатели десятичных дробей: десятых, сотых, ...
+FRACTION_STEMS = (None, 'десят', 'сот', 'тысячн', 'десятитысячн', 'стотысячн', 'миллионн')
+
+# Предлоги, однозначно задающие падеж числа
+PREPOSITION_CASES = {
+    'до': 'gen', 'от': 'gen', 'из': 'gen', 'без': 'gen', 'около': 'gen', 'после': 'gen',
+    'для': 'gen', 'у': 'gen', 'кроме': 'gen', 'среди': 'gen', 'вместо': 'gen', 'возле': 'gen',
+    'к': 'dat', 'ко': 'dat', 'благодаря': 'dat', 'согласно': 'dat',
+    'над': 'ins', 'под': 'ins', 'перед': 'ins', 'между': 'ins',
+    'о': 'prep', 'об': 'prep', 'при': 'prep',
+}
+
+# Суффиксы "5-й", "2-го", ... -> (род, падеж)
+ORDINAL_SUFFIXES = {
+    'й': ('m', 'nom'), 'ый': ('m', 'nom'), 'ий': ('m', 'nom'), 'ой': ('m', 'nom'),
+    'го': ('m', 'gen'), 'ого': ('m', 'gen'), 'его': ('m', 'gen'),
+    'му': ('m', 'dat'), 'ому': ('m', 'dat'), 'ему': ('m', 'dat'),
+    'м': ('m', 'ins'), 'ым': ('m', 'ins'), 'им': ('m', 'ins'),
+    'я': ('f', 'nom'), 'ая': ('f', 'nom'), 'ья': ('f', 'nom'),
+    'ю': ('f', 'acc'), 'ую': ('f', 'acc'), 'ью': ('f', 'acc'),
+    'ей': ('f', 'gen'),
+    'е': ('n', 'nom'), 'ое': ('n', 'nom'), 'ье': ('n', 'nom'),
+    'х': ('pl', 'gen'), 'ых': ('pl', 'gen'), 'их': ('pl', 'gen'),
+    'ми': ('pl', 'ins'), 'ыми': ('pl', 'ins'),
+}
+
+# Разговорные суффиксы количественных: "5-ти", "2-х", "3-ёх"
+CARDINAL_SUFFIXES = {'ти': 'gen', 'ми': 'gen', 'ух': 'gen', 'ёх': 'gen', 'ех': 'gen'}
+
+# Служебные слова после числа: по ним род не угадывается ("с 1 по 5")
+FUNCTION_WORDS = frozenset((
+    'в', 'во', 'на', 'по', 'с', 'со', 'к', 'ко', 'о', 'об', 'у', 'за', 'до', 'от', 'из', 'без', 'для',
+    'при', 'про', 'через', 'над', 'под', 'перед', 'между', 'после', 'около',
+    'и', 'а', 'но', 'или', 'либо', 'да', 'же', 'ли', 'то', 'не', 'ни', 'уже', 'еще', 'ещё', 'вот',
+    'раз', 'как', 'что', 'чем', 'это', 'там', 'тут', 'где', 'когда', 'если', 'плюс', 'минус',
+))
+
+# Формы слова "год", при которых число читается как порядковое (год)
+YEAR_NOUNS = {
+    'год': ('m', 'nom'), 'года': ('m', 'gen'), 'году': ('m', 'prep'), 'годом': ('m', 'ins'),
+    'годы': ('pl', 'nom'), 'годов': ('pl', 'gen'), 'годах': ('pl', 'prep'), 'годам': ('pl', 'dat'),
+}
+
+CURRENCIES = {
+    '$': 'доллар', 'usd': 'доллар',
+    '€': 'евро', 'eur': 'евро',
+    '₽': 'рубль', 'руб': 'рубль', 'р': 'рубль',
+}
+
+# Целое с разрядами через неразрывный пробел ("1 000 000") или просто цифры.
+# Обычный пробел разделяет разряды только перед валютой ("1 000 рублей"): иначе
+# список чисел ("топ 10 100 раз", телефон "999 123 45 67") склеился бы в одно число
+INTEGER_PATTERN = (r'(?:\d{1,3}(?:[\xa0\u202f]\d{3})+(?!\d)'
+                   r'|\d{1,3}(?:\x20\d{3})+(?=(?:[.,]\d+)?\x20?(?:[%$€₽]|(?i:руб|рубл\w*|доллар\w*|евро|usd|eur)(?!\w)))'
+                   r'|\d+)')
+
+NUMERAL_PATTERN = r'''(?P<number>
+    (?P<n_time>(?<![\w:.,])\d{1,2}:\d\d(?::\d\d)?(?![\w:]))
+  | (?P<n_pre>[$€₽])?
+    (?:(?<![\w\-−])(?P<n_sign>[-−]))?
+    (?:
+        (?<![\w.,])(?P<n_whole>INTEGER)[.,](?P<n_frac>\d+)(?![.,]?\d)
+      | (?<!\w)(?P<n_int>INTEGER)(?:-(?P<n_suffix>[а-яё]{1,3})(?!\w))?
+    )
+    (?:(?P<n_post>\x20?(?:%|[$€₽]|(?:руб|р|(?i:usd|eur))\.?(?!\w)))|(?!\w))
+)'''.replace('INTEGER', INTEGER_PATTERN)
+
+
+def _case_index(case: str) -> int:
+    return CASES.index(case)
+
+
+def _noun_form(noun: Dict[str, Tuple[str, ...]], number: int, case: str, fractional: bool = False) -> str:
+    """
+    Форма существительного после числа (согласование по числу и падежу)
+
+    Args:
+        noun: Таблица склонения существительного
+        number: Число перед существительным
+        case: Падеж числительного
+        fractional: Число дробное (тогда родительный единственного)
+    """
+    index = _case_index(case)
+    if fractional:
+        return noun['sg'][1] if case in ('nom', 'acc') else noun['pl'][index]
+    last_two = number % 100
+    last = number % 10
+    if case in ('nom', 'acc'):
+        if 11 <= last_two <= 14:
+            return noun['pl'][1]
+        if last == 1:
+            return noun['sg'][index]
+        if 2 <= last <= 4:
+            return noun['sg'][1]
+        return noun['pl'][1]
+    if last == 1 and last_two != 11:
+        return noun['sg'][index]
+    return noun['pl'][index]
+
+
+def _triad_words(triad: int, gender: str, case: str) -> List[str]:
+    """Слова для числа 1..999 в нужном роде и падеже."""
+    index = _case_index(case)
+    words = []
+    hundred, rest = divmod(triad, 100)
+    if hundred:
+        words.append(HUNDREDS[hundred][index])
+    if rest >= 20:
+        ten, unit = divmod(rest, 10)
+        words.append(TENS[ten][index])
+    elif rest >= 10:
+        words.append(TEENS[rest - 10][index])
+        unit = 0
+    else:
+        unit = rest
+    if unit == 1:
+        words.append(ONE[gender][index])
+    elif unit == 2:
+        words.append(TWO[gender][index])
+    elif unit:
+        words.append(UNITS[unit][index])
+    return words
+
+
+def _triads(number: int) -> List[int]:
+    """Разбивает число на тройки разрядов, начиная с младшей."""
+    triads = []
+    while number:
+        number, triad = divmod(number, 1000)
+        triads.append(triad)
+    return triads
+
+
+@lru_cache(maxsize=4096)
+def cardinal(number: int, gender: str = 'm', case: str = 'nom') -> str:
+    """
+    Количественное числительное
+
+    Args:
+        number: Неотрицательное число (меньше 10^18)
+        gender: Род ('m', 'f', 'n') - влияет на 1 и 2
+        case: Падеж ('nom', 'gen', 'dat', 'acc', 'ins', 'prep')
+
+    Returns:
+        Числительное словами
+
+    Example:
+        cardinal(21, 'f') -> "двадцать одна"
+        cardinal(1500, case='gen') -> "одной тысячи пятисот"
+    """
+    if number == 0:
+        return ZERO[_case_index(case)]
+
+    words = []
+    triads = _triads(number)
+    for scale in range(len(triads) - 1, -1, -1):
+        triad = triads[scale]
+        if not triad:
+            continue
+        if scale == 0:
+            words.extend(_triad_words(triad, gender, case))
+        else:
+            noun, scale_gender = SCALES[scale]
+            words.extend(_triad_words(triad, scale_gender, case))
+            words.append(_noun_form(noun, triad, case))
+    return ' '.join(words)
+
+
+def _ordinal_word(stem: str, kind: str, gender: str, case: str) -> str:
+    return stem + ORDINAL_ENDINGS[kind][gender][_case_index(case)]
+
+
+def _compound_prefix(triad: int) -> str:
+    """Первая часть сложных порядковых: 2000 -> "двух", 25000 -> "двадцатипяти"."""
+    if triad == 1:
+        return ''
+    parts = []
+    hundred, rest = divmod(triad, 100)
+    if hundred:
+        parts.append('сто' if hundred == 1 else HUNDREDS[hundred][1])
+    if rest >= 20:
+        ten, unit = divmod(rest, 10)
+        parts.append('девяносто' if ten == 9 else TENS[ten][1])
+    elif rest >= 10:
+        parts.append(TEENS[rest - 10][1])
+        unit = 0
+    else:
+        unit = rest
+    if unit == 1:
+        parts.append('одно')
+    elif unit:
+        parts.append(cardinal(unit, 'm', 'gen'))
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=4096)
+def ordinal(number: int, gender: str = 'm', case: str = 'nom') -> str:
+    """
+    Порядковое числительное
+
+    Args:
+        number: Положительное число
+        gender: Род или множественное число ('m', 'f', 'n', 'pl')
+        case: Падеж
+
+    Example:
+        ordinal(2024, case='prep') -> "две тысячи двадцать четвёртом"
+        ordinal(3, 'f') -> "третья"
+    """
+    if number == 0:
+        return _ordinal_word('нулев', 'stressed', gender, case)
+
+    triads = _triads(number)
+    lowest = next(scale for scale, triad in enumerate(triads) if triad)
+    triad = triads[lowest]
+    head = number - triad * 1000 ** lowest
+    words = [cardinal(head)] if head else []
+
+    if lowest > 0:
+        words.append(_ordinal_word(_compound_prefix(triad) + ORDINAL_SCALES[lowest], 'hard', gender, case))
+        return ' '.join(words)
+
+    hundred, rest = divmod(triad, 100)
+    if rest == 0:
+        stem, kind = ORDINAL_HUNDREDS[hundred]
+    else:
+        if hundred:
+            words.append(HUNDREDS[hundred][0])
+        if rest < 10:
+            stem, kind = ORDINAL_UNITS[rest]
+        elif rest < 20:
+            stem, kind = ORDINAL_TEENS[rest - 10]
+        else:
+            ten, unit = divmod(rest, 10)
+            if unit:
+                words.append(TENS[ten][0])
+                stem, kind = ORDINAL_UNITS[unit]
+            else:
+                stem, kind = ORDINAL_TENS[ten]
+    words.append(_ordinal_word(stem, kind, gender, case))
+    return ' '.join(words)
+
+
+def digits(text: str) -> str:
+    """Читает строку цифр по одной: "007" -> "ноль ноль семь"."""
+    return ' '.join(cardinal(int(digit)) for digit in text)
+
+
+@lru_cache(maxsize=1024)
+def decimal(whole: int, fraction: str) -> str:
+    """
+    Десятичная дробь: (3, "5") -> "три целых пять десятых"
+
+    Args:
+        whole: Целая часть
+        fraction: Дробная часть строкой (важны ведущие нули)
+    """
+    if len(fraction) >= len(FRACTION_STEMS):
+        return f"{cardinal(whole)} запятая {digits(fraction)}"
+
+    whole_words = cardinal(whole, 'f')
+    whole_noun = 'целая' if whole % 10 == 1 and whole % 100 != 11 else 'целых'
+    numerator = int(fraction)
+    stem = FRACTION_STEMS[len(fraction)]
+    if numerator % 10 == 1 and numerator % 100 != 11:
+        denominator = _ordinal_word(stem, 'hard', 'f', 'nom')
+    else:
+        denominator = _ordinal_word(stem, 'hard', 'pl', 'gen')
+    return f"{whole_words} {whole_noun} {cardinal(numerator, 'f')} {denominator}"
+
+
+def _guess_gender(number: int, word: str, case: str) -> str:
+    """
+    Угадывает род существительного после числа по его окончанию
+
+    После 1 существительное стоит в том же падеже (минута/окно),
+    после 2-4 - в родительном единственного (минуты/окна).
+    Служебные, короткие и некириллические слова существительным не считаются - мужской род.
+    """
+    word = word.lower()
+    last = number % 10
+    if number % 100 in (11, 12) or last not in (1, 2):
+        return 'm'
+    if len(word) < 3 or word in FUNCTION_WORDS or not re.fullmatch('[а-яё]+', word):
+        return 'm'
+    if case in ('nom', 'acc') and last == 2:
+        return 'f' if word.endswith(('ы', 'и')) else 'm'
+    if case == 'nom':
+        if word.endswith(('а', 'я')):
+            return 'f'
+        if word.endswith(('о', 'е', 'ё')):
+            return 'n'
+    elif case == 'acc' and word.endswith(('у', 'ю')):
+        return 'f'
+    elif case == 'gen' and word.endswith(('ы', 'и')):
+        return 'f'
+    elif case == 'dat' and word.endswith('е'):
+        return 'f'
+    elif case == 'ins' and word.endswith(('ой', 'ей', 'ою', 'ею')):
+        return 'f'
+    return 'm'
+
+
+def _strip_groups(text: str) -> str:
+    """Убирает пробелы между разрядами: "1 000 000" -> "1000000"."""
+    return re.sub(r'\D', '', text)
+
+
+class NumeralExpander:
+    """
+    Заменяет числа в тексте словами с учетом контекста
+
+    Паттерн PATTERN (группа "number") встраивается в общий токенизатор TextNormalizer,
+    обработку совпадения выполняет replace().
+    """
+
+    # Без пробелов, чтобы паттерн можно было встраивать в токенизатор без re.VERBOSE
+    PATTERN = ''.join(NUMERAL_PATTERN.split())
+
+    def __init__(self, max_digits: int = 18):
+        """
+        Args:
+            max_digits: Числа длиннее этого (и целые, и дробные) читаются как "очень большое число"
+                (защита от числового спама)
+        """
+        self.MaxDigits = max_digits
+        self._pattern = re.compile(self.PATTERN)
+        self._prevWord = re.compile(r'(\w+)\s+$')
+        self._nextWord = re.compile(r'\s+(\w+)')
+
+    def expand(self, text: str) -> str:
+        """
+        Раскрывает все числа в тексте
+
+        Example:
+            "в 2024 году 21 минута и 50%" ->
+            "в две тысячи двадцать четвёртом году двадцать одна минута и пятьдесят процентов"
+        """
+        return self._pattern.sub(self.replace, text)
+
+    def _context(self, match: re.Match) -> Tuple[str, str]:
+        """Слово перед числом и слово после него (в нижнем регистре)."""
+        text = match.string
+        start, end = match.span()
+        prev_match = self._prevWord.search(text, max(0, start - 32), start)
+        next_match = self._nextWord.match(text, end)
+        prev_word = prev_match.group(1).lower() if prev_match else ''
+        next_word = next_match.group(1) if next_match else ''
+        return prev_word, next_word
+
+    def replace(self, match: re.Match) -> str:
+        """Обработчик одного совпадения PATTERN."""
+        if match.group('n_time'):
+            return self._time(match.group('n_time'))
+
+        prev_word, next_word = self._context(match)
+        case = PREPOSITION_CASES.get(prev_word, 'nom')
+        sign = 'минус ' if match.group('n_sign') else ''
+
+        currency_mark = match.group('n_pre') or (match.group('n_post') or '').strip().rstrip('.').lower()
+        noun = None
+        if currency_mark == '%':
+            noun = NOUNS['процент']
+        elif currency_mark:
+            noun = NOUNS[CURRENCIES[currency_mark]]
+
+        if match.group('n_whole') is not None:
+            whole = _strip_groups(match.group('n_whole'))
+            if len(whole) > self.MaxDigits:
+                return "очень большое число"
+            words = decimal(int(whole), match.group('n_frac'))
+            if noun is not None:
+                words = f"{words} {_noun_form(noun, 0, 'nom', fractional=True)}"
+            return sign + words
+
+        digits_text = _strip_groups(match.group('n_int'))
+        if len(digits_text) > self.MaxDigits:
+            return "очень большое число"
+        if len(digits_text) > 1 and digits_text[0] == '0' and noun is None:
+            return digits(digits_text)
+        number = int(digits_text)
+
+        suffix = match.group('n_suffix')
+        if suffix:
+            if suffix in CARDINAL_SUFFIXES or (suffix == 'х' and 2 <= number <= 4):
+                return sign + cardinal(number, 'm', 'gen')
+            if suffix in ORDINAL_SUFFIXES:
+                gender, ordinal_case = ORDINAL_SUFFIXES[suffix]
+                if suffix in ('м', 'ым', 'им') and prev_word in ('в', 'во', 'на', 'о', 'об', 'при'):
+                    ordinal_case = 'prep'
+                elif suffix == 'е' and number >= 20 and number % 10 == 0:
+                    gender = 'pl'  # 90-е, 2000-е
+                elif suffix == 'ой' and case != 'nom':
+                    gender, ordinal_case = 'f', case
+                return sign + ordinal(number, gender, ordinal_case)
+
+        if noun is None and 1000 <= number <= 2999 and next_word.lower() in YEAR_NOUNS:
+            gender, ordinal_case = YEAR_NOUNS[next_word.lower()]
+            return ordinal(number, gender, ordinal_case)
+
+        if noun is not None:
+            words = cardinal(number, 'f' if noun is NOUNS['тысяча'] else 'm', case)
+            return f"{sign}{words} {_noun_form(noun, number, case)}"
+
+        gender = _guess_gender(number, next_word, case) if next_word else 'm'
+        return sign + cardinal(number, gender, case)
+
+    def _time(self, text: str) -> str:
+        """
+        Время 12:30 -> "двенадцать тридцать", 9:05 -> "девять ноль пять"
+
+        Не время (часы больше 23, минуты или секунды больше 59, "25:00") читается
+        как отдельные числа: "двадцать пять ноль ноль".
+        """
+        parts = text.split(':')
+        if int(parts[0]) > 23 or any(int(part) > 59 for part in parts[1:]):
+            return ' '.join(digits(part) if len(part) > 1 and part[0] == '0' else cardinal(int(part))
+                            for part in parts)
+        words = [cardinal(int(parts[0]))]
+        for part in parts[1:]:
+            if part == '00':
+                words.append('ноль ноль')
+            elif part[0] == '0':
+                words.append(f"ноль {cardinal(int(part[1]))}")
+            else:
+                words.append(cardinal(int(part)))
+        return ' '.join(words)
@@ -9,11 +9,13 @@ import json
 import re
 import time
 import threading
-from typing import Optional, Dict, List, Callable, Set
+from typing import Optional, Dict, List, Callable, Set, Iterator
 from urllib.parse import urlparse, parse_qs
 from dataclasses import dataclass
 from datetime import datetime
 
+from ChatRecord import ChatRecorder, ChatReplay
+
 
 @dataclass
 class ChatMessage:
@@ -66,12 +68,13 @@ class YouTubeChatParser:
     Класс для парсинга чата YouTube стрима через прямое подключение
     """
     
-    def __init__(self, video_url: str):
+    def __init__(self, video_url: str, recorder: Optional[ChatRecorder] = None):
         """
         Инициализация парсера
         
         Args:
             video_url: URL YouTube видео/стрима
+            recorder: Запись сырых ответов чата в файл (для последующего воспроизведения)
         """
         self.VideoUrl = video_url
         self.VideoId = self._extract_video_id(video_url)
@@ -90,6 +93,22 @@ class YouTubeChatParser:
         self._loopLock = threading.Lock()
         self._stopEvent = threading.Event()
         self._startTime: Optional[int] = None  # Время запуска парсера (Unix timestamp в секундах)
+        self.Recorder = recorder
+        if self.Recorder is not None and self.Recorder.VideoId is None:
+            self.Recorder.VideoId = self.VideoId
+    
+    @classmethod
+    def from_replay(cls, replay: ChatReplay) -> 'YouTubeChatParser':
+        """
+        Создает парсер для воспроизведения записи (ID видео берется из записи)
+        
+        Args:
+            replay: Источник записанных ответов
+            
+        Returns:
+            Парсер, который нужно запускать через replay()
+        """
+        return cls(f"https://www.youtube.com/watch?v={replay.VideoId or 'replay'}")
         
     def _extract_video_id(self, url: str) -> str:
         """
@@ -348,46 +367,64 @@ class YouTubeChatParser:
             
             data = response.json()
             
-            # Извлекаем сообщения
-            actions = data.get('continuationContents', {}).get('liveChatContinuation', {}).get('actions', [])
-            messages = []
-            
-            for action in actions:
-                if 'addChatItemAction' in action:
-                    item = action['addChatItemAction'].get('item', {})
-                    if 'liveChatTextMessageRenderer' in item:
-                        renderer = item['liveChatTextMessageRenderer']
-                        author = renderer.get('authorName', {}).get('simpleText', 'Неизвестно')
-                        message_text = ''
-                        
-                        # Извлекаем текст сообщения (может быть с эмодзи и форматированием)
-                        runs = renderer.get('message', {}).get('runs', [])
-                        for run in runs:
-                            if 'text' in run:
-                                message_text += run['text']
-                        
-                        timestamp = renderer.get('timestampUsec', '0')
-                        
-                        messages.append({
-                            'author': author,
-                            'message': message_text,
-                            'timestamp': timestamp
-                        })
-            
-            # Получаем новый continuation token
-            continuations = data.get('continuationContents', {}).get('liveChatContinuation', {}).get('continuations', [])
-            new_token = None
-            if continuations:
-                new_token = continuations[0].get('timedContinuationData', {}).get('continuation')
-                if not new_token:
-                    new_token = continuations[0].get('invalidationContinuationData', {}).get('continuation')
-            
-            return messages, new_token
+            if self.Recorder is not None:
+                try:
+                    self.Recorder.record(data)
+                except Exception as e:
+                    print(f"⚠️ Ошибка записи ответа чата: {e}")
+            
+            return self._parse_chat_response(data)
             
         except Exception as e:
             print(f"❌ Ошибка при получении сообщений: {e}")
             return None, None
     
+    def _parse_chat_response(self, data: Dict) -> tuple[List[Dict], Optional[str]]:
+        """
+        Разбирает ответ get_live_chat (живой или из записи)
+        
+        Args:
+            data: JSON ответа
+            
+        Returns:
+            Кортеж (список сообщений, новый continuation token)
+        """
+        # Извлекаем сообщения
+        actions = data.get('continuationContents', {}).get('liveChatContinuation', {}).get('actions', [])
+        messages = []
+        
+        for action in actions:
+            if 'addChatItemAction' in action:
+                item = action['addChatItemAction'].get('item', {})
+                if 'liveChatTextMessageRenderer' in item:
+                    renderer = item['liveChatTextMessageRenderer']
+                    author = renderer.get('authorName', {}).get('simpleText', 'Неизвестно')
+                    message_text = ''
+                    
+                    # Извлекаем текст сообщения (может быть с эмодзи и форматированием)
+                    runs = renderer.get('message', {}).get('runs', [])
+                    for run in runs:
+                        if 'text' in run:
+                            message_text += run['text']
+                    
+                    timestamp = renderer.get('timestampUsec', '0')
+                    
+                    messages.append({
+                        'author': author,
+                        'message': message_text,
+                        'timestamp': timestamp
+                    })
+        
+        # Получаем новый continuation token
+        continuations = data.get('continuationContents', {}).get('liveChatContinuation', {}).get('continuations', [])
+        new_token = None
+        if continuations:
+            new_token = continuations[0].get('timedContinuationData', {}).get('continuation')
+            if not new_token:
+                new_token = continuations[0].get('invalidationContinuationData', {}).get('continuation')
+        
+        return messages, new_token
+    
     def setTimeout(self, callback: Callable, delay: float) -> threading.Timer:
         """
         Аналог setTimeout из JavaScript - выполняет функцию через указанное время
@@ -438,22 +475,7 @@ class YouTubeChatParser:
         messages, new_token = self._fetch_chat_messages(self.ContinuationToken)
         
         if messages:
-            for raw_msg in messages:
-                # Создаем структурированный объект сообщения
-                chat_message = self._create_message_object(raw_msg)
-                
-                # Пропускаем исторические сообщения (отправленные до запуска парсера)
-                if self._startTime is not None:
-                    message_time_seconds = chat_message.Timestamp // 1000000  # Конвертируем из микросекунд в секунды
-                    if message_time_seconds < self._startTime:
-                        continue  # Пропускаем историческое сообщение
-                
-                # Уведомляем всех подписчиков только о новых сообщениях
-                if self._subscribers:
-                    self._notify_subscribers(chat_message)
-                else:
-                    # Если нет подписчиков, выводим в консоль (для обратной совместимости)
-                    print(str(chat_message))
+            self._dispatch_messages(messages)
         
         if new_token:
             self.ContinuationToken = new_token
@@ -464,6 +486,30 @@ class YouTubeChatParser:
             # Планируем повторную попытку через 5 секунд
             self.setTimeout(self._fetch_loop, 5.0)
     
+    def _dispatch_messages(self, messages: List[Dict]) -> None:
+        """
+        Превращает сырые сообщения в ChatMessage и рассылает подписчикам
+        
+        Args:
+            messages: Список сырых сообщений из _parse_chat_response
+        """
+        for raw_msg in messages:
+            # Создаем структурированный объект сообщения
+            chat_message = self._create_message_object(raw_msg)
+            
+            # Пропускаем исторические сообщения (отправленные до запуска парсера)
+            if self._startTime is not None:
+                message_time_seconds = chat_message.Timestamp // 1000000  # Конвертируем из микросекунд в секунды
+                if message_time_seconds < self._startTime:
+                    continue  # Пропускаем историческое сообщение
+            
+            # Уведомляем всех подписчиков только о новых сообщениях
+            if self._subscribers:
+                self._notify_subscribers(chat_message)
+            else:
+                # Если нет подписчиков, выводим в консоль (для обратной совместимости)
+                print(str(chat_message))
+    
     def start(self):
         """
         Запускает парсинг чата
@@ -491,6 +537,8 @@ class YouTubeChatParser:
         self.IsRunning = True
         self._stopEvent.clear()
         self._startTime = int(time.time())  # Запоминаем время запуска для фильтрации истории
+        if self.Recorder is not None:
+            self.Recorder.StartTime = self._startTime  # Replay отфильтрует историю так же
         
         # Запускаем первый цикл сразу (без задержки)
         self._fetch_loop()
@@ -498,6 +546,52 @@ class YouTubeChatParser:
         # Ожидаем остановки (неблокирующее ожидание)
         self._wait_for_stop()
     
+    def replay(self, source: ChatReplay) -> None:
+        """
+        Воспроизводит записанный чат через тот же путь разбора и рассылки,
+        что и живой _fetch_loop (без сети). Блокирует до конца записи или stop().
+        
+        Args:
+            source: Источник записанных ответов (скорость задается в нем)
+        """
+        speed = f"x{source.Speed}" if source.Speed else "максимальная"
+        print(f"⏯️ Воспроизведение записи чата: {source.Path} (скорость: {speed})\n")
+        self.IsRunning = True
+        self._stopEvent.clear()
+        
+        count = 0
+        for _, data in source.responses(self._stopEvent):
+            if not self.IsRunning:
+                break
+            # Время запуска из заголовка сессии: историю до него живой запуск не озвучивал
+            self._startTime = source.SessionStart
+            messages, _ = self._parse_chat_response(data)
+            if messages:
+                self._dispatch_messages(messages)
+                count += len(messages)
+        
+        self.IsRunning = False
+        print(f"\n⏹️ Воспроизведение завершено, сообщений: {count}")
+    
+    def iter_replay(self, source: ChatReplay) -> Iterator[ChatMessage]:
+        """
+        Выдает сообщения записанного чата без рассылки подписчикам
+        (для офлайн обработки, например tts.render)
+        
+        Args:
+            source: Источник записанных ответов (паузы выдерживаются по его скорости)
+            
+        Yields:
+            Объекты ChatMessage в порядке записи
+        """
+        for _, data in source.responses(self._stopEvent):
+            messages, _ = self._parse_chat_response(data)
+            for raw_msg in messages:
+                chat_message = self._create_message_object(raw_msg)
+                if source.SessionStart is not None and chat_message.Timestamp // 1000000 < source.SessionStart:
+                    continue  # История до запуска живого парсера (как в replay)
+                yield chat_message
+    
     def on(self, callback: Callable[[ChatMessage], None]) -> None:
         """
         Подписывается на новые сообщения из чата
@@ -0,0 +1,321 @@
+"""
+Быстрая расстановка просодии по правилам - альтернатива LLM в SSMLGenerator.
+
+По признакам в тексте сообщения (капс, "!!!", вопрос, цитаты, перечисления,
+смайлики, многоточия и тире) строится SSML только из того, что понимает
+Silero: <speak>, <prosody rate> без вложенности и <break time>.
+Результат детерминирован и считается за десятки микросекунд.
+
+Выбирается стилем в text_to_ssml: "rules" или "rules:cheerful".
+
+Бенчмарк против LM Studio (задержка и валидность):
+    python Prosody.py [base_url]
+"""
+
+import html
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Темп по умолчанию и темп восклицаний для стилей генератора
+STYLE_RATES: Dict[str, Tuple[str, str, str]] = {
+    # стиль: (обычный, восклицание, крик)
+    "neutral": ("medium", "medium", "fast"),
+    "cheerful": ("medium", "fast", "fast"),
+    "serious": ("slow", "medium", "medium"),
+}
+
+# Паузы после знаков (мс) - те же, что в SSMLGenerator._simple_fallback
+PAUSES: Dict[str, int] = {
+    ',': 150, ';': 200, ':': 250, '—': 400, '.': 300, '!': 300, '?': 350, '…': 500, 'list': 250, 'quote': 150,
+}
+
+SENTENCE_PATTERN = re.compile(r'[^.!?…]+(?:[.!?…]+|$)|[.!?…]+')
+CLAUSE_PATTERN = re.compile(r'\s*(,|;|:|\s[—–-]\s)\s*')
+QUOTE_PATTERN = re.compile(r'«([^»]*)»|"([^"]*)"|„([^“]*)“')
+SMILE_PATTERN = re.compile(r'[:;=]-?[)D]|\b[xх][dд]\b', re.IGNORECASE)
+LAUGH_PATTERN = re.compile(r'\b(?:а?ха){2,}', re.IGNORECASE)
+SAD_PATTERN = re.compile(r'[:;=]-?\(|(?<=\S)\({1,}(?=\s|$|[.!?,])|^\(+$')
+CAPS_WORD_PATTERN = re.compile(r'\b[A-ZА-ЯЁ]{3,}\b')
+BULLET_PATTERN = re.compile(r'^\s*(?:[-•*]|\d+[.)])\s+')
+SPACES_PATTERN = re.compile(r'\s+')
+
+
+def _strip_bracket_smiles(sentence: str) -> Tuple[str, bool]:
+    """
+    Убирает скобки-смайлы ")))" - закрывающие скобки без парной открывающей перед ними
+
+    Returns:
+        Кортеж (текст без смайлов, были ли смайлы); "(вот так)" остается как есть
+    """
+    chars: List[str] = []
+    depth = 0
+    found = False
+    for char in sentence:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth:
+                depth -= 1
+            else:
+                found = True
+                char = ' '
+        chars.append(char)
+    return ''.join(chars), found
+
+
+class ProsodyEngine:
+    """
+    Разметка SSML для Silero по правилам
+    """
+
+    def __init__(self, list_min_items: int = 3, list_max_words: int = 3):
+        """
+        Args:
+            list_min_items: Сколько коротких частей через запятую считать перечислением
+            list_max_words: Максимум слов в элементе перечисления
+        """
+        self.ListMinItems = list_min_items
+        self.ListMaxWords = list_max_words
+
+    def markup(self, text: str, style: str = "neutral") -> str:
+        """
+        Размечает текст
+
+        Args:
+            text: Текст сообщения (без SSML)
+            style: neutral, cheerful или serious
+
+        Returns:
+            SSML для Silero
+
+        Example:
+            "Привет!!! Как дела?" ->
+            '<speak><prosody rate="fast">Привет!!!</prosody><break time="400ms"/>'
+            '<prosody rate="medium">Как дела?</prosody></speak>'
+        """
+        rates = STYLE_RATES.get(style, STYLE_RATES["neutral"])
+        segments: List[Tuple[str, str, int]] = []  # (темп, текст, пауза после)
+
+        lines = [line for line in text.splitlines() if line.strip()]
+        bullets = sum(1 for line in lines if BULLET_PATTERN.match(line))
+        is_list = len(lines) > 1 and bullets >= len(lines) - 1
+        for line in lines:
+            if is_list:
+                line = BULLET_PATTERN.sub('', line)
+            self._line(line, rates, segments)
+            if is_list and segments:
+                self._pause(segments, PAUSES['list'])
+
+        return self._render(segments)
+
+    def _line(self, line: str, rates: Tuple[str, str, str], segments: List[Tuple[str, str, int]]) -> None:
+        """Размечает строку по предложениям."""
+        for match in SENTENCE_PATTERN.finditer(line):
+            sentence = match.group(0).strip()
+            if sentence:
+                self._sentence(sentence, rates, segments)
+
+    def _sentence(self, sentence: str, rates: Tuple[str, str, str], segments: List[Tuple[str, str, int]]) -> None:
+        """Темп и паузы одного предложения."""
+        base, exclaim, shout = rates
+
+        # Смайлики - признак настроения, сами не озвучиваются; смех ("ахаха") - тоже признак, но читается
+        cheerful = bool(SMILE_PATTERN.search(sentence)) or bool(LAUGH_PATTERN.search(sentence))
+        sad = bool(SAD_PATTERN.search(sentence))
+        sentence = SMILE_PATTERN.sub(' ', sentence)
+        if sad:
+            sentence = SAD_PATTERN.sub(' ', sentence)
+        sentence, brackets = _strip_bracket_smiles(sentence)
+        cheerful = cheerful or brackets
+        sentence = SPACES_PATTERN.sub(' ', sentence).strip()
+        if not sentence:
+            if cheerful or sad:
+                self._pause(segments, PAUSES[','])
+            return
+
+        body = sentence.rstrip('.!?…')
+        ending = sentence[len(body):]
+        letters = [char for char in body if char.isalpha()]
+        upper = sum(1 for char in letters if char.isupper())
+
+        if ending.count('!') >= 2 or (len(letters) >= 4 and upper / len(letters) > 0.6):
+            rate = shout  # Крик: "!!!" или капс всего предложения
+            pause = PAUSES['—']
+        elif '!' in ending:
+            rate = exclaim if not sad else base
+            pause = PAUSES['!']
+        elif '?' in ending:
+            rate = base
+            pause = PAUSES['?']
+        elif '…' in ending or '..' in ending:
+            rate = base
+            pause = PAUSES['…']
+        else:
+            rate = base
+            pause = PAUSES['.'] if ending else 0
+        if sad and rate == "medium":
+            rate = "slow"
+        elif cheerful and rate == "medium" and base != "slow":
+            rate = exclaim
+
+        self._clauses(body, ending, rate, segments)
+        self._pause(segments, pause)
+
+    def _clauses(self, body: str, ending: str, rate: str, segments: List[Tuple[str, str, int]]) -> None:
+        """Части предложения: цитаты, запятые и тире, перечисления, слова капсом."""
+        position = 0
+        parts: List[Tuple[str, bool]] = []  # (текст, цитата ли)
+        for match in QUOTE_PATTERN.finditer(body):
+            if match.start() > position:
+                parts.append((body[position:match.start()], False))
+            parts.append((next(group for group in match.groups() if group is not None), True))
+            position = match.end()
+        if position < len(body):
+            parts.append((body[position:], False))
+
+        for index, (part, quoted) in enumerate(parts):
+            last = index == len(parts) - 1
+            if quoted:
+                self._pause(segments, PAUSES['quote'])
+                self._words(part.strip() + (ending if last else ''), rate, segments)
+                self._pause(segments, PAUSES['quote'])
+                continue
+
+            pieces = CLAUSE_PATTERN.split(part)
+            clauses = pieces[0::2]
+            marks = pieces[1::2]
+            is_list = (len(clauses) >= self.ListMinItems
+                       and all(0 < len(clause.split()) <= self.ListMaxWords for clause in clauses))
+            for number, clause in enumerate(clauses):
+                clause = clause.strip()
+                closing = number == len(clauses) - 1
+                if clause:
+                    self._words(clause + (ending if last and closing else ''), rate, segments)
+                if not closing:
+                    mark = marks[number].strip()[:1].replace('–', '—').replace('-', '—')
+                    self._pause(segments, PAUSES['list'] if is_list and mark == ',' else PAUSES.get(mark, 150))
+
+    def _words(self, text: str, rate: str, segments: List[Tuple[str, str, int]]) -> None:
+        """Выделяет отдельные слова капсом в предложении обычного регистра."""
+        if not text:
+            return
+        letters = sum(1 for char in text if char.isalpha())
+        caps = CAPS_WORD_PATTERN.findall(text)
+        if not caps or sum(len(word) for word in caps) * 2 > letters:
+            segments.append((rate, text, 0))
+            return
+        position = 0
+        for match in CAPS_WORD_PATTERN.finditer(text):
+            if match.start() > position:
+                segments.append((rate, text[position:match.start()].strip(), 0))
+            segments.append(("fast", match.group(0), 0))
+            position = match.end()
+        if position < len(text):
+            segments.append((rate, text[position:].strip(), 0))
+
+    @staticmethod
+    def _pause(segments: List[Tuple[str, str, int]], milliseconds: int) -> None:
+        """Добавляет паузу после последнего сегмента (берется максимальная из подряд идущих)."""
+        if segments:
+            rate, text, pause = segments[-1]
+            segments[-1] = (rate, text, max(pause, milliseconds))
+
+    @staticmethod
+    def _render(segments: List[Tuple[str, str, int]]) -> str:
+        """Собирает SSML: соседние сегменты одного темпа без паузы сливаются."""
+        parts = ['<speak>']
+        current_rate: Optional[str] = None
+        buffer: List[str] = []
+
+        def flush():
+            if buffer:
+                parts.append(f'<prosody rate="{current_rate}">{" ".join(buffer)}</prosody>')
+                buffer.clear()
+
+        for index, (rate, text, pause) in enumerate(segments):
+            text = text.strip()
+            if text:
+                if rate != current_rate:
+                    flush()
+                    current_rate = rate
+                buffer.append(html.escape(text, quote=False))
+            if pause and index < len(segments) - 1:
+                flush()
+                parts.append(f'<break time="{pause}ms"/>')
+        flush()
+        parts.append('</speak>')
+        return ''.join(parts)
+
+
+BENCHMARK_TEXTS = (
+    "+",
+    "ку",
+    "Привет всем!",
+    "ЭТО ПРОСТО НЕВЕРОЯТНО!!!",
+    "А ты пробовал пройти этот уровень без прыжков?",
+    "Он сказал «я больше не играю» и вышел",
+    "Купил хлеб, молоко, яйца, сыр",
+    "ну такое... посмотрим)",
+    "жаль что стрим короткий((",
+    "- первый пункт\n- второй пункт\n- третий пункт",
+    "Слушай, а можешь рассказать подробнее, как ты прошел прошлый уровень — у меня не получается?",
+)
+
+
+def benchmark(generator=None, texts: Tuple[str, ...] = BENCHMARK_TEXTS, repeats: int = 1000) -> Dict[str, Dict[str, float]]:
+    """
+    Сравнивает правила и LLM по задержке и валидности SSML
+
+    Args:
+        generator: SSMLGenerator (None - только правила)
+        texts: Сообщения
+        repeats: Повторов для правил (LLM вызывается один раз на сообщение)
+
+    Returns:
+        {"rules"|"llm": {"ms_per_message", "valid", "messages"}}
+    """
+    from Accent import SSMLValidator
+
+    validator = SSMLValidator()
+
+    def valid(ssml: Optional[str]) -> bool:
+        if not ssml:
+            return False
+        _, errors, warnings = validator.fix_ssml(ssml)
+        return not errors and not warnings
+
+    engine = ProsodyEngine()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in texts:
+            engine.markup(text)
+    rules_ms = (time.perf_counter() - start) * 1000 / (repeats * len(texts))
+    results = {"rules": {"ms_per_message": rules_ms,
+                         "valid": sum(valid(engine.markup(text)) for text in texts) / len(texts),
+                         "messages": len(texts)}}
+
+    if generator is not None and generator.is_available:
+        outputs = []
+        start = time.perf_counter()
+        for text in texts:
+            outputs.append(generator._generate_with_lm_studio(text))
+        llm_ms = (time.perf_counter() - start) * 1000 / len(texts)
+        results["llm"] = {"ms_per_message": llm_ms,
+                          "valid": sum(valid(ssml) for ssml in outputs) / len(texts),
+                          "messages": len(texts)}
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    from Accent import SSMLGenerator
+
+    for sample in BENCHMARK_TEXTS:
+        print(f"{sample!r}\n    {ProsodyEngine().markup(sample)}")
+    llm = SSMLGenerator(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"\n{'движок':>7} {'мс/сообщение':>13} {'валидных':>9}")
+    for name, stats in benchmark(llm).items():
+        print(f"{name:>7} {stats['ms_per_message']:>13.4f} {stats['valid']:>9.0%}")
@@ -0,0 +1,549 @@
+"""
+Синтез речи на других машинах.
+
+Стрим-ПК не тянет одновременно кодирование OBS и инференс Silero в пиках,
+поэтому синтез можно вынести в процессы-воркеры (SynthesisServer) на этой
+или других машинах. tts отправляет им задания через RemoteBackend:
+    - балансировка: задание уходит наименее загруженному здоровому воркеру
+      (свои задания в полете + очередь воркера по последней проверке);
+    - проверка здоровья: фоновый ping каждые health_seconds, воркер с ошибкой
+      соединения выводится из ротации до следующего успешного ping;
+    - локальный запасной движок: нет здоровых воркеров или все отказали -
+      синтез идет локально (обычно SileroBackend);
+    - аудио идет кусками: воркер шлет PCM 16 бит по chunk_seconds сразу после
+      синтеза, клиент отдает куски по мере прихода (RemoteBackend.stream).
+
+Протокол - TCP, кадры "u8 тип | u32 длина | данные":
+    SYNTH  JSON {"job": поля SynthesisJob, "chunk_seconds": секунды}
+    PING   пусто
+Ответы:
+    CHUNK  PCM int16 little-endian с частотой задания
+    END    u8 - был ли использован SSML
+    ERROR  текст ошибки UTF-8
+    STATUS u8 модель готова | u32 заданий в работе | u32 синтезировано | f32 RTF (-1 - нет замеров)
+Соединение держит одно задание за раз; клиент открывает новое на задание.
+Длина кадра ограничена (MAX_REQUEST_BYTES для заданий, MAX_RESPONSE_BYTES для ответов).
+
+Аутентификации нет: по умолчанию воркер слушает только 127.0.0.1. Адрес 0.0.0.0
+открывает синтез всей локальной сети - запускайте так только в доверенной сети
+или закройте порт файрволом для всех, кроме стрим-ПК.
+
+Воркер и бенчмарк на модели-заглушке (localhost):
+    python RemoteSynth.py worker [порт] [адрес] [stub]
+    python RemoteSynth.py [воркеров] [сообщений]
+"""
+
+import json
+import multiprocessing as mp
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from AudioBuffer import AudioBuffer, CopyMetrics
+from Backends import BackendCapabilities, TTSBackend
+from SileroModel import SynthesisJob, SsmlMetrics, synthesize_job
+from SynthPool import silero_model_factory, stub_model_factory
+
+FRAME = struct.Struct('<BI')
+STATUS = struct.Struct('<BIIf')
+
+SYNTH, PING = 1, 2
+CHUNK, END, ERROR, PONG = 1, 2, 3, 4
+
+DEFAULT_PORT = 8791
+MAX_REQUEST_BYTES = 64 * 1024
+MAX_RESPONSE_BYTES = 16 * 1024 * 1024
+
+Address = Tuple[str, int]
+
+
+def send_frame(connection: socket.socket, kind: int, payload: bytes = b'') -> None:
+    connection.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+
+def recv_exact(connection: socket.socket, size: int) -> Optional[bytearray]:
+    """Читает ровно size байт (None - соединение закрыто)."""
+    data = bytearray(size)
+    view = memoryview(data)
+    position = 0
+    while position < size:
+        received = connection.recv_into(view[position:])
+        if not received:
+            return None
+        position += received
+    return data
+
+
+def recv_frame(connection: socket.socket, max_length: int) -> Optional[Tuple[int, bytearray]]:
+    """
+    Кадр (тип, данные) или None, если соединение закрыто
+
+    Raises:
+        ConnectionError: Кадр длиннее max_length (память под него не выделяется)
+    """
+    header = recv_exact(connection, FRAME.size)
+    if header is None:
+        return None
+    kind, length = FRAME.unpack(header)
+    if length > max_length:
+        raise ConnectionError(f"Кадр {length} байт длиннее допустимых {max_length}")
+    payload = recv_exact(connection, length) if length else bytearray()
+    if payload is None:
+        return None
+    return kind, payload
+
+
+class SynthesisServer:
+    """
+    Воркер синтеза: одна модель, задания выполняются по очереди
+    """
+
+    def __init__(self, address: Address = ('127.0.0.1', DEFAULT_PORT),
+                 model_factory: Optional[Callable[[int], Any]] = None, threads: Optional[int] = None):
+        """
+        Args:
+            address: Адрес (host, port) для приема заданий (0.0.0.0 - вся сеть, без аутентификации)
+            model_factory: Фабрика модели f(threads) -> объект с apply_tts (по умолчанию Silero)
+            threads: Потоков torch (по умолчанию все ядра машины воркера)
+        """
+        self.Address = address
+        self.Threads = threads or os.cpu_count() or 1
+        self.Active = 0  # Заданий в работе и в ожидании модели
+        self.Served = 0
+        self.Rtf: Optional[float] = None
+
+        self._modelFactory = model_factory or silero_model_factory
+        self._model = None
+        self._synthLock = threading.Lock()
+        self._stateLock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._stopEvent = threading.Event()
+
+    def start(self) -> None:
+        """Открывает сокет сразу (ping отвечает "не готов"), модель грузится в фоне."""
+        if self._server is not None:
+            return
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.Address)
+        self._server.listen()
+        self._stopEvent.clear()
+        threading.Thread(target=self._load, name="SynthesisServerLoad", daemon=True).start()
+        threading.Thread(target=self._accept, name="SynthesisServerAccept", daemon=True).start()
+        print(f"📡 Воркер синтеза: {self.Address[0]}:{self.Address[1]}")
+
+    def serve_forever(self) -> None:
+        """Запускает воркер и ждет stop()."""
+        self.start()
+        self._stopEvent.wait()
+
+    def stop(self) -> None:
+        self._stopEvent.set()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _load(self) -> None:
+        try:
+            self._model = self._modelFactory(self.Threads)
+            print("✅ Модель воркера загружена")
+        except Exception as e:
+            print(f"❌ Ошибка загрузки модели воркера: {e}")
+
+    def _accept(self) -> None:
+        while not self._stopEvent.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(connection,), name="SynthesisServerClient", daemon=True).start()
+
+    def _serve(self, connection: socket.socket) -> None:
+        try:
+            while True:
+                frame = recv_frame(connection, MAX_REQUEST_BYTES)
+                if frame is None:
+                    break
+                kind, payload = frame
+                if kind == PING:
+                    send_frame(connection, PONG, STATUS.pack(self._model is not None, self.Active, self.Served,
+                                                             -1.0 if self.Rtf is None else self.Rtf))
+                elif kind == SYNTH:
+                    self._synthesize(connection, payload)
+                else:
+                    send_frame(connection, ERROR, f"Неизвестный тип кадра: {kind}".encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+    def _synthesize(self, connection: socket.socket, payload: bytearray) -> None:
+        """Синтезирует задание и шлет аудио кусками по chunk_seconds."""
+        with self._stateLock:
+            self.Active += 1
+        try:
+            request = json.loads(payload)
+            job = SynthesisJob(**request["job"])
+            if self._model is None:
+                raise RuntimeError("Модель воркера еще не загружена")
+            with self._synthLock:
+                started = time.perf_counter()
+                audio, used_ssml = synthesize_job(self._model.apply_tts, job)
+                audio = audio.numpy() if hasattr(audio, 'numpy') else np.asarray(audio)
+                elapsed = time.perf_counter() - started
+            samples = (np.clip(audio.reshape(-1), -1.0, 1.0) * 32767).astype('<i2')
+            if len(samples):
+                rtf = elapsed / (len(samples) / job.SampleRate)
+                self.Rtf = rtf if self.Rtf is None else 0.7 * self.Rtf + 0.3 * rtf
+            step = max(1, int(request.get("chunk_seconds", 0.5) * job.SampleRate))
+            for start in range(0, len(samples), step):
+                send_frame(connection, CHUNK, samples[start:start + step].tobytes())
+            send_frame(connection, END, bytes([used_ssml]))
+            self.Served += 1
+        except OSError:
+            raise
+        except Exception as e:
+            send_frame(connection, ERROR, str(e).encode('utf-8'))
+        finally:
+            with self._stateLock:
+                self.Active -= 1
+
+
+@dataclass
+class WorkerState:
+    """
+    Состояние удаленного воркера глазами клиента
+
+    Attributes:
+        Address: Адрес воркера
+        Healthy: Воркер в ротации (последний ping или задание прошли успешно)
+        Active: Наших заданий в работе на воркере
+        Load: Заданий на воркере по последнему ping (включая задания других клиентов)
+        Served: Синтезировано нами на воркере
+        Failures: Ошибок соединения
+        PingMs: Время последнего ping
+        Rtf: RTF воркера по последнему ping
+    """
+    Address: Address
+    Healthy: bool = False
+    Active: int = 0
+    Load: int = 0
+    Served: int = 0
+    Failures: int = 0
+    PingMs: float = 0.0
+    Rtf: Optional[float] = None
+
+
+class RemoteSynthClient:
+    """
+    Клиент воркеров синтеза: выбор воркера, проверка здоровья, переключение при отказе
+    """
+
+    def __init__(self, addresses: Sequence[Address], health_seconds: float = 2.0, timeout: float = 10.0,
+                 ping_timeout: float = 1.0):
+        """
+        Args:
+            addresses: Адреса воркеров (host, port)
+            health_seconds: Период проверки здоровья
+            timeout: Таймаут соединения и ожидания очередного куска аудио
+            ping_timeout: Таймаут ping
+        """
+        self.Workers = [WorkerState(tuple(address)) for address in addresses]
+        self.HealthSeconds = health_seconds
+        self.Timeout = timeout
+        self.PingTimeout = ping_timeout
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopEvent = threading.Event()
+
+    @property
+    def Healthy(self) -> int:
+        """Воркеров в ротации."""
+        return sum(worker.Healthy for worker in self.Workers)
+
+    def ping(self, worker: WorkerState) -> bool:
+        """Проверяет воркер и обновляет его состояние."""
+        started = time.perf_counter()
+        try:
+            with socket.create_connection(worker.Address, timeout=self.PingTimeout) as connection:
+                send_frame(connection, PING)
+                frame = recv_frame(connection, STATUS.size)
+            if frame is None or frame[0] != PONG:
+                raise ConnectionError("нет ответа на ping")
+            ready, load, _, rtf = STATUS.unpack(frame[1])
+        except OSError:
+            with self._lock:
+                if worker.Healthy:
+                    print(f"⚠️ Воркер синтеза {worker.Address[0]}:{worker.Address[1]} недоступен")
+                worker.Healthy = False
+            return False
+        with self._lock:
+            if ready and not worker.Healthy:
+                print(f"✅ Воркер синтеза {worker.Address[0]}:{worker.Address[1]} в ротации")
+            worker.Healthy = bool(ready)
+            worker.Load = load
+            worker.Rtf = None if rtf < 0 else rtf
+            worker.PingMs = (time.perf_counter() - started) * 1000
+        return worker.Healthy
+
+    def check(self) -> int:
+        """Проверяет все воркеры; возвращает число здоровых."""
+        for worker in self.Workers:
+            self.ping(worker)
+        return self.Healthy
+
+    def watch(self) -> None:
+        """Запускает фоновую проверку здоровья."""
+        if self._thread is not None or not self.Workers:
+            return
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._watch, name="RemoteSynthHealth", daemon=True)
+        self._thread.start()
+
+    def _watch(self) -> None:
+        while not self._stopEvent.is_set():
+            self.check()
+            self._stopEvent.wait(self.HealthSeconds)
+
+    def stop(self) -> None:
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.HealthSeconds + self.PingTimeout * len(self.Workers))
+            self._thread = None
+
+    def _choose(self, tried: List[WorkerState]) -> Optional[WorkerState]:
+        """Наименее загруженный здоровый воркер (и сразу занимает его)."""
+        with self._lock:
+            candidates = [worker for worker in self.Workers if worker.Healthy and worker not in tried]
+            if not candidates:
+                return None
+            worker = min(candidates, key=lambda candidate: (candidate.Active + candidate.Load, candidate.Failures))
+            worker.Active += 1
+            return worker
+
+    def stream(self, job: SynthesisJob, chunk_seconds: float = 0.5) -> Iterator[np.ndarray]:
+        """
+        Куски аудио float32 по мере прихода; значение генератора - был ли использован SSML
+        (used_ssml = yield from client.stream(job))
+
+        Если воркер недоступен или вернул ошибку до первого куска, задание уходит следующему.
+
+        Raises:
+            ConnectionError: Нет здоровых воркеров, все отказали или соединение оборвалось посреди аудио
+        """
+        request = json.dumps({"job": asdict(job), "chunk_seconds": chunk_seconds}).encode('utf-8')
+        tried: List[WorkerState] = []
+        while True:
+            worker = self._choose(tried)
+            if worker is None:
+                raise ConnectionError("Нет доступных воркеров синтеза")
+            tried.append(worker)
+            received = False
+            try:
+                with socket.create_connection(worker.Address, timeout=self.Timeout) as connection:
+                    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    send_frame(connection, SYNTH, request)
+                    while True:
+                        frame = recv_frame(connection, MAX_RESPONSE_BYTES)
+                        if frame is None:
+                            raise ConnectionError("воркер закрыл соединение")
+                        kind, payload = frame
+                        if kind == CHUNK:
+                            received = True
+                            yield np.frombuffer(payload, dtype='<i2').astype(np.float32) / 32768
+                        elif kind == END:
+                            with self._lock:
+                                worker.Served += 1
+                            return bool(payload[0])
+                        else:
+                            # Ошибка синтеза (например, модель не загрузилась) - как отказ воркера
+                            raise ConnectionError(f"ошибка синтеза: {bytes(payload).decode('utf-8', 'replace')}")
+            except OSError as e:
+                with self._lock:
+                    worker.Healthy = False
+                    worker.Failures += 1
+                print(f"⚠️ Воркер синтеза {worker.Address[0]}:{worker.Address[1]} отказал: {e}")
+                if received:
+                    # Часть аудио уже отдана - повтор на другом воркере продублировал бы ее
+                    raise ConnectionError(f"Соединение с воркером {worker.Address} оборвалось посреди аудио") from e
+            finally:
+                with self._lock:
+                    worker.Active -= 1
+
+
+class RemoteBackend(TTSBackend):
+    """
+    Синтез на удаленных воркерах с локальным запасным движком
+    """
+
+    def __init__(self, addresses: Sequence[Address], fallback: Optional[TTSBackend] = None,
+                 speakers: Tuple[str, ...] = (), health_seconds: float = 2.0, timeout: float = 10.0):
+        """
+        Args:
+            addresses: Адреса воркеров (host, port)
+            fallback: Локальный движок, когда воркеры недоступны (None - ошибка синтеза)
+            speakers: Голоса модели воркеров
+            health_seconds: Период проверки здоровья воркеров
+            timeout: Таймаут соединения и ожидания аудио
+        """
+        super().__init__()
+        self.Client = RemoteSynthClient(addresses, health_seconds, timeout)
+        self.Fallback = fallback
+        self.FallbackCount = 0
+        self._speakers = tuple(speakers)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(addresses)), thread_name_prefix="RemoteSynth")
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("remote", Ssml=True, Speakers=self._speakers, Streaming=True, Cost=0.5)
+
+    @property
+    def Available(self) -> bool:
+        return self.Client.Healthy > 0 or (self.Fallback is not None and self.Fallback.Available)
+
+    @property
+    def Parallelism(self) -> int:
+        """Сколько заданий держать в синтезе одновременно (по заданию на здоровый воркер)."""
+        return max(1, self.Client.Healthy)
+
+    def preload(self) -> None:
+        # Запасной движок грузится при первом обращении: его память нужна, только если воркеры отказали
+        self.Client.watch()
+
+    def _local(self, error: Exception) -> Optional[TTSBackend]:
+        """Запасной движок после отказа воркеров (None - запасного нет)."""
+        if self.Fallback is None:
+            return None
+        self.FallbackCount += 1
+        if self.FallbackCount == 1 or self.FallbackCount % 100 == 0:
+            print(f"⚠️ {error} - синтез локально ({self.FallbackCount} раз)")
+        return self.Fallback
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        chunks = []
+        stream = self.Client.stream(job)
+        try:
+            while True:
+                chunks.append(next(stream))
+        except StopIteration as done:
+            used_ssml = done.value
+        except ConnectionError as e:
+            local = self._local(e)
+            if local is None or chunks:
+                raise
+            return local.synthesize(job)
+        samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+        CopyMetrics.copied(samples.nbytes)
+        return AudioBuffer(samples, job.SampleRate), used_ssml
+
+    def _synthesize_timed(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool, float]:
+        started = time.perf_counter()
+        audio, used_ssml = self.synthesize(job)
+        return audio, used_ssml, time.perf_counter() - started
+
+    def submit(self, job: SynthesisJob) -> Any:
+        # Синтез начинается сразу: пока играет текущее сообщение, следующие уже на воркерах
+        return job, self._executor.submit(self._synthesize_timed, job)
+
+    def result(self, handle: Any) -> Tuple[AudioBuffer, bool]:
+        job, future = handle
+        audio, used_ssml, elapsed = future.result()
+        # RTF по времени синтеза: result зовут после воспроизведения предыдущего сообщения
+        self._measure(elapsed, audio)
+        SsmlMetrics.synthesized(job, used_ssml)
+        return audio, used_ssml
+
+    def cancel(self, handle: Any) -> None:
+        # Уже начатое задание доработает на воркере, его результат просто не заберут
+        handle[1].cancel()
+
+    def stream(self, job: SynthesisJob, chunk_seconds: float = 0.5) -> Iterator[AudioBuffer]:
+        """Куски аудио по мере прихода с воркера, до конца синтеза всего сообщения."""
+        received = False
+        try:
+            for samples in self.Client.stream(job, chunk_seconds):
+                received = True
+                yield AudioBuffer(samples, job.SampleRate)
+        except ConnectionError as e:
+            local = self._local(e)
+            if local is None or received:
+                raise
+            yield from local.stream(job, chunk_seconds)
+
+    def close(self) -> None:
+        self.Client.stop()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_worker(port: int, stub: bool, host: str = '127.0.0.1') -> None:
+    """Точка входа процесса-воркера (бенчмарк и python RemoteSynth.py worker)."""
+    SynthesisServer((host, port), stub_model_factory if stub else None).serve_forever()
+
+
+def benchmark(max_workers: int = 4, messages: int = 48, base_port: int = 8900) -> List[Tuple[int, float]]:
+    """
+    Пропускная способность воркеров-заглушек на localhost и переключение на локальный движок
+
+    Returns:
+        Список (воркеров, сообщений в секунду)
+    """
+    from Backends import NullBackend
+
+    context = mp.get_context("spawn")
+    texts = [f"Сообщение номер {i} из чата, " * (1 + i % 4) for i in range(messages)]
+    results = []
+    workers = 1
+    while workers <= max_workers:
+        ports = [base_port + index for index in range(workers)]
+        processes = [context.Process(target=_run_worker, args=(port, True), daemon=True) for port in ports]
+        for process in processes:
+            process.start()
+        backend = RemoteBackend([('127.0.0.1', port) for port in ports], fallback=NullBackend())
+        deadline = time.monotonic() + 30
+        while backend.Client.check() < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        start = time.perf_counter()
+        first_chunk = []
+        for _ in backend.stream(SynthesisJob(texts[0], None, 'baya', 48000)):
+            first_chunk.append(time.perf_counter() - start)
+        pending = []
+        start = time.perf_counter()
+        for text in texts:
+            if len(pending) >= backend.Parallelism:
+                backend.result(pending.pop(0))[0].release()
+            pending.append(backend.submit(SynthesisJob(text, None, 'baya', 48000)))
+        while pending:
+            backend.result(pending.pop(0))[0].release()
+        elapsed = time.perf_counter() - start
+        print(f"{workers:>7} {messages / elapsed:>12.1f} {first_chunk[0] * 1000:>14.1f} {len(first_chunk):>6}")
+        results.append((workers, messages / elapsed))
+
+        for process in processes:
+            process.terminate()
+            process.join()
+        audio, _ = backend.result(backend.submit(SynthesisJob(texts[0], None, 'baya', 48000)))
+        print(f"        воркеры остановлены: синтез локально {backend.FallbackCount} раз, "
+              f"ошибок соединения: {sum(worker.Failures for worker in backend.Client.Workers)}")
+        backend.close()
+        workers *= 2
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        options = [arg for arg in sys.argv[3:] if arg != "stub"]
+        _run_worker(int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT, "stub" in sys.argv[3:],
+                    options[0] if options else '127.0.0.1')
+    else:
+        print(f"{'воркеров':>7} {'сообщений/с':>12} {'первый кусок, мс':>14} {'кусков':>6}")
+        benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4, int(sys.argv[2]) if len(sys.argv) > 2 else 48)
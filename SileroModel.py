@@ -0,0 +1,384 @@
+"""
+Загрузка модели Silero TTS и профиль CPU инференса.
+
+Модель загружается лениво и в фоновом потоке: импорт tts.py больше не ждет
+torch.hub, а первый синтез дожидается окончания загрузки.
+Поддерживается локальный закрепленный файл модели (torch.package .pt
+или TorchScript) - тогда сеть и кэш torch.hub не нужны.
+
+Профиль инференса (InferenceProfile) задает число потоков torch, динамическую
+квантизацию и прогрев модели на типичных длинах сообщений чата: без прогрева
+первое сообщение синтезируется в разы дольше остальных. Весь синтез идет
+под torch.inference_mode().
+
+Бенчмарк real-time factor (время синтеза / длительность звука) по длине сообщения:
+    python SileroModel.py [intra_threads] [inter_threads]
+RTF < 1 означает, что синтез быстрее реального времени. На CPU обычно
+выгоднее 2-4 intra-op потока на модель, чем все ядра сразу.
+"""
+
+import os
+import time
+import threading
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+
+@dataclass
+class InferenceProfile:
+    """
+    Настройки CPU инференса Silero
+
+    Attributes:
+        IntraOpThreads: torch.set_num_threads (None - оставить значение torch)
+        InterOpThreads: torch.set_num_interop_threads (None - оставить значение torch)
+        Quantize: Динамическая int8 квантизация Linear слоев (если модель позволяет)
+        WarmupTexts: Тексты для прогрева после загрузки (типичные длины сообщений)
+        WarmupSpeaker: Голос для прогрева
+        WarmupSampleRate: Частота дискретизации для прогрева
+    """
+    IntraOpThreads: Optional[int] = None
+    InterOpThreads: Optional[int] = None
+    Quantize: bool = False
+    WarmupTexts: Tuple[str, ...] = (
+        "Привет!",
+        "Как дела, что сегодня будем делать на стриме?",
+        "Слушай, а можешь рассказать подробнее, как ты прошел прошлый уровень, "
+        "у меня никак не получается, уже третий вечер пытаюсь.",
+    )
+    WarmupSpeaker: str = 'baya'
+    WarmupSampleRate: int = 48000
+
+
+@dataclass
+class SynthesisJob:
+    """
+    Задание на синтез одного сообщения (передается и в процессы пула)
+
+    Attributes:
+        Text: Текст для синтеза без SSML (уже транслитерированный)
+        Ssml: SSML разметка или None
+        Speaker: Голос
+        SampleRate: Частота дискретизации
+        PutAccent: Расстановка ударений Silero
+        PutYo: Расстановка буквы ё Silero
+    """
+    Text: str
+    Ssml: Optional[str]
+    Speaker: str
+    SampleRate: int
+    PutAccent: bool = True
+    PutYo: bool = True
+
+
+@dataclass
+class SsmlStats:
+    """
+    Статистика SSML перед синтезом и после него
+
+    Attributes:
+        Checked: Проверено строгим валидатором
+        Repaired: Исправлено валидатором
+        Rejected: Отклонено (синтез сразу по обычному тексту)
+        Synthesized: Синтезировано по SSML
+        Retried: Синтез по SSML упал и повторен по тексту (должно стремиться к нулю)
+    """
+    Checked: int = 0
+    Repaired: int = 0
+    Rejected: int = 0
+    Synthesized: int = 0
+    Retried: int = 0
+
+    def __str__(self) -> str:
+        return (f"проверено: {self.Checked}, исправлено: {self.Repaired}, отклонено: {self.Rejected}, "
+                f"по SSML: {self.Synthesized}, повторный синтез: {self.Retried}")
+
+
+class SsmlCounter:
+    """
+    Потокобезопасный счетчик SSML
+    """
+
+    def __init__(self):
+        self.Stats = SsmlStats()
+        self._lock = threading.Lock()
+
+    def checked(self, repaired: bool, rejected: bool) -> None:
+        """Учитывает строгую проверку SSML перед отправкой на синтез."""
+        with self._lock:
+            self.Stats.Checked += 1
+            self.Stats.Repaired += repaired and not rejected
+            self.Stats.Rejected += rejected
+
+    def synthesized(self, job: "SynthesisJob", used_ssml: bool) -> None:
+        """Учитывает результат синтеза задания."""
+        if not job.Ssml:
+            return
+        with self._lock:
+            if used_ssml:
+                self.Stats.Synthesized += 1
+            else:
+                self.Stats.Retried += 1
+
+
+# Общий счетчик (синтез в процессах пула учитывается по результату в основном процессе)
+SsmlMetrics = SsmlCounter()
+
+
+def synthesize_job(apply_tts: Callable[..., Any], job: SynthesisJob) -> Tuple[Any, bool]:
+    """
+    Синтезирует задание: сначала по SSML, при ошибке - по обычному тексту
+
+    Args:
+        apply_tts: Функция синтеза (SileroModelLoader.apply_tts или model.apply_tts)
+        job: Задание
+
+    Returns:
+        Кортеж (аудио, был ли использован SSML)
+    """
+    if job.Ssml:
+        try:
+            return apply_tts(ssml_text=job.Ssml, speaker=job.Speaker, sample_rate=job.SampleRate), True
+        except Exception as e:
+            print(f"❌ Ошибка синтеза по SSML, синтезирую обычный текст: {e}")
+            print(f"\n{job.Ssml}\n")
+            traceback.print_exc()
+    # Тишину в конце больше не добиваем "...   " - края обрезает AudioPostProcessor
+    audio = apply_tts(text=job.Text,
+                      speaker=job.Speaker,
+                      sample_rate=job.SampleRate,
+                      put_accent=job.PutAccent,
+                      put_yo=job.PutYo)
+    return audio, False
+
+
+class SileroModelLoader:
+    """
+    Фоновая однократная загрузка модели Silero
+    """
+
+    def __init__(self,
+                 language: str = 'ru',
+                 model_id: str = 'v5_1_ru',
+                 name: str = 'large_fast',
+                 device: str = 'cpu',
+                 local_path: Optional[str] = None,
+                 profile: Optional[InferenceProfile] = None):
+        """
+        Args:
+            language: Язык модели для torch.hub
+            model_id: Идентификатор модели (speaker в терминах silero-models)
+            name: Вариант модели для torch.hub
+            device: Устройство ('cpu' или 'cuda')
+            local_path: Локальный файл модели; если задан, torch.hub не используется
+            profile: Профиль инференса (потоки, квантизация, прогрев)
+        """
+        self.Language = language
+        self.ModelId = model_id
+        self.Name = name
+        self.Device = device
+        self.LocalPath = local_path
+        self.Profile = profile or InferenceProfile()
+        self.LoadSeconds: Optional[float] = None  # Время холодного старта
+        self.WarmupSeconds: Optional[float] = None
+        self._torch = None
+        self._model: Any = None
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def IsLoaded(self) -> bool:
+        """Модель загружена и готова к синтезу."""
+        return self._ready.is_set() and self._model is not None
+
+    @property
+    def Error(self) -> Optional[BaseException]:
+        """Ошибка загрузки модели (None - загружена или еще грузится)."""
+        return self._error
+
+    def start(self) -> None:
+        """
+        Запускает загрузку в фоновом потоке (повторные вызовы ничего не делают)
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._load, name="SileroModelLoader", daemon=True)
+                self._thread.start()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Возвращает модель, при необходимости дожидаясь загрузки
+
+        Args:
+            timeout: Максимальное время ожидания в секундах (None - без ограничения)
+
+        Returns:
+            Загруженная модель Silero
+
+        Raises:
+            TimeoutError: Модель не загрузилась за timeout
+            RuntimeError: Загрузка завершилась ошибкой
+        """
+        self.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Модель Silero еще загружается")
+        if self._error is not None:
+            raise RuntimeError(f"Не удалось загрузить модель Silero: {self._error}") from self._error
+        return self._model
+
+    def _load(self) -> None:
+        """Загрузка модели (выполняется в фоновом потоке)."""
+        start = time.perf_counter()
+        try:
+            import torch
+            self._torch = torch
+            # Потоки настраиваем до первой операции torch, иначе interop уже не изменить
+            self._apply_threads(torch)
+
+            if self.LocalPath:
+                model, source = self._load_local(torch, self.LocalPath)
+            else:
+                model, _ = torch.hub.load(repo_or_dir='snakers4/silero-models',
+                                          model='silero_tts',
+                                          language=self.Language,
+                                          speaker=self.ModelId,
+                                          name=self.Name)
+                source = f"torch.hub {self.ModelId}"
+            model.to(torch.device(self.Device))
+            if self.Profile.Quantize:
+                model = self._quantize(torch, model)
+            self._model = model
+            self.LoadSeconds = time.perf_counter() - start
+            print(f"✅ Модель Silero загружена за {self.LoadSeconds:.2f} с ({source})")
+            self._warmup()
+        except BaseException as e:
+            self._error = e
+            print(f"❌ Ошибка загрузки модели Silero: {e}")
+        finally:
+            self._ready.set()
+
+    def _apply_threads(self, torch) -> None:
+        """Применяет число потоков из профиля."""
+        if self.Profile.IntraOpThreads:
+            torch.set_num_threads(self.Profile.IntraOpThreads)
+        if self.Profile.InterOpThreads:
+            try:
+                torch.set_num_interop_threads(self.Profile.InterOpThreads)
+            except RuntimeError as e:
+                # torch уже успел запустить interop пул (например, в другом модуле)
+                print(f"⚠️ Не удалось задать interop потоки: {e}")
+
+    def _quantize(self, torch, model):
+        """Динамическая квантизация Linear слоев; при неудаче возвращает исходную модель."""
+        try:
+            target = getattr(model, 'model', model)
+            quantized = torch.quantization.quantize_dynamic(target, {torch.nn.Linear}, dtype=torch.qint8)
+            if target is model:
+                return quantized
+            model.model = quantized
+            return model
+        except Exception as e:
+            print(f"⚠️ Квантизация не поддерживается этой моделью: {e}")
+            return model
+
+    def _warmup(self) -> None:
+        """Прогрев модели на типичных длинах сообщений (ошибки не фатальны)."""
+        if not self.Profile.WarmupTexts:
+            return
+        start = time.perf_counter()
+        try:
+            for text in self.Profile.WarmupTexts:
+                self._apply(text=text,
+                            speaker=self.Profile.WarmupSpeaker,
+                            sample_rate=self.Profile.WarmupSampleRate)
+            self.WarmupSeconds = time.perf_counter() - start
+            print(f"🔥 Прогрев модели: {self.WarmupSeconds:.2f} с ({len(self.Profile.WarmupTexts)} фраз)")
+        except Exception as e:
+            print(f"⚠️ Ошибка прогрева модели: {e}")
+
+    def _apply(self, **kwargs):
+        """Вызов apply_tts загруженной модели без автоградиента."""
+        with self._torch.inference_mode():
+            return self._model.apply_tts(**kwargs)
+
+    def apply_tts(self, timeout: Optional[float] = None, **kwargs):
+        """
+        Синтез речи (дожидается загрузки модели)
+
+        Args:
+            timeout: Максимальное время ожидания загрузки
+            **kwargs: Аргументы apply_tts модели Silero (text/ssml_text, speaker, sample_rate, ...)
+
+        Returns:
+            Тензор с аудио
+        """
+        self.get(timeout)
+        return self._apply(**kwargs)
+
+    def _load_local(self, torch, path: str):
+        """
+        Загружает модель из локального файла без сети
+
+        Args:
+            torch: Модуль torch
+            path: torch.package (.pt из релизов silero-models) или TorchScript
+
+        Returns:
+            Кортеж (модель, описание источника)
+        """
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Файл модели не найден: {path}")
+        try:
+            importer = torch.package.PackageImporter(path)
+            return importer.load_pickle("tts_models", "model"), f"package {path}"
+        except Exception:
+            # Не torch.package - пробуем как TorchScript
+            return torch.jit.load(path, map_location=self.Device), f"TorchScript {path}"
+
+
+def benchmark_rtf(loader: SileroModelLoader,
+                  lengths: Tuple[int, ...] = (10, 30, 60, 120, 250, 500),
+                  repeats: int = 3,
+                  speaker: str = 'baya',
+                  sample_rate: int = 48000) -> List[Tuple[int, float, float, float]]:
+    """
+    Измеряет real-time factor синтеза в зависимости от длины сообщения
+
+    Args:
+        loader: Загрузчик модели (с нужным профилем)
+        lengths: Длины сообщений в символах
+        repeats: Повторов на каждую длину (берется лучшее время)
+        speaker: Голос
+        sample_rate: Частота дискретизации
+
+    Returns:
+        Список (длина, секунд синтеза, секунд аудио, RTF)
+    """
+    phrase = "Привет всем в чате, сегодня отличный день для стрима. "
+    results = []
+    for length in lengths:
+        text = (phrase * (length // len(phrase) + 1))[:length].strip()
+        best = float('inf')
+        audio_seconds = 0.0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            audio = loader.apply_tts(text=text, speaker=speaker, sample_rate=sample_rate)
+            best = min(best, time.perf_counter() - start)
+            audio_seconds = len(audio) / sample_rate
+        results.append((length, best, audio_seconds, best / audio_seconds if audio_seconds else 0.0))
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    intra = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    inter = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    benchmark_loader = SileroModelLoader(profile=InferenceProfile(IntraOpThreads=intra, InterOpThreads=inter))
+    benchmark_loader.get()
+    print(f"{'символов':>9} {'синтез, с':>10} {'аудио, с':>9} {'RTF':>6}")
+    for length, seconds, audio_seconds, rtf in benchmark_rtf(benchmark_loader):
+        print(f"{length:>9} {seconds:>10.3f} {audio_seconds:>9.2f} {rtf:>6.3f}")
@@ -0,0 +1,465 @@
+"""
+Длительный прогон конвейера (soak) с поиском утечек памяти и потоков.
+
+Стрим идет 8-12 часов, и медленный рост (таймеры опроса чата, очередь озвучки,
+ChatMessage, копии подписок, буферы аудио) за короткий запуск не виден.
+Прогон гоняет весь путь parser -> модерация -> SSML -> синтез -> воспроизведение
+на локальных заглушках в ускоренном времени:
+    - SoakParser: живой цикл опроса (_fetch_loop, setTimeout, рассылка подписчикам)
+      с синтетическими ответами get_live_chat вместо сети, паузы опроса делятся
+      на ускорение;
+    - заглушка LM Studio на localhost отвечает разметкой ProsodyEngine;
+    - SoakBackend синтезирует синусоиду, звук не воспроизводится (local_playback),
+      длительность аудио и пауз тоже делится на ускорение;
+    - журнал истории, архив чата и шина сообщений пишут во временный каталог.
+
+Каждые snapshot_minutes модельного времени снимается SoakSnapshot: RSS,
+tracemalloc, потоки, объекты (gc), таймеры, очередь и задержка озвучки.
+Прогон проваливается, если рост после разогрева выходит за SoakLimits.
+
+    python Soak.py [часов] [ускорение] [сообщений в минуту]
+Код выхода 1 - найдены утечки или дрейф задержки.
+"""
+
+import gc
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import tts as pipeline
+from Accent import SSMLGenerator
+from AudioBuffer import AudioBuffer
+from Backends import BackendCapabilities, TTSBackend
+from ChatArchive import ChatArchive
+from HistoryLog import HistoryLog
+from MessageBus import BusSubscriber, MessageBus
+from Moderation import ChatModerator
+from Parser import ChatMessage, YouTubeChatParser
+from Prosody import ProsodyEngine
+from SileroModel import SynthesisJob
+
+WATCHED_TYPES = ("ChatMessage", "SpeechItem", "AudioBuffer", "Timer", "CancellationToken", "SynthesisJob")
+
+PHRASES = (
+    "Привет всем!",
+    "Как дела на стриме?",
+    "Это было очень круто, давай еще раз",
+    "ахахахахахахаха",
+    "ну ты и нуб :)",
+    "GG WP",
+    "Сколько стоит 3 кг яблок по 150 рублей?",
+    "Смотрите мой канал https://example.com/channel",
+    "Звоните +7 900 123-45-67",
+    "Что за игра? Как называется? Где купить?",
+    "Первый раз на стриме, всем привет!!!",
+    "Купил меч, щит, шлем, сапоги",
+    "Стример, а ты пробовал пройти без урона... это вообще реально?",
+    "ОЧЕНЬ ГРОМКО",
+    "Хрен знает, как это работает",
+    "lol",
+)
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса (на платформах без /proc - пиковый)."""
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+@dataclass
+class SoakLimits:
+    """
+    Допустимый рост от базового снимка (после разогрева) до последнего
+
+    Attributes:
+        MaxRssGrowthMb: Рост RSS
+        MaxTracedGrowthMb: Рост памяти Python по tracemalloc
+        MaxThreadGrowth: Рост числа потоков
+        MaxObjectGrowth: Рост числа объектов gc (доля от базового)
+        MaxTypeGrowth: Рост экземпляров отслеживаемых типов (WATCHED_TYPES)
+        MaxLatencyRatio: Во сколько раз p95 задержки озвучки может вырасти
+        LatencySlackMs: Абсолютный допуск задержки (шум планировщика на коротких окнах)
+        MaxQueue: Сообщений в очереди озвучки
+        MaxTimers: Активных таймеров парсера
+    """
+    MaxRssGrowthMb: float = 64.0
+    MaxTracedGrowthMb: float = 16.0
+    MaxThreadGrowth: int = 4
+    MaxObjectGrowth: float = 0.2
+    MaxTypeGrowth: int = 500
+    MaxLatencyRatio: float = 2.0
+    LatencySlackMs: float = 50.0
+    MaxQueue: int = 50
+    MaxTimers: int = 4
+
+
+@dataclass
+class SoakSnapshot:
+    """
+    Снимок состояния процесса
+
+    Attributes:
+        Hours: Модельное время прогона в часах
+        RssMb: RSS процесса
+        TracedMb: Память Python по tracemalloc
+        Threads: Живых потоков
+        Objects: Объектов под наблюдением gc
+        Types: Экземпляров отслеживаемых типов
+        Timers: Активных таймеров парсера и tts
+        Queue: Сообщений в очереди озвучки
+        Messages: Сообщений чата разослано
+        Spoken: Сообщений озвучено
+        LatencyMs: p95 задержки от очереди до воспроизведения за окно (реальное время)
+    """
+    Hours: float
+    RssMb: float
+    TracedMb: float
+    Threads: int
+    Objects: int
+    Types: Dict[str, int] = field(default_factory=dict)
+    Timers: int = 0
+    Queue: int = 0
+    Messages: int = 0
+    Spoken: int = 0
+    LatencyMs: float = 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.Hours:5.1f} ч | RSS {self.RssMb:7.1f} МБ | Python {self.TracedMb:6.1f} МБ | "
+                f"потоков {self.Threads:3} | объектов {self.Objects:8} | таймеров {self.Timers} | "
+                f"очередь {self.Queue:3} | сообщений {self.Messages:7} | озвучено {self.Spoken:7} | "
+                f"p95 {self.LatencyMs:6.1f} мс")
+
+
+class SoakBackend(TTSBackend):
+    """
+    Заглушка Silero: синусоида длиной в сообщение, деленной на ускорение
+    """
+
+    def __init__(self, acceleration: float, audio_per_char: float = 0.06, speakers: Tuple[str, ...] = ()):
+        """
+        Args:
+            acceleration: Во сколько раз модельное время быстрее реального
+            audio_per_char: Длительность речи на символ в модельном времени
+            speakers: Голоса
+        """
+        super().__init__()
+        self.Acceleration = acceleration
+        self.AudioPerChar = audio_per_char
+        self._speakers = tuple(speakers)
+
+    def capabilities(self) -> BackendCapabilities:
+        return BackendCapabilities("soak", Ssml=True, Speakers=self._speakers, Cost=0.0)
+
+    def synthesize(self, job: SynthesisJob) -> Tuple[AudioBuffer, bool]:
+        samples = max(1, int(len(job.Text) * self.AudioPerChar / self.Acceleration * job.SampleRate))
+        tone = 0.1 * np.sin(np.arange(samples, dtype=np.float32) * np.float32(2 * math.pi * 220 / job.SampleRate))
+        return AudioBuffer(tone.astype(np.float32), job.SampleRate), job.Ssml is not None
+
+
+class SoakParser(YouTubeChatParser):
+    """
+    Парсер с живым циклом опроса и синтетическими ответами get_live_chat
+    """
+
+    def __init__(self, acceleration: float, messages_per_minute: float, authors: int = 2000, seed: int = 1):
+        """
+        Args:
+            acceleration: Во сколько раз модельное время быстрее реального
+            messages_per_minute: Темп чата в модельном времени
+            authors: Сколько разных авторов пишет в чат
+            seed: Зерно генератора сообщений
+        """
+        super().__init__("https://www.youtube.com/watch?v=soaktest000")
+        self.Acceleration = acceleration
+        self.MessagesPerMinute = messages_per_minute
+        self.Authors = authors
+        self.Dispatched = 0
+        self._random = random.Random(seed)
+        self._polls = 0
+
+    def setTimeout(self, callback, delay: float) -> threading.Timer:
+        return super().setTimeout(callback, delay / self.Acceleration)
+
+    def _get_initial_data(self) -> Optional[Dict]:
+        return {"soak": True}
+
+    def _extract_continuation_token(self, initial_data: Dict) -> Optional[str]:
+        return "soak-0"
+
+    def _fetch_chat_messages(self, continuation_token: str) -> tuple[Optional[List[Dict]], Optional[str]]:
+        """Ответ в формате get_live_chat: сообщения за 2 секунды опроса модельного времени."""
+        self._polls += 1
+        expected = self.MessagesPerMinute * 2.0 / 60
+        count = int(expected) + (self._random.random() < expected - int(expected))
+        now = int(time.time() * 1_000_000)
+        actions = []
+        for _ in range(count):
+            text = self._random.choice(PHRASES)
+            if self._random.random() < 0.1:
+                text = f"{text} {text} {text}"  # Спам повторами для SpamCompressor
+            actions.append({"addChatItemAction": {"item": {"liveChatTextMessageRenderer": {
+                "authorName": {"simpleText": f"Зритель{self._random.randrange(self.Authors)}"},
+                "message": {"runs": [{"text": text}]},
+                "timestampUsec": str(now),
+            }}}})
+        data = {"continuationContents": {"liveChatContinuation": {
+            "actions": actions,
+            "continuations": [{"timedContinuationData": {"continuation": f"soak-{self._polls}"}}],
+        }}}
+        messages, token = self._parse_chat_response(data)
+        self.Dispatched += len(messages)
+        return messages, token
+
+
+class _StubLlmHandler(BaseHTTPRequestHandler):
+    """Заглушка LM Studio: /models и /chat/completions с разметкой по правилам."""
+
+    prosody = ProsodyEngine()
+    delay = 0.0
+
+    def do_GET(self) -> None:
+        self._reply({"data": [{"id": "soak"}]})
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = request["messages"][-1]["content"]
+        style, _, text = prompt.partition("\nТекст: ")
+        time.sleep(self.delay)
+        ssml = self.prosody.markup(text, style.removeprefix("Стиль: "))
+        self._reply({"choices": [{"message": {"content": ssml}, "finish_reason": "stop"}]})
+
+    def _reply(self, body: dict) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class SoakTts(pipeline.tts):
+    """tts с замером задержки от постановки в очередь до начала воспроизведения."""
+
+    def __init__(self):
+        super().__init__()
+        self.Latencies: List[float] = []
+        self.Spoken = 0
+
+    def _play(self, audio, batch, in_flight):
+        now = time.monotonic()
+        for item in batch:
+            self.Latencies.append((now - item.Enqueued) * 1000)
+        self.Spoken += len(batch)
+        return super()._play(audio, batch, in_flight)
+
+
+def snapshot(hours: float, parser: SoakParser, speaker: SoakTts) -> SoakSnapshot:
+    """Снимок после полной сборки мусора (окно задержек забирается)."""
+    gc.collect()
+    objects = gc.get_objects()
+    types = Counter(type(obj).__name__ for obj in objects)
+    latencies, speaker.Latencies = speaker.Latencies, []
+    return SoakSnapshot(
+        Hours=hours,
+        RssMb=rss_mb(),
+        TracedMb=tracemalloc.get_traced_memory()[0] / (1024 * 1024),
+        Threads=threading.active_count(),
+        Objects=len(objects),
+        Types={name: types.get(name, 0) for name in WATCHED_TYPES},
+        Timers=len(parser._activeTimers) + len(speaker._activeTimers),
+        Queue=speaker._messageQueue.qsize(),
+        Messages=parser.Dispatched,
+        Spoken=speaker.Spoken,
+        LatencyMs=percentile(latencies, 0.95))
+
+
+def evaluate(snapshots: List[SoakSnapshot], limits: SoakLimits) -> List[str]:
+    """
+    Сравнивает снимки после разогрева с базовым (второй снимок)
+
+    Returns:
+        Нарушения порогов (пусто - прогон пройден)
+    """
+    if len(snapshots) < 3:
+        return ["Слишком короткий прогон: нужно хотя бы 3 снимка"]
+    base, last = snapshots[1], snapshots[-1]
+    if not last.Spoken:
+        return [f"Конвейер ничего не озвучил (разослано сообщений: {last.Messages})"]
+    failures = []
+    if last.RssMb - base.RssMb > limits.MaxRssGrowthMb:
+        failures.append(f"RSS вырос на {last.RssMb - base.RssMb:.1f} МБ (порог {limits.MaxRssGrowthMb})")
+    if last.TracedMb - base.TracedMb > limits.MaxTracedGrowthMb:
+        failures.append(f"Память Python выросла на {last.TracedMb - base.TracedMb:.1f} МБ "
+                        f"(порог {limits.MaxTracedGrowthMb})")
+    if last.Threads - base.Threads > limits.MaxThreadGrowth:
+        failures.append(f"Потоков стало больше на {last.Threads - base.Threads} (порог {limits.MaxThreadGrowth})")
+    if last.Objects > base.Objects * (1 + limits.MaxObjectGrowth):
+        failures.append(f"Объектов стало {last.Objects} против {base.Objects} "
+                        f"(порог +{limits.MaxObjectGrowth:.0%})")
+    for name in WATCHED_TYPES:
+        growth = last.Types[name] - base.Types[name]
+        if growth > limits.MaxTypeGrowth:
+            failures.append(f"{name}: +{growth} экземпляров (порог {limits.MaxTypeGrowth})")
+    peak_queue = max(item.Queue for item in snapshots[1:])
+    if peak_queue > limits.MaxQueue:
+        failures.append(f"Очередь озвучки дошла до {peak_queue} (порог {limits.MaxQueue}; "
+                        f"если конвейер не успевает за ускорением - уменьшите ускорение)")
+    peak_timers = max(item.Timers for item in snapshots[1:])
+    if peak_timers > limits.MaxTimers:
+        failures.append(f"Активных таймеров: {peak_timers} (порог {limits.MaxTimers})")
+    latency_limit = base.LatencyMs * limits.MaxLatencyRatio + limits.LatencySlackMs
+    drifted = [item for item in snapshots[2:] if item.LatencyMs > latency_limit]
+    if drifted:
+        failures.append(f"p95 задержки {drifted[-1].LatencyMs:.1f} мс на {drifted[-1].Hours:.1f} ч "
+                        f"против {base.LatencyMs:.1f} мс в начале (порог {latency_limit:.1f} мс)")
+    return failures
+
+
+def run(hours: float = 8.0, acceleration: float = 120.0, messages_per_minute: float = 20.0,
+        snapshot_minutes: float = 30.0, limits: Optional[SoakLimits] = None, seed: int = 1) -> List[str]:
+    """
+    Прогоняет конвейер hours модельных часов за hours * 3600 / acceleration секунд
+
+    Returns:
+        Нарушения порогов (пусто - прогон пройден)
+    """
+    limits = limits or SoakLimits()
+    workdir = tempfile.mkdtemp(prefix="soak_")
+    with open(os.path.join(workdir, "blocklist.txt"), "w", encoding="utf-8") as blocklist:
+        blocklist.write("хрен*\nнуб\n")
+
+    _StubLlmHandler.delay = 0.3 / acceleration
+    llm = ThreadingHTTPServer(("127.0.0.1", 0), _StubLlmHandler)
+    threading.Thread(target=llm.serve_forever, name="SoakLlm", daemon=True).start()
+
+    # Заглушки вместо модели, звука, LM Studio и файлов рабочего каталога
+    saved = {name: getattr(pipeline, name) for name in ("local_playback", "History", "Moderator", "Accenter")}
+    saved_gap, saved_fallback = pipeline.PostProcessor.GapSeconds, pipeline.Scheduler.Fallback
+    pipeline.local_playback = False
+    pipeline.History = HistoryLog(os.path.join(workdir, "history.txt"))
+    pipeline.Moderator = ChatModerator(os.path.join(workdir, "blocklist.txt"))
+    pipeline.Accenter = SSMLGenerator(f"http://127.0.0.1:{llm.server_address[1]}/v1")
+    pipeline.PostProcessor.GapSeconds = saved_gap / acceleration
+    pipeline.Scheduler.Fallback = None  # Заглушка и так мгновенная, дешевый движок не нужен
+    pipeline.Engines["soak"] = SoakBackend(acceleration, speakers=tuple(pipeline.Speakers))
+
+    tracemalloc.start()
+    speaker = SoakTts()
+    speaker.model = "soak"
+    parser = SoakParser(acceleration, messages_per_minute, seed=seed)
+    archive = ChatArchive(os.path.join(workdir, "chat_archive.sqlite"))
+    # Маленькое кольцо шины заполняется за разогрев, иначе его законный рост похож на утечку
+    bus = MessageBus(os.path.join(workdir, "chat_bus.sock"), capacity=1024)
+    subscriber = BusSubscriber(bus.Address)
+    received = [0]
+
+    def read_bus() -> None:
+        try:
+            for _ in subscriber:
+                received[0] += 1
+        except OSError:
+            pass
+
+    def speak(message: ChatMessage) -> None:
+        speaker.ospeak(message.Message, False, author=message.Author, stream=message.VideoId)
+
+    snapshots: List[SoakSnapshot] = []
+    first = None
+    try:
+        speaker.preload()
+        bus.start()
+        threading.Thread(target=read_bus, name="SoakBusReader", daemon=True).start()
+        parser.on(speak)
+        parser.on(pipeline.History.log_message)
+        parser.on(archive.add)
+        parser.on(bus.publish)
+        threading.Thread(target=parser.start, name="SoakParser", daemon=True).start()
+
+        started = time.monotonic()
+        interval = snapshot_minutes * 60 / acceleration
+        steps = max(3, int(round(hours * 60 / snapshot_minutes)))
+        print(f"🧪 Soak: {hours} ч модельного времени за {hours * 3600 / acceleration:.0f} с "
+              f"(ускорение x{acceleration:g}, {messages_per_minute:g} сообщений/мин), каталог {workdir}")
+        for step in range(1, steps + 1):
+            time.sleep(max(0.0, started + step * interval - time.monotonic()))
+            snapshots.append(snapshot(step * snapshot_minutes / 60, parser, speaker))
+            print(snapshots[-1])
+            if step == 2:
+                first = tracemalloc.take_snapshot()
+        last = tracemalloc.take_snapshot()
+    finally:
+        parser.stop()
+        parser.clear()
+        deadline = time.monotonic() + 10
+        while speaker._isPlaying and time.monotonic() < deadline:
+            time.sleep(0.05)
+        subscriber.close()
+        bus.stop()
+        archive.close()
+        pipeline.History.close()
+        pipeline.Moderator.stop()
+        llm.shutdown()
+        llm.server_close()
+        tracemalloc.stop()
+        pipeline.Engines.pop("soak", None)
+        for name, value in saved.items():
+            setattr(pipeline, name, value)
+        pipeline.PostProcessor.GapSeconds, pipeline.Scheduler.Fallback = saved_gap, saved_fallback
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if first is not None:
+        print("\n📊 Рост памяти по строкам кода (tracemalloc, после разогрева):")
+        for stat in last.compare_to(first, "lineno")[:10]:
+            print(f"    {stat}")
+    print(f"📊 Шина: прочитано {received[0]} из {parser.Dispatched}; архив: {archive.Stats}")
+
+    failures = evaluate(snapshots, limits)
+    if len(snapshots) >= 2:
+        base = snapshots[1]
+        span = snapshots[-1].Hours - base.Hours
+        if span > 0:
+            slope = (snapshots[-1].RssMb - base.RssMb) / span
+            print(f"📊 Рост RSS: {slope:+.2f} МБ/ч (за 12 ч: {slope * 12:+.1f} МБ)")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Утечек и дрейфа задержки не найдено")
+    return failures
+
+
+if __name__ == "__main__":
+    failed = run(float(sys.argv[1]) if len(sys.argv) > 1 else 8.0,
+                 float(sys.argv[2]) if len(sys.argv) > 2 else 120.0,
+                 float(sys.argv[3]) if len(sys.argv) > 3 else 20.0)
+    sys.exit(1 if failed else 0)
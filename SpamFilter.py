@@ -0,0 +1,177 @@
+"""
+Сжатие спама в сообщениях чата перед синтезом.
+
+"ааааааааа", "))))))))", цепочки эмодзи и повторы одного слова озвучиваются
+секундами и тратят время модели. Компрессор схлопывает повторы символов, слогов
+и слов, ограничивает длину сообщения и убирает или заменяет эмодзи.
+Все шаги - скомпилированные регулярные выражения с ограниченным откатом
+и один проход по словам, время работы линейно по длине сообщения.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict
+
+
+# Диапазоны эмодзи, модификаторы и флаги
+EMOJI_CHARS = (
+    '\U0001F000-\U0001FAFF'
+    '\u2600-\u27BF'
+    '\u2B00-\u2BFF'
+    '\u2300-\u23FF'
+    '\uFE0F\u200D\u20E3'
+)
+
+# Названия частых эмодзи для режима "summarize"
+EMOJI_NAMES: Dict[str, str] = {
+    '😂': 'ха-ха', '🤣': 'ха-ха', '😆': 'ха-ха', '😄': 'улыбка', '😀': 'улыбка', '🙂': 'улыбка',
+    '😊': 'улыбка', '😍': 'влюблён', '🥰': 'влюблён', '😘': 'поцелуй', '😭': 'плачет', '😢': 'плачет',
+    '😡': 'злится', '🤬': 'злится', '😱': 'в шоке', '😮': 'в шоке', '🤔': 'задумался', '😎': 'круто',
+    '👍': 'лайк', '👎': 'дизлайк', '👏': 'аплодисменты', '🙏': 'спасибо', '💪': 'сила', '🔥': 'огонь',
+    '❤': 'сердечко', '💔': 'разбитое сердце', '💯': 'сто из ста', '🎉': 'праздник', '💀': 'череп',
+    '🤡': 'клоун', '👀': 'глаза', '🤝': 'рукопожатие', '✅': 'галочка', '❌': 'крестик',
+}
+
+
+@dataclass
+class SpamStats:
+    """
+    Статистика сжатия
+
+    Attributes:
+        Messages: Обработано сообщений
+        CharsIn: Символов на входе
+        CharsOut: Символов после сжатия (то, что уходит в синтез)
+    """
+    Messages: int = 0
+    CharsIn: int = 0
+    CharsOut: int = 0
+
+    @property
+    def CharsSaved(self) -> int:
+        """Сколько символов не пошло в синтез."""
+        return self.CharsIn - self.CharsOut
+
+    def __str__(self) -> str:
+        percent = 100.0 * self.CharsSaved / self.CharsIn if self.CharsIn else 0.0
+        return (f"сообщений: {self.Messages}, символов: {self.CharsIn} -> {self.CharsOut} "
+                f"(сэкономлено {self.CharsSaved}, {percent:.1f}%)")
+
+
+class SpamCompressor:
+    """
+    Схлопывает повторы и эмодзи в сообщениях чата
+    """
+
+    EMOJI_MODES = ('strip', 'summarize', 'keep')
+
+    def __init__(self,
+                 max_letter_repeat: int = 2,
+                 max_punct_repeat: int = 3,
+                 max_syllable_repeat: int = 2,
+                 max_word_repeat: int = 2,
+                 max_length: int = 200,
+                 emoji: str = "summarize"):
+        """
+        Args:
+            max_letter_repeat: Сколько одинаковых букв подряд оставлять ("ааааа" -> "аа")
+            max_punct_repeat: Сколько одинаковых знаков подряд оставлять ("!!!!!!" -> "!!!")
+            max_syllable_repeat: Сколько повторов слога внутри слова оставлять ("хахахаха" -> "хаха")
+            max_word_repeat: Сколько одинаковых слов подряд оставлять
+            max_length: Максимальная длина сообщения в символах (0 - без ограничения)
+            emoji: "strip" - удалять, "summarize" - заменять цепочку одним словом, "keep" - оставлять один
+        """
+        if emoji not in self.EMOJI_MODES:
+            raise ValueError(f"emoji должен быть одним из {self.EMOJI_MODES}")
+        self.MaxWordRepeat = max_word_repeat
+        self.MaxLength = max_length
+        self.EmojiMode = emoji
+        self.Stats = SpamStats()
+        self._statsLock = threading.Lock()
+
+        # Только буквы: повторы цифр (1000000) - это числа, их ограничивает NumeralExpander
+        self._letterRepeat = re.compile(r'([^\W\d])\1{%d,}' % max_letter_repeat)
+        self._letterKeep = max_letter_repeat
+        self._punctRepeat = re.compile(r'([^\w\s])\1{%d,}' % max_punct_repeat)
+        self._punctKeep = max_punct_repeat
+        # Слог фиксированной длины 2-4 символа - откат ограничен константой
+        self._syllableRepeat = re.compile(r'([^\W\d]{2,4}?)\1{%d,}' % max_syllable_repeat)
+        self._syllableKeep = max_syllable_repeat
+        # Шорткоды YouTube (":thumbsup:", ":face-blue-smiling:") только латиницей: кириллица между двоеточиями - текст
+        shortcode = r':[A-Za-z][A-Za-z0-9_+-]*:'
+        self._emojiRun = re.compile(
+            r'(?:[%s]|%s)(?:\s*(?:[%s]|%s))*' % (EMOJI_CHARS, shortcode, EMOJI_CHARS, shortcode))
+        self._wordToken = re.compile(r'\S+')
+        self._wordKey = re.compile(r'[^\w]+')
+        self._spaces = re.compile(r'\s{2,}')
+
+    def _replace_emoji(self, match: re.Match) -> str:
+        """Заменяет цепочку эмодзи в зависимости от EmojiMode."""
+        if self.EmojiMode == 'strip':
+            return ' '
+        run = match.group(0)
+        if self.EmojiMode == 'keep':
+            return f" {run[0]} " if not run.startswith(':') else f" {run.split(':')[1]} "
+        for char in run:
+            if char in EMOJI_NAMES:
+                return f" {EMOJI_NAMES[char]} "
+        return ' '
+
+    def _collapse_words(self, text: str) -> str:
+        """Убирает повторы одного слова подряд сверх MaxWordRepeat (один проход)."""
+        words = []
+        previous_key = None
+        repeats = 0
+        for match in self._wordToken.finditer(text):
+            word = match.group(0)
+            key = self._wordKey.sub('', word).casefold() or word
+            if key == previous_key:
+                repeats += 1
+                if repeats >= self.MaxWordRepeat:
+                    continue
+            else:
+                previous_key = key
+                repeats = 0
+            words.append(word)
+        return ' '.join(words)
+
+    def _truncate(self, text: str) -> str:
+        """Обрезает сообщение по границе слова."""
+        if not self.MaxLength or len(text) <= self.MaxLength:
+            return text
+        cut = text.rfind(' ', 0, self.MaxLength + 1)
+        if cut < self.MaxLength // 2:
+            cut = self.MaxLength
+        return text[:cut].rstrip()
+
+    def compress(self, text: str) -> str:
+        """
+        Сжимает сообщение
+
+        Args:
+            text: Исходный текст сообщения
+
+        Returns:
+            Текст для синтеза (может быть пустым, если в сообщении были только эмодзи)
+
+        Example:
+            "ааааааа)))))))) 😂😂😂 gg gg gg gg" -> "аа))) ха-ха gg gg"
+        """
+        source_length = len(text)
+
+        text = self._emojiRun.sub(self._replace_emoji, text)
+        text = self._letterRepeat.sub(lambda m: m.group(1) * self._letterKeep, text)
+        text = self._punctRepeat.sub(lambda m: m.group(1) * self._punctKeep, text)
+        text = self._syllableRepeat.sub(lambda m: m.group(1) * self._syllableKeep, text)
+        if self.MaxWordRepeat:
+            text = self._collapse_words(text)
+        else:
+            text = self._spaces.sub(' ', text).strip()
+        text = self._truncate(text)
+
+        with self._statsLock:
+            self.Stats.Messages += 1
+            self.Stats.CharsIn += source_length
+            self.Stats.CharsOut += len(text)
+        return text
@@ -0,0 +1,480 @@
+"""
+Пул процессов для синтеза речи Silero.
+
+Каждый процесс держит свою модель и свой бюджет потоков torch, поэтому синтез
+нескольких сообщений идет параллельно на многоядерной машине.
+Аудио возвращается через кольцо блоков разделяемой памяти, которыми владеет
+родительский процесс (воркер пишет результат прямо в выданный блок), а не
+через pickle тензоров. Родитель получает AudioBuffer прямо над блоком, блок
+возвращается в кольцо при release() буфера после воспроизведения.
+Результаты выдаются строго в порядке отправки заданий, чтобы озвучка
+не перемешивала сообщения чата. Упавший процесс перезапускается, а его
+текущее задание завершается ошибкой, чтобы ожидание результата не висело.
+
+Бенчмарк на модели-заглушке (без torch):
+    python SynthPool.py [максимум процессов]
+"""
+
+import math
+import os
+import queue
+import threading
+import time
+import traceback
+import multiprocessing as mp
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from SileroModel import SileroModelLoader, InferenceProfile, SynthesisJob, synthesize_job
+from AudioBuffer import AudioBuffer, CopyMetrics
+
+
+# Как часто ожидание результата проверяет, живы ли процессы (секунды)
+LIVENESS_INTERVAL = 0.5
+
+
+class StubModel:
+    """
+    Заглушка модели Silero для бенчмарков и тестов пула: нагружает CPU
+    пропорционально длине текста и возвращает синусоиду
+    """
+
+    def __init__(self, seconds_per_char: float = 0.002, audio_per_char: float = 0.06):
+        """
+        Args:
+            seconds_per_char: Время "синтеза" на символ
+            audio_per_char: Длительность аудио на символ в секундах
+        """
+        self.SecondsPerChar = seconds_per_char
+        self.AudioPerChar = audio_per_char
+
+    def apply_tts(self, text: Optional[str] = None, ssml_text: Optional[str] = None,
+                  speaker: str = 'baya', sample_rate: int = 48000, **kwargs) -> np.ndarray:
+        """Имитирует apply_tts: занимает CPU и возвращает float32 аудио."""
+        source = ssml_text or text or ''
+        deadline = time.perf_counter() + len(source) * self.SecondsPerChar
+        while time.perf_counter() < deadline:
+            pass
+        samples = max(1, int(len(source) * self.AudioPerChar * sample_rate))
+        return (0.1 * np.sin(np.arange(samples, dtype=np.float32) * (2 * math.pi * 220 / sample_rate))).astype(np.float32)
+
+
+def stub_model_factory(threads: int) -> StubModel:
+    """Фабрика заглушки (сигнатура как у silero_model_factory)."""
+    return StubModel()
+
+
+def silero_model_factory(threads: int, **loader_kwargs) -> SileroModelLoader:
+    """
+    Фабрика модели Silero для процесса пула
+
+    Args:
+        threads: Бюджет intra-op потоков torch на процесс
+        **loader_kwargs: Аргументы SileroModelLoader (language, model_id, name, device, local_path)
+    """
+    loader = SileroModelLoader(profile=InferenceProfile(IntraOpThreads=threads, InterOpThreads=1), **loader_kwargs)
+    loader.get()
+    return loader
+
+
+def _worker_main(tasks, results, model_factory: Callable[[int], Any], threads: int, cancelled=None,
+                 busy=None, index: int = 0) -> None:
+    """
+    Цикл процесса-воркера
+
+    Задание: (seq, SynthesisJob, имя блока разделяемой памяти, емкость блока в сэмплах, номер блока).
+    cancelled: Флаги отмены по номеру блока (задание с поднятым флагом не синтезируется).
+    busy: Последнее взятое задание по номеру воркера - родитель завершает его ошибкой, если процесс упал.
+    Результат: (seq, длина в сэмплах, использован ли SSML, аудио при переполнении блока, ошибка,
+    время синтеза в секундах).
+    """
+    blocks: Dict[str, shared_memory.SharedMemory] = {}
+    load_error = None
+    try:
+        model = model_factory(threads)
+    except Exception as e:
+        # Продолжаем принимать задания и отвечать ошибкой, чтобы очередь не зависла
+        load_error = f"Ошибка загрузки модели в воркере: {e}"
+        results.put((-1, 0, False, None, load_error, 0.0))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, job, block_name, capacity, block_index = task
+        if busy is not None:
+            busy[index] = seq
+        if cancelled is not None and cancelled[block_index]:
+            results.put((seq, 0, False, None, None, 0.0))
+            continue
+        if load_error is not None:
+            results.put((seq, 0, False, None, load_error, 0.0))
+            continue
+        started = time.perf_counter()
+        try:
+            audio, used_ssml = synthesize_job(model.apply_tts, job)
+            audio = audio.numpy() if hasattr(audio, 'numpy') else np.asarray(audio)
+            audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
+            if len(audio) <= capacity:
+                if block_name not in blocks:
+                    blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+                np.ndarray((capacity,), dtype=np.float32, buffer=blocks[block_name].buf)[:len(audio)] = audio
+                results.put((seq, len(audio), used_ssml, None, None, time.perf_counter() - started))
+            else:
+                # Аудио не влезло в блок - редкий случай, передаем байтами
+                results.put((seq, len(audio), used_ssml, audio.tobytes(), None, time.perf_counter() - started))
+        except Exception as e:
+            results.put((seq, 0, False, None, f"{e}\n{traceback.format_exc()}", 0.0))
+
+    for block in blocks.values():
+        block.close()
+
+
+class SharedAudioRing:
+    """
+    Кольцо блоков разделяемой памяти float32 фиксированной емкости
+    """
+
+    def __init__(self, blocks: int, capacity: int):
+        """
+        Args:
+            blocks: Количество блоков
+            capacity: Емкость блока в сэмплах
+        """
+        self.Capacity = capacity
+        self._blocks = [shared_memory.SharedMemory(create=True, size=capacity * 4) for _ in range(blocks)]
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for index in range(blocks):
+            self._free.put(index)
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """Берет свободный блок (ждет, если все заняты)."""
+        return self._free.get(timeout=timeout)
+
+    def release(self, index: int) -> None:
+        """Возвращает блок в кольцо."""
+        self._free.put(index)
+
+    def name(self, index: int) -> str:
+        return self._blocks[index].name
+
+    def view(self, index: int, length: int) -> np.ndarray:
+        """Массив поверх блока без копирования."""
+        return np.ndarray((self.Capacity,), dtype=np.float32, buffer=self._blocks[index].buf)[:length]
+
+    def close(self) -> None:
+        """Освобождает разделяемую память."""
+        for block in self._blocks:
+            try:
+                block.unlink()
+                block.close()
+            except (FileNotFoundError, BufferError):
+                # Буфер еще кто-то держит - память освободится вместе с ним
+                pass
+        self._blocks = []
+
+
+class SynthesisPool:
+    """
+    Пул процессов синтеза с выдачей результатов в порядке отправки
+    """
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 threads_per_worker: Optional[int] = None,
+                 model_factory: Optional[Callable[[int], Any]] = None,
+                 max_audio_seconds: float = 30.0,
+                 sample_rate: int = 48000):
+        """
+        Args:
+            workers: Количество процессов (по умолчанию половина ядер)
+            threads_per_worker: Потоков torch на процесс (по умолчанию ядра / процессы)
+            model_factory: Фабрика модели f(threads) -> объект с apply_tts
+                           (по умолчанию Silero; должна быть picklable)
+            max_audio_seconds: Емкость блока разделяемой памяти в секундах аудио
+            sample_rate: Частота дискретизации (для расчета емкости блока)
+        """
+        cores = os.cpu_count() or 2
+        self.Size = workers or max(1, cores // 2)
+        self.ThreadsPerWorker = threads_per_worker or max(1, cores // self.Size)
+        self._modelFactory = model_factory or silero_model_factory
+        self._capacity = int(max_audio_seconds * sample_rate)
+        self._sampleRate = sample_rate
+        self._context = mp.get_context("spawn")
+        self._tasks = None
+        self._results = None
+        self._processes: List[mp.Process] = []
+        self._ring: Optional[SharedAudioRing] = None
+        self._collector: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition()
+        self._finished: Dict[int, Tuple[Optional[AudioBuffer], bool, Optional[str], float]] = {}
+        self._cancelled: set = set()  # Отмененные задания, результат которых еще не пришел
+        self._cancelFlags = None
+        self._busy = None
+        self._blockOf: Dict[int, int] = {}
+        self._nextSeq = 0
+        self._nextResult = 0
+        self._taken = 0
+        self._started = False
+
+    def start(self) -> None:
+        """Запускает процессы (модели в них грузятся параллельно)."""
+        with self._lock:
+            if self._started:
+                return
+            self._tasks = self._context.Queue()
+            self._results = self._context.Queue()
+            # Блоков вдвое больше процессов: пока одни играют, другие заполняются
+            self._ring = SharedAudioRing(self.Size * 2, self._capacity)
+            self._cancelFlags = self._context.RawArray('b', self.Size * 2)
+            self._busy = self._context.RawArray('q', [-1] * self.Size)
+            for index in range(self.Size):
+                self._processes.append(self._spawn(index))
+            self._collector = threading.Thread(target=self._collect, name="SynthesisCollector", daemon=True)
+            self._collector.start()
+            self._started = True
+            print(f"✅ Пул синтеза: {self.Size} процессов по {self.ThreadsPerWorker} потоков")
+
+    def _spawn(self, index: int) -> mp.Process:
+        """Запускает процесс-воркер с номером index."""
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._tasks, self._results, self._modelFactory, self.ThreadsPerWorker, self._cancelFlags,
+                  self._busy, index),
+            name=f"SynthesisWorker-{index}",
+            daemon=True)
+        process.start()
+        return process
+
+    def _check_workers(self) -> None:
+        """
+        Находит упавшие процессы и перезапускает их
+
+        Задание, которое процесс выполнял, завершается ошибкой (его результат уже не придет),
+        блок кольца возвращается. Остальные задания из очереди достанутся живым процессам.
+        """
+        released = []
+        with self._done:
+            with self._lock:
+                if not self._started:
+                    return
+                for index, process in enumerate(self._processes):
+                    if process.exitcode is None:
+                        continue
+                    print(f"⚠️ Процесс синтеза {index} завершился с кодом {process.exitcode}, перезапускаю")
+                    seq = self._busy[index]
+                    self._busy[index] = -1
+                    self._processes[index] = self._spawn(index)
+                    block = self._blockOf.pop(seq, None)
+                    if block is None:
+                        continue  # Результат задания уже получен
+                    released.append(block)
+                    if seq in self._cancelled:
+                        self._cancelled.discard(seq)
+                    else:
+                        error = f"процесс синтеза завершился с кодом {process.exitcode}"
+                        self._finished[seq] = (None, False, error, 0.0)
+            self._done.notify_all()
+        for block in released:
+            self._ring.release(block)
+
+    def submit(self, job: SynthesisJob) -> int:
+        """
+        Отправляет задание в пул
+
+        Ждет свободный блок кольца, если все блоки заняты неосвобожденными результатами.
+
+        Returns:
+            Порядковый номер задания
+        """
+        self.start()
+        block = self._ring.acquire()
+        self._cancelFlags[block] = 0
+        with self._lock:
+            seq = self._nextSeq
+            self._nextSeq += 1
+            self._blockOf[seq] = block
+        self._tasks.put((seq, job, self._ring.name(block), self._capacity, block))
+        return seq
+
+    def _collect(self) -> None:
+        """Принимает результаты воркеров (фоновый поток)."""
+        while True:
+            try:
+                seq, length, used_ssml, overflow, error, elapsed = self._results.get()
+            except (EOFError, OSError):
+                break
+            if seq is None:
+                break
+            if seq < 0:
+                print(f"❌ {error}")
+                continue
+            with self._done:
+                # Блок снимается под тем же замком, что и выдача результата: задание всегда
+                # либо в _blockOf, либо в _finished, либо уже забрано (это проверяет cancel)
+                with self._lock:
+                    block = self._blockOf.pop(seq, None)
+                if block is None:
+                    continue  # Задание уже завершено ошибкой после падения процесса
+                audio = None
+                if error is None and overflow is None:
+                    # Запись воркера в блок - единственное копирование аудио
+                    CopyMetrics.copied(length * 4)
+                    audio = AudioBuffer(self._ring.view(block, length), self._sampleRate,
+                                        release=partial(self._ring.release, block))
+                else:
+                    self._ring.release(block)
+                    if error is None:
+                        # Аудио передано байтами (копия в очереди и при распаковке)
+                        CopyMetrics.copied(len(overflow) * 2)
+                        audio = AudioBuffer(np.frombuffer(overflow, dtype=np.float32), self._sampleRate)
+                discard = seq in self._cancelled
+                if discard:
+                    self._cancelled.discard(seq)
+                else:
+                    self._finished[seq] = (audio, used_ssml, error, elapsed)
+                    self._done.notify_all()
+            if discard and audio is not None:
+                audio.release()
+
+    def cancel(self, seq: int) -> bool:
+        """
+        Отменяет задание, результат которого еще не забран через result
+
+        Воркер пропускает задание, если еще не начал его; готовый результат
+        сразу возвращает блок в кольцо. Забирать результат после отмены не нужно.
+
+        Returns:
+            False, если задание уже отменено, забрано или не отправлялось
+        """
+        audio = None
+        with self._done:
+            if seq in self._finished:
+                audio = self._finished.pop(seq)[0]
+            else:
+                with self._lock:
+                    block = self._blockOf.get(seq)
+                if block is None or seq in self._cancelled:
+                    return False
+                self._cancelled.add(seq)
+                self._cancelFlags[block] = 1
+            self._taken += 1
+        if audio is not None:
+            audio.release()
+        return True
+
+    def result(self, seq: int, timeout: Optional[float] = None) -> Tuple[AudioBuffer, bool]:
+        """
+        Возвращает результат задания seq (дожидается его)
+
+        Буфер указывает прямо в разделяемую память: после воспроизведения его нужно
+        освободить через release(), иначе кольцо блоков закончится.
+
+        Returns:
+            Кортеж (буфер аудио float32, был ли использован SSML)
+
+        Raises:
+            TimeoutError: Результат не готов за timeout
+            RuntimeError: Воркер не смог синтезировать задание
+        """
+        audio, used_ssml, _ = self.result_timed(seq, timeout)
+        return audio, used_ssml
+
+    def result_timed(self, seq: int, timeout: Optional[float] = None) -> Tuple[AudioBuffer, bool, float]:
+        """
+        Как result, но еще и время синтеза в воркере (для RTF без ожидания в очереди)
+
+        Пока результата нет, раз в LIVENESS_INTERVAL проверяет процессы: задание упавшего
+        процесса завершается RuntimeError, а не ждет вечно.
+
+        Returns:
+            Кортеж (буфер аудио float32, был ли использован SSML, секунд синтеза)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._done:
+            while seq not in self._finished:
+                remaining = LIVENESS_INTERVAL if deadline is None else deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Задание {seq} еще синтезируется")
+                if not self._done.wait(min(remaining, LIVENESS_INTERVAL)):
+                    self._check_workers()
+            audio, used_ssml, error, elapsed = self._finished.pop(seq)
+            self._taken += 1
+        if error is not None:
+            raise RuntimeError(f"Ошибка синтеза в воркере: {error}")
+        return audio, used_ssml, elapsed
+
+    def next_result(self, timeout: Optional[float] = None) -> Tuple[AudioBuffer, bool]:
+        """
+        Результат следующего по порядку отправки задания (для единственного потребителя пула;
+        если пулом пользуются несколько потребителей, каждый забирает свои задания через result)
+        """
+        with self._done:
+            seq = self._nextResult
+            self._nextResult += 1
+        return self.result(seq, timeout)
+
+    @property
+    def Pending(self) -> int:
+        """Заданий отправлено, но еще не забрано."""
+        return self._nextSeq - self._taken
+
+    def close(self) -> None:
+        """Останавливает процессы и освобождает разделяемую память."""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes.clear()
+        self._results.put((None, 0, False, None, None, 0.0))
+        self._collector.join(timeout=5)
+        self._ring.close()
+
+
+def benchmark(max_workers: int, messages: int = 48) -> List[Tuple[int, float]]:
+    """
+    Пропускная способность пула на модели-заглушке
+
+    Returns:
+        Список (процессов, сообщений в секунду)
+    """
+    texts = [f"Сообщение номер {i} из чата, " * (1 + i % 4) for i in range(messages)]
+    results = []
+    workers = 1
+    while workers <= max_workers:
+        pool = SynthesisPool(workers, 1, model_factory=stub_model_factory)
+        pool.start()
+        start = time.perf_counter()
+        # Как в очереди tts: заданий в полете не больше, чем процессов
+        for text in texts:
+            if pool.Pending >= workers:
+                audio, _ = pool.next_result()
+                audio.release()
+            pool.submit(SynthesisJob(text, None, 'baya', 48000))
+        while pool.Pending:
+            audio, _ = pool.next_result()
+            audio.release()
+        elapsed = time.perf_counter() - start
+        pool.close()
+        results.append((workers, messages / elapsed))
+        workers *= 2
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 2)
+    print(f"{'процессов':>9} {'сообщений/с':>12}")
+    for count, throughput in benchmark(limit):
+        print(f"{count:>9} {throughput:>12.1f}")
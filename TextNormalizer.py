@@ -0,0 +1,235 @@
+"""
+Нормализация текста чата перед синтезом речи.
+
+Все таблицы и регулярные выражения собираются один раз при создании объекта,
+текст проходит одним сканированием общего токенизатора (числа, латиница, символы),
+а транслитерация слов кэшируется.
+"""
+
+import re
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
+
+from Numerals import NumeralExpander
+
+
+# Диграфы (двухбуквенные комбинации) - имеют приоритет над одиночными буквами
+DIGRAPHS = {
+    'sh': 'ш', 'ch': 'ч', 'th': 'з', 'ph': 'ф', 'zh': 'ж',
+    'ts': 'ц', 'ck': 'к', 'ng': 'нг', 'qu': 'кв',
+    'Sh': 'Ш', 'Ch': 'Ч', 'Th': 'З', 'Ph': 'Ф', 'Zh': 'Ж',
+    'Ts': 'Ц', 'Ck': 'К', 'Ng': 'Нг', 'Qu': 'Кв',
+    'SH': 'Ш', 'CH': 'Ч', 'TH': 'З', 'PH': 'Ф', 'ZH': 'Ж',
+    'TS': 'Ц', 'CK': 'К', 'NG': 'Нг', 'QU': 'Кв'
+}
+
+# Одиночные буквы
+LETTERS = {
+    'a': 'а', 'b': 'б', 'c': 'к', 'd': 'д', 'e': 'е', 'f': 'ф',
+    'g': 'г', 'h': 'х', 'i': 'и', 'j': 'дж', 'k': 'к', 'l': 'л',
+    'm': 'м', 'n': 'н', 'o': 'о', 'p': 'п', 'q': 'к', 'r': 'р',
+    's': 'с', 't': 'т', 'u': 'у', 'v': 'в', 'w': 'в', 'x': 'кс',
+    'y': 'й', 'z': 'з',
+    'A': 'А', 'B': 'Б', 'C': 'К', 'D': 'Д', 'E': 'Е', 'F': 'Ф',
+    'G': 'Г', 'H': 'Х', 'I': 'И', 'J': 'Дж', 'K': 'К', 'L': 'Л',
+    'M': 'М', 'N': 'Н', 'O': 'О', 'P': 'П', 'Q': 'К', 'R': 'Р',
+    'S': 'С', 'T': 'Т', 'U': 'У', 'V': 'В', 'W': 'В', 'X': 'Кс',
+    'Y': 'Й', 'Z': 'З'
+}
+
+# Символы, которые Silero не озвучивает сам
+SYMBOLS = {
+    '+': 'плюс',
+    '%': 'проц',
+    '*': 'Звёздочка',
+}
+
+# Части общего токенизатора (числа - группа "number" из Numerals)
+NUMBER_PATTERN = NumeralExpander.PATTERN
+LATIN_PATTERN = r'(?P<latin>(?<!\w)[a-zA-Z]+(?!\w))'
+SYMBOL_PATTERN = r'(?P<symbol>[' + re.escape(''.join(SYMBOLS)) + r'])'
+
+
+class TextNormalizer:
+    """
+    Переиспользуемый нормализатор текста: числа, латиница и спецсимволы за один проход
+    """
+
+    def __init__(self, symbols: bool = True, word_cache_size: int = 4096, max_digits: int = 18, lexicon=None):
+        """
+        Args:
+            symbols: Озвучивать ли спецсимволы (+, %, *) словами
+            word_cache_size: Размер LRU кэша транслитерации слов
+            max_digits: Числа длиннее этого не раскрываются (см. NumeralExpander)
+            lexicon: Словарь произношения с методом lookup(word) (см. Lexicon),
+                     правила транслитерации используются для слов вне словаря
+        """
+        self.Symbols = symbols
+        self.Lexicon = lexicon
+        self._numerals = NumeralExpander(max_digits)
+        self._digraphPattern = re.compile('|'.join(sorted(DIGRAPHS, key=len, reverse=True)))
+        self._letterTable = str.maketrans(LETTERS)
+        self._transliterate_word = lru_cache(maxsize=word_cache_size)(self._transliterate_word_uncached)
+
+        symbol_part = [SYMBOL_PATTERN] if symbols else []
+        self._numbersPattern = re.compile('|'.join([NUMBER_PATTERN] + symbol_part))
+        self._latinPattern = re.compile(LATIN_PATTERN)
+        self._fullPattern = re.compile('|'.join([NUMBER_PATTERN, LATIN_PATTERN] + symbol_part))
+
+        self._handlers: Dict[str, Callable[[re.Match], str]] = {
+            'number': self._replace_number,
+            'latin': self._replace_latin,
+            'symbol': self._replace_symbol,
+        }
+
+    def _transliterate_word_uncached(self, word: str) -> str:
+        """Транслитерирует одно английское слово: словарь, иначе диграфы и буквы."""
+        if self.Lexicon is not None:
+            pronunciation = self.Lexicon.lookup(word)
+            if pronunciation is not None:
+                if len(word) > 1 and word.isupper():
+                    return pronunciation.upper()
+                if word[0].isupper():
+                    return pronunciation[0].upper() + pronunciation[1:]
+                return pronunciation
+        return self._digraphPattern.sub(lambda m: DIGRAPHS[m.group(0)], word).translate(self._letterTable)
+
+    def _replace_number(self, match: re.Match) -> str:
+        return self._numerals.replace(match)
+
+    def _replace_latin(self, match: re.Match) -> str:
+        return self._transliterate_word(match.group(0))
+
+    def _replace_symbol(self, match: re.Match) -> str:
+        # Пробелы добавляем только там, где их нет, чтобы не было двойных
+        text = match.string
+        start, end = match.span()
+        left = '' if start == 0 or text[start - 1] == ' ' else ' '
+        right = '' if end == len(text) or text[end] == ' ' else ' '
+        return f"{left}{SYMBOLS[match.group(0)]}{right}"
+
+    def _dispatch(self, match: re.Match) -> str:
+        return self._handlers[match.lastgroup](match)
+
+    def expand_numbers(self, text: str) -> str:
+        """
+        Заменяет числа (и спецсимволы) словами, латиницу не трогает
+
+        Args:
+            text: Исходный текст
+
+        Returns:
+            Текст с числительными
+        """
+        return self._numbersPattern.sub(self._dispatch, text)
+
+    def transliterate(self, text: str) -> str:
+        """
+        Транслитерирует английские слова в русские буквы с учетом диграфов
+
+        Args:
+            text: Текст с возможными английскими словами
+
+        Returns:
+            Текст с транслитерированными английскими словами
+        """
+        return self._latinPattern.sub(self._dispatch, text.replace('_', ' '))
+
+    def normalize(self, text: str) -> str:
+        """
+        Полная нормализация за один проход: числа, латиница и спецсимволы
+
+        Args:
+            text: Исходный текст
+
+        Returns:
+            Текст, готовый для синтеза
+        """
+        return self._fullPattern.sub(self._dispatch, text.replace('_', ' '))
+
+
+# Эталонный корпус: (исходный текст, результат normalize)
+GOLDEN_CORPUS: List[Tuple[str, str]] = [
+    ("У меня 5 яблок и 123 рубля", "У меня пять яблок и сто двадцать три рубля"),
+    ("Hello world", "Хелло ворлд"),
+    ("Привет hello", "Привет хелло"),
+    ("shoot", "шоот"),
+    ("think", "зинк"),
+    ("THINK Thing sHip", "ЗИНК Зинг сХип"),
+    ("0 1 10 19 20 21 99 100 101 999", "ноль один десять девятнадцать двадцать двадцать один девяносто девять сто сто один девятьсот девяносто девять"),
+    ("1000 2000 3000 5000 1001 2345 9999", "одна тысяча две тысячи три тысячи пять тысяч одна тысяча один две тысячи триста сорок пять девять тысяч девятьсот девяносто девять"),
+    ("10000 123456", "десять тысяч сто двадцать три тысячи четыреста пятьдесят шесть"),
+    ("в 2024 году 21 минута", "в две тысячи двадцать четвёртом году двадцать одна минута"),
+    ("-5 и 3.5 и 12:30", "минус пять и три целых пять десятых и двенадцать тридцать"),
+    ("до 5 минут, к 1 минуте", "до пяти минут, к одной минуте"),
+    ("5-й и 2-х и 90-е", "пятый и двух и девяностые"),
+    ("$5 и 100₽ и 2.5%", "пять долларов и сто рублей и две целых пять десятых процента"),
+    ("abc5 5abc x2", "abc5 5abc x2"),
+    ("hello_world", "хелло ворлд"),
+    ("Quick jazz box", "Квик джазз бокс"),
+    ("2+2", "два плюс два"),
+    ("50% скидка", "пятьдесят процентов скидка"),
+    ("скидка %", "скидка проц"),
+    ("a * b", "а Звёздочка б"),
+    ("", ""),
+]
+
+# Эталоны со словарем произношения по умолчанию (Lexicon.DEFAULT_LEXICON_PATH)
+LEXICON_CORPUS: List[Tuple[str, str]] = [
+    ("think", "синк"),
+    ("Hello world", "Хэллоу ворлд"),
+    ("GG WP", "ГЭ ГЭ ВЭ ПЭ"),
+    ("lol 5 kek", "лол пять кек"),
+    ("xqzt", "кскзт"),
+]
+
+
+def check_golden(normalizer: TextNormalizer, corpus: List[Tuple[str, str]] = GOLDEN_CORPUS) -> List[str]:
+    """
+    Сверяет нормализатор с эталонным корпусом
+
+    Returns:
+        Список описаний расхождений (пустой, если все совпало)
+    """
+    failures = []
+    for source, expected in corpus:
+        actual = normalizer.normalize(source)
+        if actual != expected:
+            failures.append(f"{source!r}: ожидалось {expected!r}, получено {actual!r}")
+    return failures
+
+
+def benchmark(normalizer: TextNormalizer, iterations: int = 20000) -> float:
+    """
+    Измеряет пропускную способность normalize на сообщениях из корпуса
+
+    Returns:
+        Сообщений в секунду
+    """
+    samples = [source for source, _ in GOLDEN_CORPUS if source]
+    start = time.perf_counter()
+    for i in range(iterations):
+        normalizer.normalize(samples[i % len(samples)])
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed
+
+
+if __name__ == "__main__":
+    import sys
+
+    from Lexicon import PronunciationLexicon
+
+    normalizer = TextNormalizer()
+    lexicon_normalizer = TextNormalizer(lexicon=PronunciationLexicon())
+    failed = False
+    for title, checked, corpus in (("Эталонный корпус", normalizer, GOLDEN_CORPUS),
+                                   ("Корпус со словарем", lexicon_normalizer, LEXICON_CORPUS)):
+        failures = check_golden(checked, corpus)
+        for failure in failures:
+            print(f"❌ {failure}")
+        print(f"{'❌' if failures else '✅'} {title}: {len(corpus) - len(failures)}/{len(corpus)}")
+        failed = failed or bool(failures)
+    print(f"⏱️ Пропускная способность: {benchmark(normalizer):.0f} сообщений/с")
+    print(f"⏱️ Со словарем: {benchmark(lexicon_normalizer):.0f} сообщений/с")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,207 @@
+"""
+Выбор голоса и подачи для каждого сообщения.
+
+Автор (или стрим, или тип сообщения) сопоставляется голосу Silero и пресету
+просодии. Без явных правил голос автора выбирается консистентным хешированием:
+один и тот же ник всегда звучит одним голосом, а добавление или удаление голоса
+меняет голос только у небольшой части авторов.
+"""
+
+import bisect
+import hashlib
+import html
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Cancellation import CancellationToken
+
+
+@dataclass(frozen=True)
+class ProsodyPreset:
+    """
+    Пресет подачи
+
+    Attributes:
+        Name: Название пресета
+        Style: Стиль для генератора SSML (neutral, cheerful, serious)
+        Rate: Темп для <prosody rate> (Silero поддерживает только rate)
+    """
+    Name: str
+    Style: str = "neutral"
+    Rate: str = "medium"
+
+    def wrap(self, text: str) -> Optional[str]:
+        """
+        SSML с темпом пресета для обычного текста
+
+        Returns:
+            SSML или None, если темп обычный и разметка не нужна
+        """
+        if self.Rate == "medium":
+            return None
+        return f'<speak><prosody rate="{self.Rate}">{html.escape(text, quote=False)}</prosody></speak>'
+
+
+PROSODY_PRESETS: Dict[str, ProsodyPreset] = {
+    "neutral": ProsodyPreset("neutral"),
+    "cheerful": ProsodyPreset("cheerful", "cheerful"),
+    "calm": ProsodyPreset("calm", "serious", "slow"),
+    "excited": ProsodyPreset("excited", "cheerful", "fast"),
+}
+
+
+@dataclass(frozen=True)
+class VoiceProfile:
+    """
+    Голос и подача сообщения
+
+    Attributes:
+        Speaker: Голос Silero
+        Preset: Пресет просодии
+    """
+    Speaker: str
+    Preset: ProsodyPreset
+
+
+@dataclass
+class SpeechItem:
+    """
+    Сообщение в очереди озвучки
+
+    Attributes:
+        Text: Текст (после сжатия и раскрытия чисел)
+        PrintAudio: Выводить ли текст в консоль
+        Author: Автор сообщения (None - сообщение самого бота)
+        Stream: ID стрима
+        Kind: Тип сообщения (chat, system, ...)
+        Enqueued: Когда сообщение попало в очередь (time.monotonic)
+        Token: Отмена сообщения (tts.skip_current, tts.clear_pending)
+    """
+    Text: str
+    PrintAudio: bool = True
+    Author: Optional[str] = None
+    Stream: Optional[str] = None
+    Kind: str = "chat"
+    Enqueued: float = field(default_factory=time.monotonic)
+    Token: CancellationToken = field(default_factory=CancellationToken, compare=False, repr=False)
+
+
+class ConsistentHashRing:
+    """
+    Кольцо консистентного хеширования с виртуальными узлами
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = 64):
+        """
+        Args:
+            nodes: Узлы (голоса)
+            replicas: Виртуальных узлов на голос (сглаживает распределение)
+        """
+        self._points: List[Tuple[int, str]] = sorted(
+            (self._hash(f"{node}#{index}"), node) for node in nodes for index in range(replicas))
+        self._keys = [point for point, _ in self._points]
+        if not self._points:
+            raise ValueError("Кольцо голосов пустое")
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        # md5 стабилен между запусками (в отличие от hash() со случайной солью)
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def get(self, key: str) -> str:
+        """Узел, ответственный за ключ."""
+        index = bisect.bisect(self._keys, self._hash(key)) % len(self._points)
+        return self._points[index][1]
+
+
+class VoiceRouter:
+    """
+    Сопоставляет сообщениям голос и пресет просодии
+    """
+
+    def __init__(self,
+                 speakers: Iterable[str],
+                 default_speaker: str,
+                 default_preset: str = "cheerful",
+                 hash_authors: bool = True,
+                 replicas: int = 64):
+        """
+        Args:
+            speakers: Голоса для распределения авторов ("random" исключается - он не стабилен)
+            default_speaker: Голос бота и сообщений без автора
+            default_preset: Пресет по умолчанию
+            hash_authors: Распределять авторов по голосам (False - всем default_speaker)
+            replicas: Виртуальных узлов на голос
+        """
+        self.Speakers = [speaker for speaker in speakers if speaker != "random"]
+        self.DefaultSpeaker = default_speaker
+        self.DefaultPreset = default_preset
+        self.HashAuthors = hash_authors
+        self.AuthorVoices: Dict[str, Tuple[str, Optional[str]]] = {}  # автор -> (голос, пресет)
+        self.StreamVoices: Dict[str, Tuple[str, Optional[str]]] = {}  # стрим -> (голос, пресет)
+        self.KindPresets: Dict[str, str] = {"system": "neutral", "superchat": "excited"}
+        self._ring = ConsistentHashRing(self.Speakers, replicas)
+        self._lock = threading.Lock()
+
+    def assign_author(self, author: str, speaker: str, preset: Optional[str] = None) -> None:
+        """Закрепляет голос (и пресет) за автором."""
+        with self._lock:
+            self.AuthorVoices[author] = (speaker, preset)
+
+    def assign_stream(self, stream: str, speaker: str, preset: Optional[str] = None) -> None:
+        """Закрепляет голос (и пресет) за стримом."""
+        with self._lock:
+            self.StreamVoices[stream] = (speaker, preset)
+
+    def route(self, author: Optional[str] = None, stream: Optional[str] = None, kind: str = "chat") -> VoiceProfile:
+        """
+        Выбирает голос и подачу
+
+        Приоритет: закрепленный автор, закрепленный стрим, хеш автора, голос по умолчанию.
+        Пресет: явный пресет правила, затем пресет типа сообщения, затем пресет по умолчанию.
+
+        Returns:
+            Профиль (один объект на пару голос-пресет)
+        """
+        with self._lock:
+            rule = self.AuthorVoices.get(author) if author else None
+            if rule is None and stream:
+                rule = self.StreamVoices.get(stream)
+        if rule is not None:
+            speaker, preset = rule
+        elif author and self.HashAuthors:
+            speaker, preset = self._ring.get(author), None
+        else:
+            speaker, preset = self.DefaultSpeaker, None
+        return self.profile(speaker, preset or self.KindPresets.get(kind, self.DefaultPreset))
+
+    def route_item(self, item: SpeechItem) -> VoiceProfile:
+        """Выбирает профиль для сообщения очереди."""
+        return self.route(item.Author, item.Stream, item.Kind)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def profile(speaker: str, preset: str) -> VoiceProfile:
+        """Профиль голоса (кэшируется: настройка голоса выполняется один раз)."""
+        return VoiceProfile(speaker, PROSODY_PRESETS.get(preset, PROSODY_PRESETS["neutral"]))
+
+
+def join_texts(texts: Iterable[str]) -> str:
+    """
+    Склеивает несколько сообщений в одну фразу для одного вызова синтеза
+
+    Example:
+        ["привет", "как дела?"] -> "привет. как дела?"
+    """
+    parts = []
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        if parts and parts[-1][-1] not in ".!?…":
+            parts[-1] += "."
+        parts.append(text)
+    return " ".join(parts)
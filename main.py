@@ -1,5 +1,11 @@
+import os
 from Parser import YouTubeChatParser, ChatMessage
-from tts import tts
+from ChatRecord import ChatRecorder, ChatReplay
+from ChatArchive import ChatArchive
+from MessageBus import MessageBus
+from tts import tts, PostProcessor, Accenter, History, Moderator, message_bus, chat_archive_path
+from AudioBuffer import CopyMetrics
+from SileroModel import SsmlMetrics
 
 TTS = tts()
 
@@ -13,36 +19,64 @@ def log(message: ChatMessage):
     # Можно использовать структурированные данные
     print(f"💬 [{message.TimestampFormatted}] {message.Author}: {message.Message}\n")
 
-def Sound(message: ChatMessage):{
-    TTS.ospeak(message.Message, False)
-    .replace("+", " плюс ")
-    .replace("%", " проц ")
-    .replace('*', " Звёздочка ")
-    .replace("  ", ' ')
-}
+def Sound(message: ChatMessage):
+    # Спецсимволы (+, %, *) озвучивает TextNormalizer внутри tts
+    # Голос выбирается по автору (см. tts.Router)
+    TTS.ospeak(message.Message, False, author=message.Author, stream=message.VideoId)
 
 def main():
     """
     Главная функция для запуска парсера с подпиской на сообщения
     """
+    # Модель Silero грузится в фоне, пока вводится URL и ищется чат
+    TTS.preload()
+    
     # Пример использования
-    video_url = input("Введите URL YouTube стрима: ").strip()
+    video_url = input("Введите URL YouTube стрима или путь к записи чата: ").strip()
     
     if not video_url:
         print("❌ URL не может быть пустым!")
         return
     
-    parser = YouTubeChatParser(video_url)
+    replay = None
+    if os.path.isfile(video_url):
+        # Воспроизведение записанного чата (без сети)
+        speed = input("Скорость воспроизведения (1 - реальное время, 0 - максимальная): ").strip()
+        replay = ChatReplay(video_url, float(speed) if speed else 1.0)
+        parser = YouTubeChatParser.from_replay(replay)
+    else:
+        record_path = input("Файл для записи чата (Enter - не записывать): ").strip()
+        recorder = ChatRecorder(record_path) if record_path else None
+        parser = YouTubeChatParser(video_url, recorder)
     
     # Подписываемся на новые сообщения
     parser.on(log)
     parser.on(Sound)
+    if History is not None:
+        parser.on(History.log_message)
+    # Архив для поиска по прошлым стримам (SQLite + FTS5, запись пачками в фоне)
+    archive = ChatArchive(chat_archive_path) if chat_archive_path else None
+    if archive is not None:
+        parser.on(archive.add)
+    # Шина для оверлея и других процессов (python MessageBus.py listen)
+    bus = None
+    if message_bus:
+        try:
+            bus = MessageBus()
+            bus.start()
+            parser.on(bus.publish)
+        except OSError as e:
+            print(f"⚠️ Шина сообщений не запущена: {e}")
+            bus = None
     
     # Можно добавить несколько подписок
     # parser.on(lambda msg: print(f"Другая подписка: {msg.Message}"))
     
     try:
-        parser.start()
+        if replay is not None:
+            parser.replay(replay)
+        else:
+            parser.start()
         #На ctrl + c, похер
         #пользователь должен знать почему всё выключилось, если написал ctrl+ c
     except Exception as e:
@@ -55,6 +89,25 @@ def main():
         # Вызываем clear() только после того, как пользователь подтвердит завершение
         input("Нажмите Enter для завершения")
         parser.clear()
+        print(f"📊 Модерация: {Moderator.Stats}")
+        print(f"📊 Сжатие спама: {TTS.Compressor.Stats}")
+        print(f"📊 Копирование аудио: {CopyMetrics.Stats}")
+        print(f"📊 Эфир: {PostProcessor.Stats}")
+        print(f"📊 Пропуски: {TTS.SkipStats}")
+        print(f"📊 SSML: {SsmlMetrics.Stats}")
+        print(f"📊 LLM разметка: {Accenter.GateStats}")
+        if parser.Recorder is not None:
+            parser.Recorder.close()
+        if History is not None:
+            print(f"📊 Журнал: {History.Stats}")
+            History.close()
+        if archive is not None:
+            archive.close()
+            print(f"📊 Архив чата: {archive.Stats}")
+        if bus is not None:
+            for reader in bus.readers():
+                print(f"📡 Читатель шины {reader.Name}: отправлено {reader.Sent}, отставание {reader.Lag}, потеряно {reader.Lost}")
+            bus.stop()
 
 
 if __name__ == "__main__":
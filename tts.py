@@ -1,12 +1,35 @@
-import time, pyttsx3, sounddevice as sd
+import time
+try:
+	import sounddevice as sd
+except (ImportError, OSError) as e:  # Нет пакета или PortAudio (сервер, CI, soak) - без локального звука
+	print(f"⚠️ sounddevice недоступен, локальное воспроизведение выключено: {e}")
+	sd = None
 import datetime, time
 from threading import Thread, Lock, Timer
-from queue import Queue
+from queue import Queue, Empty
+from collections import deque
+from functools import partial
 import traceback
 import re
+import os, json
+from typing import Callable, Iterable
 from Accent import*
-
-import torch
+from TextNormalizer import TextNormalizer
+from Lexicon import PronunciationLexicon
+from SpamFilter import SpamCompressor
+from SileroModel import SileroModelLoader, InferenceProfile, SynthesisJob, SsmlMetrics
+from SynthPool import SynthesisPool, silero_model_factory
+from AudioBuffer import AudioBuffer, CopyMetrics
+from VoiceRouter import VoiceRouter, VoiceProfile, SpeechItem, join_texts
+from AudioEffects import PlaybackRatePolicy, AudioPostProcessor, stretch_buffer
+from AudioFile import AudioFileWriter, detect_format
+from AudioServer import AudioStreamServer
+from Backends import TTSBackend, SileroBackend, Pyttsx3Backend, EspeakBackend, NullBackend, BackendScheduler
+from RemoteSynth import RemoteBackend
+from ChatRecord import ChatReplay
+from HistoryLog import HistoryLog
+from Moderation import ChatModerator
+from Cancellation import SkipStats
 
 Speakers = [ "aidar", "baya", "kseniya", "xenia", "random"]
 
@@ -18,213 +41,103 @@ name = "large_fast"
 put_accent = True
 put_yo = True
 
-device = torch.device("cpu") # cpu или cuda
+device = "cpu" # cpu или cuda
+model_path = None # Локальный файл модели (.pt package или TorchScript) - загрузка без сети
+# Потоки torch, квантизация и прогрев (бенчмарк: python SileroModel.py)
+inference_profile = InferenceProfile(IntraOpThreads=None, InterOpThreads=1, WarmupSpeaker=speaker, WarmupSampleRate=sample_rate)
+
+# Модель грузится в фоне при первом обращении (или через tts.preload), а не при импорте
+ModelLoader = SileroModelLoader(language, model_id, name, device, model_path, inference_profile)
+
+# Процессов синтеза (0 - синтез в потоке очереди; бенчмарк: python SynthPool.py)
+synthesis_workers = 0
+synthesis_threads_per_worker = None # None - ядра поровну между процессами
+SynthesisWorkers: SynthesisPool | None = None
+
+def get_synthesis_pool() -> SynthesisPool | None:
+	"""
+	Возвращает пул процессов синтеза (создается при первом обращении), если он включен
+	"""
+	global SynthesisWorkers
+	if synthesis_workers and SynthesisWorkers is None:
+		factory = partial(silero_model_factory, language=language, model_id=model_id, name=name, device=device, local_path=model_path)
+		SynthesisWorkers = SynthesisPool(synthesis_workers, synthesis_threads_per_worker, factory, sample_rate=sample_rate)
+	return SynthesisWorkers
+
+# Голос по автору/стриму/типу сообщения (speaker - голос бота и сообщений без автора)
+voice_per_author = False # True - у каждого автора свой постоянный голос; False - все голосом speaker
+batch_max_chars = 300 # Склейка подряд идущих сообщений одного голоса под нагрузкой
+Router = VoiceRouter(Speakers, speaker, "cheerful", voice_per_author)
+
+# Темп речи растет с очередью и возрастом сообщения (высота голоса не меняется)
+playback_rate = PlaybackRatePolicy(Base=1.05, PerMessage=0.04, PerSecondStale=0.01, MaxRate=1.5)
 
-modelTTS, _ = torch.hub.load(repo_or_dir='snakers4/silero-models',
-						  model='silero_tts',
-						  language=language,
-						  speaker=model_id,
-						  name = name)
-modelTTS.to(device)
+# Обрезка тишины, выравнивание громкости голосов и пауза между сообщениями
+PostProcessor = AudioPostProcessor(threshold_db=-40.0, target_db=-20.0, gap_seconds=0.1)
+
+# Раздача озвучки по HTTP/WebSocket для OBS (None - выключено; страница http://127.0.0.1:порт/)
+audio_server_port = None # 8787
+local_playback = sd is not None # Воспроизводить ли на локальном устройстве (sounddevice)
+AudioOutput = AudioStreamServer(port=audio_server_port, sample_rate=sample_rate) if audio_server_port else None
+
+# Архив чата для поиска по прошлым стримам (SQLite + FTS5, запись пачками в фоне)
+chat_archive_path = None # "chat_archive.sqlite"
+
+# Шина сообщений чата для оверлея и других процессов (python MessageBus.py listen)
+message_bus = False # True - публиковать сообщения в шину
+
+# Журнал чата и озвучки: дозапись пачками в фоновом потоке, ротация по размеру и времени
+history_path = "history.txt" # None - не вести журнал
+History = HistoryLog(history_path) if history_path else None
+
+# Модерация до озвучки: стоп-слова (автомат Ахо-Корасик), ссылки и телефоны
+moderation_path = "blocklist.txt" # Файл перечитывается на лету; нет файла - только ссылки и телефоны
+Moderator = ChatModerator(moderation_path)
+
+# Движки синтеза: tts.model выбирает основной, fallback_model забирает сообщения
+# низкого приоритета, когда основной не успевает (RTF или очередь выше порога)
+SileroEngine = SileroBackend(ModelLoader, get_synthesis_pool, tuple(Speakers))
+# Воркеры синтеза на других машинах (python RemoteSynth.py worker 8791 0.0.0.0 на каждой, без аутентификации -
+# только в доверенной сети); локально - запасной движок
+remote_workers: list[tuple[str, int]] = [] # [("192.168.1.20", 8791)]
+RemoteEngine = RemoteBackend(remote_workers, SileroEngine, tuple(Speakers))
+Engines: dict[str, TTSBackend] = {
+	"silero": SileroEngine,
+	"remote": RemoteEngine,
+	"win": Pyttsx3Backend('ru'),
+	"espeak": EspeakBackend('ru'),
+	"null": NullBackend(),
+}
+fallback_model = "espeak" # None - не переключаться
+Scheduler = BackendScheduler(Engines[fallback_model] if fallback_model else None, max_rtf=0.8, max_queue=6)
 
 Accenter = SSMLGenerator("http://localhost:8786/v1")
+Normalizer = TextNormalizer(lexicon=PronunciationLexicon())
 
 def numbers_to_words(text: str) -> str:
-    """
-    Преобразует цифры в тексте в числительные на русском языке
-    
-    Args:
-        text: Текст с цифрами
-        
-    Returns:
-        Текст с замененными цифрами на числительные
-        
-    Example:
-        "У меня 5 яблок и 123 рубля" -> "У меня пять яблок и сто двадцать три рубля"
-    """
-    # Словари для преобразования
-    ones = {
-        '0': 'ноль', '1': 'один', '2': 'два', '3': 'три', '4': 'четыре',
-        '5': 'пять', '6': 'шесть', '7': 'семь', '8': 'восемь', '9': 'девять'
-    }
-    
-    teens = {
-        '10': 'десять', '11': 'одиннадцать', '12': 'двенадцать', '13': 'тринадцать',
-        '14': 'четырнадцать', '15': 'пятнадцать', '16': 'шестнадцать',
-        '17': 'семнадцать', '18': 'восемнадцать', '19': 'девятнадцать'
-    }
-    
-    tens = {
-        '2': 'двадцать', '3': 'тридцать', '4': 'сорок', '5': 'пятьдесят',
-        '6': 'шестьдесят', '7': 'семьдесят', '8': 'восемьдесят', '9': 'девяносто'
-    }
-    
-    hundreds = {
-        '1': 'сто', '2': 'двести', '3': 'триста', '4': 'четыреста',
-        '5': 'пятьсот', '6': 'шестьсот', '7': 'семьсот', '8': 'восемьсот', '9': 'девятьсот'
-    }
-    
-    def number_to_words(num_str: str) -> str:
-        """
-        Преобразует число в строку в числительное
-        
-        Args:
-            num_str: Строка с числом
-            
-        Returns:
-            Числительное на русском языке
-        """
-        num = int(num_str)
-        
-        # Ноль
-        if num == 0:
-            return ones['0']
-        
-        # 1-9
-        if num < 10:
-            return ones[str(num)]
-        
-        # 10-19
-        if num < 20:
-            return teens[str(num)]
-        
-        # 20-99
-        if num < 100:
-            ten = num // 10
-            one = num % 10
-            if one == 0:
-                return tens[str(ten)]
-            return f"{tens[str(ten)]} {ones[str(one)]}"
-        
-        # 100-999
-        if num < 1000:
-            hundred = num // 100
-            remainder = num % 100
-            if remainder == 0:
-                return hundreds[str(hundred)]
-            return f"{hundreds[str(hundred)]} {number_to_words(str(remainder))}"
-        
-        # 1000-9999
-        if num < 10000:
-            thousand = num // 1000
-            remainder = num % 1000
-            if remainder == 0:
-                if thousand == 1:
-                    return "одна тысяча"
-                elif thousand == 2:
-                    return "две тысячи"
-                elif thousand in [3, 4]:
-                    return f"{number_to_words(str(thousand))} тысячи"
-                else:
-                    return f"{number_to_words(str(thousand))} тысяч"
-            if thousand == 1:
-                return f"одна тысяча {number_to_words(str(remainder))}"
-            elif thousand == 2:
-                return f"две тысячи {number_to_words(str(remainder))}"
-            elif thousand in [3, 4]:
-                return f"{number_to_words(str(thousand))} тысячи {number_to_words(str(remainder))}"
-            else:
-                return f"{number_to_words(str(thousand))} тысяч {number_to_words(str(remainder))}"
-        
-        # Для больших чисел просто возвращаем как есть (можно расширить)
-        return num_str
-    
-    # Ищем все числа в тексте (целые числа)
-    def replace_number(match):
-        num_str = match.group(0)
-        return number_to_words(num_str)
-    
-    # Заменяем числа на числительные (ищем последовательности цифр)
-    result = re.sub(r'\b\d+\b', replace_number, text)
-    
-    return result
+	"""
+	Преобразует цифры и спецсимволы в тексте в слова (см. TextNormalizer)
+	
+	Example:
+		"У меня 5 яблок и 123 рубля" -> "У меня пять яблок и сто двадцать три рубля"
+	"""
+	return Normalizer.expand_numbers(text)
 
 def transliterate_english(text: str) -> str:
-    """
-    Транслитерирует английские слова в русские буквы с учетом диграфов
-    
-    Args:
-        text: Текст с возможными английскими словами
-        
-    Returns:
-        Текст с транслитерированными английскими словами
-        
-    Example:
-        "Hello world" -> "Хелло ворлд"
-        "Привет hello" -> "Привет хелло"
-        "shoot" -> "шут"
-        "think" -> "зинк"
-    """
-    text = text.replace('_', ' ')
-    
-    # Словарь диграфов (двухбуквенные комбинации) - обрабатываются первыми
-    digraphs = {
-        'sh': 'ш', 'ch': 'ч', 'th': 'з', 'ph': 'ф', 'zh': 'ж',
-        'ts': 'ц', 'ck': 'к', 'ng': 'нг', 'qu': 'кв',
-        'Sh': 'Ш', 'Ch': 'Ч', 'Th': 'З', 'Ph': 'Ф', 'Zh': 'Ж',
-        'Ts': 'Ц', 'Ck': 'К', 'Ng': 'Нг', 'Qu': 'Кв',
-        'SH': 'Ш', 'CH': 'Ч', 'TH': 'З', 'PH': 'Ф', 'ZH': 'Ж',
-        'TS': 'Ц', 'CK': 'К', 'NG': 'Нг', 'QU': 'Кв'
-    }
-    
-    # Словарь одиночных букв
-    translit_map = {
-        'a': 'а', 'b': 'б', 'c': 'к', 'd': 'д', 'e': 'е', 'f': 'ф',
-        'g': 'г', 'h': 'х', 'i': 'и', 'j': 'дж', 'k': 'к', 'l': 'л',
-        'm': 'м', 'n': 'н', 'o': 'о', 'p': 'п', 'q': 'к', 'r': 'р',
-        's': 'с', 't': 'т', 'u': 'у', 'v': 'в', 'w': 'в', 'x': 'кс',
-        'y': 'й', 'z': 'з',
-        'A': 'А', 'B': 'Б', 'C': 'К', 'D': 'Д', 'E': 'Е', 'F': 'Ф',
-        'G': 'Г', 'H': 'Х', 'I': 'И', 'J': 'Дж', 'K': 'К', 'L': 'Л',
-        'M': 'М', 'N': 'Н', 'O': 'О', 'P': 'П', 'Q': 'К', 'R': 'Р',
-        'S': 'С', 'T': 'Т', 'U': 'У', 'V': 'В', 'W': 'В', 'X': 'Кс',
-        'Y': 'Й', 'Z': 'З'
-    }
-    
-    def transliterate_word(match):
-        """
-        Транслитерирует одно английское слово с учетом диграфов
-        """
-        word = match.group(0)
-        result = ''
-        i = 0
-        
-        while i < len(word):
-            # Проверяем диграфы (двухбуквенные комбинации)
-            if i < len(word) - 1:
-                digraph = word[i:i+2]
-                if digraph in digraphs:
-                    result += digraphs[digraph]
-                    i += 2  # Пропускаем обе буквы
-                    continue
-            
-            # Обрабатываем одиночную букву
-            char = word[i]
-            if char in translit_map:
-                result += translit_map[char]
-            else:
-                result += char  # Оставляем как есть, если не латинская буква
-            i += 1
-        
-        return result
-    
-    # Ищем английские слова (последовательности латинских букв) и транслитерируем их
-    result = re.sub(r'\b[a-zA-Z]+\b', transliterate_word, text)
-    
-    return result
+	"""
+	Транслитерирует английские слова в русские буквы с учетом диграфов (см. TextNormalizer)
+	
+	Example:
+		"Hello world" -> "Хелло ворлд"
+	"""
+	return Normalizer.transliterate(text)
 
-def дозапись(x: str, path_to_file):
-	pass
-	#Thread(target=__Append, args=(x, path_to_file)).run Не думаю что стоит это возвращать в код
-def __Append(x:str, path_to_file):
-	try:
-		with open(path_to_file, "r", encoding="utf-8") as file:
-			q = file.read()
-		with open(path_to_file, "w", encoding="utf-8") as file:
-			file.write(q + f"\n{x}")
-	except:
-		with open(path_to_file, "w") as file:
-			file.write("Start file")
+def дозапись(x: str, path_to_file=None):
+	"""
+	Дописывает озвученный текст в журнал истории (не ждет диск, см. HistoryLog)
+	"""
+	if History is not None:
+		History.log_spoken(x)
 class tts:
 	"""
 	Класс для синтеза речи с поддержкой асинхронного воспроизведения
@@ -234,32 +147,51 @@ class tts:
 		Инициализация класса TTS
 		"""
 		self.async_mode = True
-		self.model = "silero"#win
+		self.model = "silero"#remote, win, espeak, null (см. Engines)
 		self._activeTimers: list[Timer] = []  # Список активных таймеров
 		self._loopLock = Lock()  # Блокировка для синхронизации доступа к таймерам
 		self._isPlaying = False  # Флаг воспроизведения аудио
 		self._messageQueue = Queue()  # Очередь сообщений для воспроизведения (потокобезопасна)
 		self._processingLock = Lock()  # Блокировка для предотвращения одновременного запуска обработки очереди
-	def ospeak(self, text, print_audio = True):
+		self.Compressor = SpamCompressor()  # Сжатие спама до синтеза (статистика в Compressor.Stats)
+		self._carry: SpeechItem | None = None  # Сообщение, не вошедшее в склейку (берется следующим)
+		self._pending = deque()  # Подготовленные (и отправленные в синтез) сообщения: (движок, ключ, задание, сообщения)
+		self._pendingLock = Lock()  # clear_pending снимает задания из другого потока
+		self._current: list[SpeechItem] = []  # Сообщения, которые сейчас воспроизводятся
+		self._preparing: list[SpeechItem] = []  # Склейка, для которой идет разметка SSML (снимается clear_pending)
+		self.SkipStats = SkipStats()  # Пропуски и отмены (задержка пропуска в мс)
+	def preload(self):
+		"""
+		Запускает фоновую загрузку модели и проверку LM Studio,
+		пока пользователь вводит URL и парсер ищет чат
+		"""
+		self.backend.preload()
+		if self.backend.capabilities().Ssml:
+			Thread(target=lambda: Accenter.is_available, daemon=True).start()
+		if AudioOutput is not None:
+			AudioOutput.start()
+		Moderator.watch()
+	@property
+	def backend(self) -> TTSBackend:
+		"""Основной движок синтеза (по self.model)."""
+		return Engines[self.model]
+	def _pipeline_depth(self, backend: TTSBackend) -> int:
+		"""Сколько заданий держать в синтезе: по процессу пула или по здоровому удаленному воркеру"""
+		if backend is RemoteEngine:
+			return RemoteEngine.Parallelism
+		pool = get_synthesis_pool() if backend is SileroEngine else None
+		return pool.Size if pool is not None else 1
+	def ospeak(self, text, print_audio = True, author: str | None = None, stream: str | None = None, kind: str = "chat"):
+		# Модерация раньше сжатия спама: повторы букв не должны прятать стоп-слова
+		text = Moderator.moderate(text)
+		if text is None:
+			return
+		text = self.Compressor.compress(text)
+		if not text:
+			return
 		text = numbers_to_words(text)
-		if self.model == "win":
-			if self.async_mode:
-				Thread(target=self.ospeak_n_a, args=(text, print_audio)).run()
-			else:
-				self.ospeak_n_a(text, print_audio)
-		elif self.model == "silero":
-			self.nar_speak(text, print_audio)
-	def ospeak_n_a(self, text, print_audio = True):
-		try:
-			if print_audio:
-				print(str(datetime.datetime.now().time())[:8] + " Бот: " + text)
-			дозапись("Бот: " + text, "history.txt")
-			ttss = pyttsx3.init()
-			ttss.setProperty('voice', 'ru')
-			ttss.say(text)
-			ttss.runAndWait()
-		except:
-			print("[INFO] Поток tts загружен")
+		# Все движки идут через одну очередь (прежний путь "win" вызывал Thread(...).run() и блокировал чат)
+		self.nar_speak(text, print_audio, author, stream, kind)
 	def setTimeout(self, callback, delay: float) -> Timer:
 		"""
 		Аналог setTimeout из JavaScript - выполняет функцию через указанное время
@@ -291,16 +223,19 @@ class tts:
 		timer.start()
 		return timer
 	
-	def nar_speak(self, text: str, print_audio=True):
+	def nar_speak(self, text: str, print_audio=True, author: str | None = None, stream: str | None = None, kind: str = "chat"):
 		"""
-		Добавляет текст в очередь для воспроизведения через синтез речи Silero
+		Добавляет текст в очередь для воспроизведения (движок выбирает Scheduler)
 		
 		Args:
 			text: Текст для озвучивания
 			print_audio: Выводить ли текст в консоль
+			author: Автор сообщения (голос выбирает Router)
+			stream: ID стрима
+			kind: Тип сообщения (chat, system, superchat)
 		"""
 		# Добавляем сообщение в очередь (Queue потокобезопасна)
-		self._messageQueue.put((text, print_audio))
+		self._messageQueue.put(SpeechItem(text, print_audio, author, stream, kind))
 		
 		# Если сейчас ничего не воспроизводится, запускаем обработку очереди
 		# Используем блокировку, чтобы избежать запуска нескольких обработчиков одновременно
@@ -309,109 +244,455 @@ class tts:
 				self._isPlaying = True
 				Thread(target=self._process_queue, daemon=True).start()
 	
+	def _next_item(self) -> SpeechItem:
+		"""
+		Следующее сообщение: отложенное при склейке или из очереди
+		
+		Raises:
+			Empty: Сообщений нет
+		"""
+		while True:
+			if self._carry is not None:
+				item, self._carry = self._carry, None
+			else:
+				item = self._messageQueue.get_nowait()
+			if not item.Token.Cancelled:
+				return item
+			# Снято через clear_pending
+			self.SkipStats.cleared()
+			self._messageQueue.task_done()
+	
+	def _take_batch(self) -> tuple[VoiceProfile, list[SpeechItem]]:
+		"""
+		Берет сообщение и, если очередь длинная, следующие за ним сообщения того же голоса
+		
+		Склеенные сообщения синтезируются одним вызовом модели. Под такой нагрузкой
+		SSML все равно не генерируется, так что склейка ничего не меняет в подаче.
+		
+		Raises:
+			Empty: Сообщений нет
+		"""
+		item = self._next_item()
+		profile = Router.route_item(item)
+		batch = [item]
+		length = len(item.Text)
+		while self._messageQueue.qsize() >= 3 and length < batch_max_chars:
+			try:
+				following = self._messageQueue.get_nowait()
+			except Empty:
+				break
+			if following.Token.Cancelled:
+				self.SkipStats.cleared()
+				self._messageQueue.task_done()
+				continue
+			if Router.route_item(following) != profile or length + len(following.Text) > batch_max_chars:
+				self._carry = following
+				break
+			batch.append(following)
+			length += len(following.Text) + 2
+		return profile, batch
+	
+	def _prepare_job(self, profile: VoiceProfile, batch: list[SpeechItem], use_ssml: bool | None = None,
+			backend: TTSBackend | None = None) -> SynthesisJob:
+		"""
+		Готовит задание на синтез: транслитерация и SSML разметка
+		
+		Args:
+			profile: Голос и подача
+			batch: Сообщения (несколько - склеиваются в одну фразу)
+			use_ssml: Генерировать ли SSML через LLM (None - только пока очередь короткая, иначе по правилам)
+			backend: Движок задания (SSML только если движок его понимает)
+		"""
+		text = join_texts(item.Text for item in batch)
+		# Транслитерируем английские слова перед отправкой в TTS
+		transliterated_text = transliterate_english(text)
+		
+		ssml = None
+		supports_ssml = (backend or self.backend).capabilities().Ssml
+		if use_ssml is None:
+			use_ssml = self._messageQueue.qsize() < 3
+		if len(batch) == 1 and supports_ssml:
+			if use_ssml:
+				ssml = Accenter.text_to_ssml(text, use_fallback=True, style=profile.Preset.Style)
+			elif profile.Preset.Rate == "medium":
+				# Под нагрузкой - разметка по правилам: микросекунды вместо запроса к LLM
+				ssml = Accenter.text_to_ssml(transliterated_text, style=f"rules:{profile.Preset.Style}")
+		if ssml and not ssml.startswith("<speak>"):
+			ssml = None
+		if ssml is None and supports_ssml:
+			# Темп пресета для обычного текста
+			ssml = profile.Preset.wrap(transliterated_text)
+		if ssml is not None:
+			# Строгая проверка грамматики Silero: невалидный SSML чиним или отбрасываем до инференса,
+			# а не платим за упавший синтез и повтор по тексту
+			checked, errors, warnings = Accenter.validate_for_silero(ssml, strict=True)
+			SsmlMetrics.checked(bool(errors or warnings), checked is None)
+			ssml = checked
+		
+		return SynthesisJob(transliterated_text, ssml, profile.Speaker, sample_rate, put_accent, put_yo)
+	
 	def _process_queue(self):
 		"""
 		Обрабатывает очередь сообщений, воспроизводя их последовательно
+		
+		С пулом процессов следующие сообщения синтезируются, пока играет текущее;
+		пул возвращает аудио в порядке отправки, так что порядок чата сохраняется
 		"""
-		global modelTTS, speaker, sample_rate, put_accent, put_yo
+		depth = self._pipeline_depth(self.backend)
 		
 		# Продолжаем обработку, пока очередь не пуста
 		while True:
 			try:
-				# Получаем сообщение из очереди
-				# Используем get_nowait, чтобы не блокироваться, если очередь пуста
-				try:
-					text, print_audio = self._messageQueue.get_nowait()
-				except Exception:
-					# Очередь пуста, завершаем обработку
-					break
+				# Заполняем конвейер: по заданию на каждый процесс пула
+				while len(self._pending) < depth:
+					try:
+						profile, batch = self._take_batch()
+					except Empty:
+						break
+					with self._pendingLock:
+						self._preparing = batch
+					try:
+						backend = Scheduler.choose(self.backend, batch[0].Kind, self._messageQueue.qsize() + len(self._pending))
+						job = self._prepare_job(profile, batch, backend=backend)
+						# Пока шла разметка SSML, сообщения могли снять - не тратим на них синтез
+						kept = self._drop_cancelled(batch)
+						if kept and len(kept) < len(batch):
+							job = self._prepare_job(profile, kept, use_ssml=False, backend=backend)
+						batch = kept
+						if batch:
+							handle = backend.submit(job)
+							with self._pendingLock:
+								self._pending.append((backend, handle, job, batch))
+					except Exception as e:
+						print(f"❌ Ошибка при подготовке сообщения: {e}")
+						print(traceback.format_exc())
+						for _ in batch:
+							self._messageQueue.task_done()
+					finally:
+						with self._pendingLock:
+							self._preparing = []
+				
+				with self._pendingLock:
+					entry = self._pending.popleft() if self._pending else None
+					if entry is not None:
+						self._current = entry[3]
+				if entry is None:
+					# Очередь пуста: сбрасываем флаг под блокировкой, чтобы nar_speak
+					# не положил сообщение, которое никто не заберет
+					with self._processingLock:
+						if self._carry is None and self._messageQueue.empty():
+							self._isPlaying = False
+							return
+					continue
+				
+				backend, handle, job, batch = entry
 				
 				# Воспроизводим текущее сообщение
+				audio = None
 				try:
-					# Транслитерируем английские слова перед отправкой в TTS
-					transliterated_text = transliterate_english(text)
-
-					ssml = None
-					if self._messageQueue.qsize() < 3:
-						ssml = Accenter.text_to_ssml(text, use_fallback=True, style="cheerful")
-
-					if ssml is None or ssml and ssml.startswith("<speak>"):
-						try:
-							audio = modelTTS.apply_tts(ssml_text=ssml,
-								speaker=speaker,
-								sample_rate=sample_rate
-							)
-							if print_audio:
-								print(ssml)
-						except:
-							print("Exeption:\n")
-							print(f"\n{ssml}\n")
-							traceback.print_exc()
-							# Генерируем аудио
-							audio = modelTTS.apply_tts(text=transliterated_text+"...   ",
-								speaker=speaker,
-								sample_rate=sample_rate,
-								put_accent=put_accent,
-								put_yo=put_yo
-							)
-							if print_audio:
-								print(text)
+					if batch[0].Token.Cancelled:
+						# Пропущено до начала воспроизведения: результат синтеза не нужен,
+						# задержку пропуска не считаем - в ней ожидание предыдущего сообщения
+						backend.cancel(handle)
+						self.SkipStats.cleared(len(batch))
 					else:
-						# Генерируем аудио
-						audio = modelTTS.apply_tts(text=transliterated_text+"...   ",
-							speaker=speaker,
-							sample_rate=sample_rate,
-							put_accent=put_accent,
-							put_yo=put_yo
-						)
-						if print_audio:
-							print(text)
-					
-					
-					# Воспроизводим аудио
-					sd.play(audio, sample_rate * 1.05)
-					
-					# Вычисляем длительность воспроизведения
-					duration = (len(audio) / sample_rate) + 0.1
-					
-					# Ждем завершения воспроизведения (блокирующее ожидание)
-					time.sleep(duration)
-					
-					# Останавливаем воспроизведение
-					sd.stop()
+						CopyMetrics.message()
+						audio, used_ssml = backend.result(handle)
+						for item in batch:
+							if item.PrintAudio:
+								print(job.Ssml if used_ssml and len(batch) == 1 else item.Text)
+							if History is not None:
+								History.log_spoken(item.Text, item.Author, item.Stream)
+						
+						# Обрезаем тишину по краям и выравниваем громкость (без копирования)
+						audio = PostProcessor.process(audio)
+						if len(audio):
+							audio = self._play(audio, batch, len(self._pending))
 					
 				except Exception as e:
 					print(f"❌ Ошибка при воспроизведении: {e}")
 					print(traceback.format_exc())
+				finally:
+					self._current = []
+					# Возвращаем память аудио (блок пула процессов) владельцу
+					if audio is not None:
+						audio.release()
 				
-				# Помечаем задачу как выполненную
-				self._messageQueue.task_done()
+				# Помечаем задачи как выполненные
+				for _ in batch:
+					self._messageQueue.task_done()
 				
 			except Exception as e:
 				print(f"❌ Ошибка при обработке очереди: {e}")
 				print(traceback.format_exc())
 				break
 		
-		# Когда очередь пуста, сбрасываем флаг воспроизведения
+		# Аварийный выход из цикла - сбрасываем флаг воспроизведения
 		with self._processingLock:
 			self._isPlaying = False
 	
+	def _play(self, audio: AudioBuffer, batch: list[SpeechItem], in_flight: int) -> AudioBuffer:
+		"""
+		Ускоряет, раздает и воспроизводит аудио, дожидаясь конца воспроизведения
+		
+		Args:
+			audio: Обработанное аудио сообщения
+			batch: Озвучиваемые сообщения
+			in_flight: Сообщений уже в синтезе (для выбора темпа)
+			
+		Returns:
+			Воспроизведенный буфер (его release() освобождает и исходный)
+		"""
+		# Ускоряем речь по отставанию от чата, не меняя высоту голоса
+		rate = playback_rate.rate(self._messageQueue.qsize() + in_flight,
+			time.monotonic() - batch[0].Enqueued)
+		token = batch[0].Token
+		if token.Cancelled:
+			# Пропущено, пока шел синтез (звук еще не начинался)
+			self.SkipStats.cleared(len(batch))
+			return audio
+		audio = stretch_buffer(audio, rate)
+		
+		# Раздаем в поток для OBS (кодируется один раз на всех слушателей)
+		published = None
+		if AudioOutput is not None:
+			published = AudioOutput.publish(audio, {"author": batch[0].Author, "text": join_texts(item.Text for item in batch)})
+		
+		# Воспроизводим аудио (float32 массив передается без копирования)
+		if local_playback and sd is not None:
+			sd.play(audio.Samples, audio.SampleRate)
+		
+		# Вычисляем длительность воспроизведения с паузой между сообщениями
+		duration = audio.Duration + PostProcessor.GapSeconds
+		
+		# Ждем завершения воспроизведения; skip_current прерывает ожидание сразу
+		skipped = token.wait(duration)
+		
+		# Останавливаем воспроизведение (при пропуске - посреди буфера)
+		if local_playback and sd is not None:
+			sd.stop()
+		if skipped:
+			# Зрители OBS тоже не должны дослушивать пропущенное
+			if published is not None:
+				AudioOutput.cancel(published)
+			self.SkipStats.skipped(token)
+		return audio
+	
+	def _drop_cancelled(self, batch: list[SpeechItem]) -> list[SpeechItem]:
+		"""Убирает из склейки снятые сообщения (их задачи очереди закрываются)."""
+		kept = [item for item in batch if not item.Token.Cancelled]
+		self.SkipStats.cleared(len(batch) - len(kept))
+		for _ in range(len(batch) - len(kept)):
+			self._messageQueue.task_done()
+		return kept
+	
+	def skip_current(self) -> bool:
+		"""
+		Прерывает воспроизводимое сообщение (следующее начинается сразу)
+		
+		Returns:
+			False, если сейчас ничего не воспроизводится
+		"""
+		current = self._current
+		for item in current:
+			item.Token.cancel()
+		return bool(current)
+	
+	def clear_pending(self, filter: Callable[[SpeechItem], bool] | None = None) -> int:
+		"""
+		Снимает ожидающие сообщения: в очереди, в разметке SSML и уже отправленные
+		на синтез (воспроизводимое сообщение не трогается, см. skip_current).
+		SkipStats.Cleared растет там, где снятое сообщение покидает конвейер.
+		
+		Args:
+			filter: Какие сообщения снимать (None - все), например lambda item: item.Author == "спамер"
+			
+		Returns:
+			Сколько сообщений снято
+		"""
+		matches = filter or (lambda item: True)
+		cleared = 0
+		with self._messageQueue.mutex:
+			queued = list(self._messageQueue.queue)
+		carry = self._carry
+		if carry is not None:
+			queued.append(carry)
+		for item in queued:
+			if matches(item):
+				cleared += item.Token.cancel()
+		
+		# Склейка снимается целиком, если в ней есть подходящее сообщение
+		with self._pendingLock:
+			# Идущая разметка: снятые сообщения выбросит _drop_cancelled, остальные переразметятся
+			for item in self._preparing:
+				if matches(item):
+					cleared += item.Token.cancel()
+			entries = [entry for entry in self._pending if any(matches(item) for item in entry[3])]
+			for entry in entries:
+				self._pending.remove(entry)
+		for backend, handle, _, batch in entries:
+			# Задание в пуле не синтезируется, если воркер его еще не взял
+			backend.cancel(handle)
+			for item in batch:
+				cleared += item.Token.cancel()
+				self._messageQueue.task_done()
+			self.SkipStats.cleared(len(batch))
+		
+		return cleared
+	
 	def _stop_audio(self):
 		"""
 		Останавливает воспроизведение аудио
 		"""
 		try:
-			sd.stop()
+			if sd is not None:
+				sd.stop()
 			self._isPlaying = False
 		except Exception as e:
 			print(f"⚠️ Ошибка при остановке аудио: {e}")
-	def SaveToFile(self, text):
-		ttss = pyttsx3.init()
-		ttss.setProperty('voice', 'ru')
-		ttss.save_to_file(text, "data.mp3")
-		ttss.runAndWait()
-		ttss.stop()
-		self.ospeak("Выполнено")
+	def _render_items(self, messages) -> Iterable[tuple[SpeechItem, int | None]]:
+		"""
+		Превращает сообщения для render в элементы очереди (модерация, сжатие спама и числа как в ospeak)
+		
+		Yields:
+			Кортеж (сообщение, исходная временная метка в микросекундах или None)
+		"""
+		for message in messages:
+			if isinstance(message, SpeechItem):
+				item, timestamp = message, None
+			elif isinstance(message, str):
+				item, timestamp = SpeechItem(message, False), None
+			else:
+				# ChatMessage из парсера или записи чата
+				item = SpeechItem(message.Message, False, message.Author, message.VideoId)
+				timestamp = message.Timestamp
+			# Модерация как в ospeak: в VOD не должно попасть то, что не озвучилось бы в эфире
+			text = Moderator.moderate(item.Text)
+			if not text:
+				continue
+			text = self.Compressor.compress(text)
+			if not text:
+				continue
+			item.Text = numbers_to_words(text)
+			yield item, timestamp
+	
+	def render(self, messages, path: str, fmt: str | None = None, segments: bool = False,
+			use_ssml: bool = False, gap_seconds: float | None = None) -> dict:
+		"""
+		Рендерит сообщения в файл без воспроизведения (монтаж VOD, бенчмарк синтеза)
+		
+		Синтез идет на максимальной скорости: без пауз воспроизведения и ускорения,
+		через пул процессов, если он включен. Рядом пишется манифест с таймингами.
+		
+		Args:
+			messages: Строки, SpeechItem, ChatMessage или запись чата ChatReplay
+			path: Файл (wav, flac, opus, ogg) или каталог при segments=True
+			fmt: Формат (None - по расширению path, для каталога - wav)
+			segments: Писать каждое сообщение в отдельный файл каталога path
+			use_ssml: Размечать сообщения через SSMLGenerator (медленно)
+			gap_seconds: Пауза между сообщениями в общем файле (None - как при воспроизведении)
+			
+		Returns:
+			Манифест: файлы, тайминги сообщений, число пропущенных из-за ошибок синтеза и скорость синтеза
+			
+		Example:
+			TTS.render(ChatReplay("chat.jsonl.gz"), "vod.flac")
+		"""
+		if isinstance(messages, ChatReplay):
+			from Parser import YouTubeChatParser
+			replay = ChatReplay(messages.Path, 0)  # Без пауз записи
+			messages = YouTubeChatParser.from_replay(replay).iter_replay(replay)
+		gap = PostProcessor.GapSeconds if gap_seconds is None else gap_seconds
+		
+		if segments:
+			fmt = detect_format("", fmt or "wav")
+			os.makedirs(path, exist_ok=True)
+			manifest_path = os.path.join(path, "manifest.json")
+			writer = None
+		else:
+			writer = AudioFileWriter(path, sample_rate, fmt)
+			fmt = writer.Format
+			manifest_path = os.path.splitext(path)[0] + ".json"
+		
+		backend = self.backend  # Офлайн качество важнее скорости - без дешевого движка
+		depth = self._pipeline_depth(backend)
+		pending = deque()
+		entries = []
+		failed = 0
+		started = time.perf_counter()
+		
+		def finish():
+			nonlocal failed
+			item, timestamp, job, handle = pending.popleft()
+			try:
+				audio, used_ssml = backend.result(handle)
+			except Exception as e:
+				# Одно несинтезированное сообщение не должно обрывать весь рендер
+				failed += 1
+				print(f"❌ Ошибка синтеза при рендере «{item.Text[:40]}»: {e}")
+				return
+			try:
+				audio = PostProcessor.process(audio)
+				entry = {
+					"index": len(entries),
+					"author": item.Author,
+					"speaker": job.Speaker,
+					"text": item.Text,
+					"ssml": used_ssml,
+					"timestamp": timestamp,
+					"duration": round(audio.Duration, 3),
+				}
+				if writer is None:
+					entry["file"] = f"{len(entries):05d}.{fmt}"
+					with AudioFileWriter(os.path.join(path, entry["file"]), sample_rate, fmt) as segment:
+						segment.write(audio.Samples)
+				else:
+					if entries:
+						writer.write_silence(gap)
+					entry["start"] = round(writer.Seconds, 3)
+					writer.write(audio.Samples)
+					entry["end"] = round(writer.Seconds, 3)
+				entries.append(entry)
+			finally:
+				audio.release()
+		
+		try:
+			for item, timestamp in self._render_items(messages):
+				job = self._prepare_job(Router.route_item(item), [item], use_ssml, backend)
+				pending.append((item, timestamp, job, backend.submit(job)))
+				if len(pending) >= depth:
+					finish()
+			while pending:
+				finish()
+		finally:
+			# При прерывании рендера отправленные задания отменяются, чтобы не держать блоки пула
+			while pending:
+				backend.cancel(pending.popleft()[3])
+			if writer is not None:
+				writer.close()
+		
+		elapsed = time.perf_counter() - started
+		audio_seconds = sum(entry["duration"] for entry in entries)
+		manifest = {
+			"file": None if segments else path,
+			"format": fmt,
+			"sample_rate": sample_rate,
+			"messages": entries,
+			"failed": failed,
+			"audio_seconds": round(audio_seconds, 3),
+			"synthesis_seconds": round(elapsed, 3),
+			"rtf": round(elapsed / audio_seconds, 4) if audio_seconds else None,
+		}
+		with open(manifest_path, "w", encoding="utf-8") as file:
+			json.dump(manifest, file, ensure_ascii=False, indent=1)
+		print(f"✅ Отрендерено {len(entries)} сообщений: {audio_seconds:.1f} с аудио за {elapsed:.1f} с ({manifest_path})")
+		if failed:
+			print(f"⚠️ Не удалось синтезировать {failed} сообщений")
+		return manifest
+	
+	def SaveToFile(self, text, path: str = "data.wav"):
+		self.render([text], path)
+		self.ospeak("Выполнено", kind="system")
 if __name__ == "__main__":
 	Mtts = tts()
 	while 1: